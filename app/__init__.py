@@ -1,142 +1,81 @@
+import os
 from flask import Flask, send_from_directory
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from flask_migrate import Migrate, upgrade, stamp
 from flask_jwt_extended import JWTManager
-from sqlalchemy import text
 from .config import Config
 from .logger import setup_app_logger
+from .database import configure_engine
+from .replica import RoutingSession, init_replica
+from . import metrics
+from .instrumentation import init_request_metrics
+from .profiling import init_query_profiling
+from .json_provider import FastJSONProvider
+from .compression import init_compression
+from .http_cache import init_etags
+from .admission import init_admission
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 jwt = JWTManager()
 
-def migrate_database(app):
-    """Ejecuta migraciones necesarias en la base de datos"""
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+# Última revisión equivalente a lo que hacía db.create_all() antes de usar Alembic
+BASELINE_REVISION = "0001"
+
+def upgrade_database(app):
+    """Aplica las migraciones de Alembic pendientes"""
     with app.app_context():
-        try:
-            # Verificar si las columnas existen
-            inspector = db.inspect(db.engine)
-            existing_columns = [col['name'] for col in inspector.get_columns('products')]
-            
-            print(f"📋 Columnas existentes en products: {existing_columns}")
-            
-            # Agregar min_stock si no existe
-            if 'min_stock' not in existing_columns:
-                print("➕ Agregando columna 'min_stock' a products...")
-                db.session.execute(text(
-                    "ALTER TABLE products ADD COLUMN min_stock INTEGER DEFAULT 10"
-                ))
-                db.session.commit()
-                print("✅ Columna 'min_stock' agregada")
-            else:
-                print("ℹ️  Columna 'min_stock' ya existe")
-            
-            # Verificar si existe iva_rate (viejo) o iva (nuevo)
-            if 'iva' not in existing_columns and 'iva_rate' not in existing_columns:
-                print("➕ Agregando columna 'iva' a products...")
-                db.session.execute(text(
-                    "ALTER TABLE products ADD COLUMN iva INTEGER DEFAULT 16"
-                ))
-                db.session.commit()
-                print("✅ Columna 'iva' agregada con valor por defecto de 16%")
-            elif 'iva_rate' in existing_columns and 'iva' not in existing_columns:
-                # Renombrar iva_rate a iva para consistencia
-                print("➕ Renombrando columna 'iva_rate' a 'iva'...")
-                db.session.execute(text(
-                    "ALTER TABLE products RENAME COLUMN iva_rate TO iva"
-                ))
-                db.session.commit()
-                print("✅ Columna renombrada de 'iva_rate' a 'iva'")
-            else:
-                print("ℹ️  Columna 'iva' ya existe")
-            
-            # Eliminar columna include_iva si existe (ya no la necesitamos)
-            if 'include_iva' in existing_columns:
-                print("🗑️  Eliminando columna obsoleta 'include_iva'...")
-                try:
-                    db.session.execute(text(
-                        "ALTER TABLE products DROP COLUMN include_iva"
-                    ))
-                    db.session.commit()
-                    print("✅ Columna 'include_iva' eliminada")
-                except Exception as e:
-                    print(f"⚠️  No se pudo eliminar 'include_iva': {e}")
-                    db.session.rollback()
-            
-            # Agregar supplier_id si no existe
-            if 'supplier_id' not in existing_columns:
-                print("➕ Agregando columna 'supplier_id' a products...")
-                db.session.execute(text(
-                    "ALTER TABLE products ADD COLUMN supplier_id INTEGER"
-                ))
-                db.session.commit()
-                print("✅ Columna 'supplier_id' agregada")
-                
-                # Intentar agregar foreign key
-                try:
-                    db.session.execute(text(
-                        "ALTER TABLE products ADD CONSTRAINT fk_products_supplier "
-                        "FOREIGN KEY (supplier_id) REFERENCES suppliers(id)"
-                    ))
-                    db.session.commit()
-                    print("✅ Foreign key constraint agregada")
-                except Exception as e:
-                    print(f"ℹ️  Foreign key ya existe o no se pudo agregar: {e}")
-                    db.session.rollback()
-            else:
-                print("ℹ️  Columna 'supplier_id' ya existe")
-            
-            # Actualizar productos existentes sin proveedor asignándoles el primer proveedor disponible
-            result = db.session.execute(text(
-                "SELECT COUNT(*) FROM products WHERE supplier_id IS NULL"
-            ))
-            null_supplier_count = result.scalar()
-            
-            if null_supplier_count > 0:
-                print(f"⚠️  Hay {null_supplier_count} productos sin proveedor")
-                # Obtener el primer proveedor
-                result = db.session.execute(text("SELECT id FROM suppliers LIMIT 1"))
-                first_supplier = result.scalar()
-                
-                if first_supplier:
-                    print(f"➕ Asignando proveedor por defecto (ID: {first_supplier}) a productos sin proveedor...")
-                    db.session.execute(text(
-                        f"UPDATE products SET supplier_id = {first_supplier} WHERE supplier_id IS NULL"
-                    ))
-                    db.session.commit()
-                    print("✅ Productos actualizados con proveedor por defecto")
-                else:
-                    print("⚠️  No hay proveedores disponibles. Crea al menos un proveedor antes de agregar productos.")
-            else:
-                print("✅ Todos los productos tienen proveedor asignado")
-                    
-        except Exception as e:
-            print(f"⚠️  Error en migración: {e}")
-            import traceback
-            traceback.print_exc()
-            db.session.rollback()
+        inspector = db.inspect(db.engine)
+        tables = inspector.get_table_names()
+
+        # Bases creadas con db.create_all() no tienen historial de migraciones
+        if "alembic_version" not in tables and "products" in tables:
+            print(f"📋 Base existente sin historial de migraciones, marcando revisión {BASELINE_REVISION}")
+            stamp(revision=BASELINE_REVISION)
+
+        upgrade()
+        print("✅ Migraciones aplicadas")
 
 def create_app():
     app = Flask(__name__, static_folder="static", template_folder="templates")
     app.config.from_object(Config)
+    app.json = FastJSONProvider(app)
     
     db.init_app(app)
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, directory=MIGRATIONS_DIR)
     jwt.init_app(app)
     setup_app_logger(app)
+    metrics.configure(app.config["METRICS_DIR"], app.config["METRICS_FLUSH_SECONDS"])
+    init_replica(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            configure_engine(app, engine)
+        init_request_metrics(app, db.engines.values())
+        init_query_profiling(app, db.engines.values())
+        init_admission(app, db.engines.values())
+    # Después de las métricas: su after_request corre antes y se mide el tamaño comprimido
+    init_compression(app)
+    init_etags(app)
     
     # Importar TODOS los modelos
     from .models import User, Role, LogEntry, Customer, Product, Sale, SaleItem, Supplier
+    from .log_archive import ensure_log_partitions
+    from .inventory import record_opening_balances, refresh_low_stock
+    from .events import hub
+    from . import autocomplete, jobs, product_lookup
+    hub.init_app(app)
+    product_lookup.init_app(app)
+    autocomplete.init_app(app)
+    jobs.pool.init_app(app)
     
     # Crear tablas y datos iniciales automáticamente
     with app.app_context():
         try:
-            # Primero crear todas las tablas
-            db.create_all()
-            print("✅ Tablas de base de datos verificadas/creadas")
-            
-            # Ejecutar migraciones si es necesario
-            migrate_database(app)
+            # Primero crear/actualizar el esquema con las migraciones
+            upgrade_database(app)
+            ensure_log_partitions()
             
             # Crear roles si no existen
             roles_needed = ['admin', 'manager', 'viewer']
@@ -281,6 +220,9 @@ def create_app():
                 for p in productos:
                     db.session.add(p)
                 db.session.commit()
+                record_opening_balances()
+                refresh_low_stock()
+                db.session.commit()
                 print(f"✅ {len(productos)} productos de licorería agregados")
             
             # Agregar clientes de ejemplo si no existen
@@ -296,6 +238,10 @@ def create_app():
                     db.session.add(c)
                 db.session.commit()
                 print(f"✅ {len(clientes)} clientes de ejemplo agregados")
+            
+            # Mapa de códigos para el escáner e índice de nombres del punto de venta
+            product_lookup.warm()
+            autocomplete.warm()
                 
         except Exception as e:
             print(f"❌ Error al inicializar base de datos: {e}")
@@ -0,0 +1,279 @@
+"""Control de admisión por clase de costo de la ruta.
+
+Cada handler tiene una clase: cheap, normal (por defecto), expensive o
+priority, marcada con @route_cost. role_required la aplica después de validar
+el token:
+
+- normal y expensive consumen fichas de un token bucket por usuario y clase;
+  sin fichas la respuesta es 429 con Retry-After.
+- expensive además tiene un tope global de peticiones en paralelo
+  (ADMISSION_EXPENSIVE_MAX, sumando todos los workers), así los reportes nunca
+  ocupan todos los hilos ni todo el pool de conexiones.
+- cheap y priority (POST /api/sales) no pasan por el limitador ni tocan el
+  archivo de estado.
+
+Los workers de gunicorn son procesos distintos, así que buckets y cupos viven
+en un archivo SQLite local (ADMISSION_STORE). Si el archivo falla la petición
+se admite: el limitador nunca debe tumbar el cobro.
+
+Cada clase también tiene su statement timeout (STATEMENT_TIMEOUT_<CLASE>_MS):
+SET LOCAL statement_timeout en Postgres, max_execution_time en MySQL y un
+progress handler en SQLite. Una consulta cancelada responde 503.
+"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from . import metrics
+from .replica import RoutingSession
+
+logger = logging.getLogger(__name__)
+
+COST_CLASSES = ("cheap", "normal", "expensive", "priority")
+DEFAULT_COST = "normal"
+# Clases que consumen fichas del bucket del usuario
+LIMITED_CLASSES = ("normal", "expensive")
+
+# Segundos sugeridos al rechazar por cupo lleno (no hay forma de saber cuándo se libera)
+CONCURRENCY_RETRY_AFTER = 2
+
+rejections = metrics.counter(
+    "admission_rejections_total",
+    "Peticiones rechazadas con 429 por clase de costo y motivo",
+    labels=("cost_class", "reason"),
+)
+statement_timeouts = metrics.counter(
+    "statement_timeouts_total",
+    "Consultas canceladas por el statement timeout de su clase",
+    labels=("cost_class",),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS slots (id INTEGER PRIMARY KEY, name TEXT NOT NULL, expires REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS ix_slots_name ON slots (name);
+"""
+
+
+class AdmissionStore:
+    """Buckets y cupos compartidos entre procesos en un archivo SQLite.
+
+    Cada operación es una transacción BEGIN IMMEDIATE corta, así que dos
+    workers no pueden leer el mismo saldo a la vez.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        # Una conexión SQLite abierta no se puede usar desde el proceso hijo
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Es estado efímero: perderlo en un corte de luz no importa
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, operation, *args):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            result = operation(conn, *args)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def take(self, key, rate, burst, now=None):
+        """Consume una ficha; devuelve 0 si se admitió o los segundos para la siguiente"""
+        return self._transaction(self._take, key, rate, burst, now or time.time())
+
+    @staticmethod
+    def _take(conn, key, rate, burst, now):
+        row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+        tokens = burst if row is None else min(burst, row[0] + max(now - row[1], 0) * rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / rate
+        conn.execute(
+            "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+            (key, tokens, now),
+        )
+        return wait
+
+    def acquire(self, name, limit, ttl, now=None):
+        """Toma un lugar del cupo name; devuelve su id o None si está lleno.
+
+        Los lugares vencen a los ttl segundos por si el worker murió sin liberarlos.
+        """
+        return self._transaction(self._acquire, name, limit, ttl, now or time.time())
+
+    @staticmethod
+    def _acquire(conn, name, limit, ttl, now):
+        conn.execute("DELETE FROM slots WHERE name = ? AND expires < ?", (name, now))
+        in_use = conn.execute("SELECT COUNT(*) FROM slots WHERE name = ?", (name,)).fetchone()[0]
+        if in_use >= limit:
+            return None
+        return conn.execute("INSERT INTO slots (name, expires) VALUES (?, ?)", (name, now + ttl)).lastrowid
+
+    def release(self, slot_id):
+        self._transaction(lambda conn: conn.execute("DELETE FROM slots WHERE id = ?", (slot_id,)))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None or _store.path != current_app.config["ADMISSION_STORE"]:
+            _store = AdmissionStore(current_app.config["ADMISSION_STORE"])
+        return _store
+
+
+def route_cost(cost_class):
+    """Marca la clase de costo del handler; va debajo de @role_required"""
+    if cost_class not in COST_CLASSES:
+        raise ValueError(f"unknown cost class: {cost_class}")
+
+    def decorator(fn):
+        fn.cost_class = cost_class
+        return fn
+    return decorator
+
+
+def _too_many(cost_class, reason, retry_after, msg):
+    rejections.inc(1, cost_class, reason)
+    retry_after = max(1, math.ceil(retry_after))
+    response = jsonify({"msg": msg, "cost_class": cost_class, "retry_after": retry_after})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def _client_key(cost_class):
+    user = g.get("current_user")
+    user_id = user.get("id") if isinstance(user, dict) else None
+    who = f"user:{user_id}" if user_id is not None else f"ip:{request.remote_addr}"
+    return f"{who}:{cost_class}"
+
+
+def is_statement_timeout(error):
+    orig = error.orig
+    return (
+        getattr(orig, "pgcode", None) == "57014"  # query_canceled
+        or (getattr(orig, "args", None) or (None,))[0] == 3024  # MySQL max_execution_time
+        or "interrupted" in str(orig)  # progress handler de SQLite
+    )
+
+
+def _call(fn, args, kwargs, cost_class):
+    try:
+        return fn(*args, **kwargs)
+    except DBAPIError as e:
+        if not is_statement_timeout(e):
+            raise
+        from . import db
+        db.session.rollback()
+        statement_timeouts.inc(1, cost_class)
+        current_app.logger.warning("Statement timeout (%s) on %s %s", cost_class, request.method, request.path)
+        return jsonify({"msg": "query exceeded the time limit for this route, narrow the range or use /api/jobs"}), 503
+
+
+def admit(fn, *args, **kwargs):
+    """Aplica límite, cupo y statement timeout de la clase de fn y lo ejecuta"""
+    config = current_app.config
+    cost_class = getattr(fn, "cost_class", DEFAULT_COST)
+    g.cost_class = cost_class
+    g.statement_timeout_ms = config[f"STATEMENT_TIMEOUT_{cost_class.upper()}_MS"]
+    if not config["ADMISSION_CONTROL"] or cost_class not in LIMITED_CLASSES:
+        return _call(fn, args, kwargs, cost_class)
+
+    store = get_store()
+    try:
+        wait = store.take(
+            _client_key(cost_class),
+            config[f"ADMISSION_{cost_class.upper()}_RATE"],
+            config[f"ADMISSION_{cost_class.upper()}_BURST"],
+        )
+    except sqlite3.Error as e:
+        logger.warning("Admission store unavailable, admitting request: %s", e)
+        wait = 0
+    if wait:
+        return _too_many(cost_class, "rate", wait, "too many requests, retry later")
+    if cost_class != "expensive":
+        return _call(fn, args, kwargs, cost_class)
+
+    try:
+        slot = store.acquire("expensive", config["ADMISSION_EXPENSIVE_MAX"], config["ADMISSION_SLOT_TTL"])
+    except sqlite3.Error as e:
+        logger.warning("Admission store unavailable, admitting request: %s", e)
+        return _call(fn, args, kwargs, cost_class)
+    if slot is None:
+        return _too_many(cost_class, "concurrency", CONCURRENCY_RETRY_AFTER,
+                         "server busy with reports, retry later or use /api/jobs")
+    try:
+        return _call(fn, args, kwargs, cost_class)
+    finally:
+        try:
+            store.release(slot)
+        except sqlite3.Error as e:
+            # El lugar vence solo a los ADMISSION_SLOT_TTL segundos
+            logger.warning("Could not release admission slot %s: %s", slot, e)
+
+
+# ==================== STATEMENT TIMEOUTS ====================
+def _statement_timeout_ms():
+    return g.get("statement_timeout_ms", 0) if has_request_context() else 0
+
+
+@event.listens_for(RoutingSession, "after_begin")
+def _set_statement_timeout(session, transaction, connection):
+    dialect = connection.dialect.name
+    timeout = _statement_timeout_ms()
+    if dialect == "postgresql":
+        # SET LOCAL dura lo que la transacción; la conexión vuelve limpia al pool
+        if timeout:
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout)}")
+    elif dialect == "mysql":
+        # Es de sesión: se corrige solo cuando cambia respecto a lo que tiene la conexión
+        if connection.info.get("statement_timeout_ms", 0) != timeout:
+            connection.exec_driver_sql(f"SET SESSION max_execution_time = {int(timeout)}")
+            connection.info["statement_timeout_ms"] = timeout
+
+
+def _sqlite_statement_deadline(conn, cursor, statement, parameters, context, executemany):
+    timeout = _statement_timeout_ms()
+    if timeout:
+        deadline = time.monotonic() + timeout / 1000
+        conn.connection.dbapi_connection.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+        conn.info["progress_handler"] = True
+    elif conn.info.pop("progress_handler", False):
+        conn.connection.dbapi_connection.set_progress_handler(None, 0)
+
+
+def init_admission(app, engines):
+    for engine in engines:
+        if engine.dialect.name == "sqlite" and not event.contains(
+            engine, "before_cursor_execute", _sqlite_statement_deadline
+        ):
+            event.listen(engine, "before_cursor_execute", _sqlite_statement_deadline)
@@ -46,7 +46,7 @@ def login():
     except Exception:
         current_app.logger.exception("failed to write login log")
     
-    current_app.logger.info(f"USER={user.username} ACTION=login")
+    current_app.logger.info("USER=%s ACTION=login", user.username)
     
     # Devolver token y usuario
     return jsonify({
@@ -0,0 +1,126 @@
+"""Autocompletado por prefijo de nombre (productos y clientes).
+
+Cada proceso guarda, por entidad, una lista ordenada de claves normalizadas
+(minúsculas y sin acentos: "chicharron" encuentra "Chicharrón") y busca el
+rango del prefijo con bisect, sin tocar la base. Se indexa el nombre completo
+y cada palabra ("cuervo" encuentra "Tequila José Cuervo"). Las escrituras
+actualizan solo las claves del registro que cambió: en el worker que escribe
+con refresh() y en los demás con los eventos de events.hub.
+"""
+import bisect
+import threading
+import time
+import unicodedata
+from flask import current_app
+from . import queries
+
+MAX_RESULTS = 10
+MAX_QUERY_LENGTH = 100
+
+# entidad -> (función de queries, campos que se devuelven)
+ENTITIES = {
+    "product": (queries.products, ["id", "name", "sku", "price", "iva", "price_with_iva", "stock"]),
+    "customer": (queries.customers, ["id", "name", "email", "phone"]),
+}
+
+
+def fold(text):
+    """'Tequila José  Cuervo' -> 'tequila jose cuervo'"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+def _keys(name):
+    """Clave desde el inicio del nombre y desde cada palabra"""
+    words = fold(name).split(" ")
+    return {" ".join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+class NameIndex:
+    def __init__(self, load, fields):
+        self._load = load
+        self._fields = fields
+        self._lock = threading.Lock()
+        self._entries = []   # [(clave, id)] ordenada
+        self._rows = {}      # id -> campos que se devuelven
+        self._loaded_at = None
+
+    def rebuild(self):
+        rows = {row["id"]: row for row in self._load(fields=self._fields)}
+        entries = sorted((key, rid) for rid, row in rows.items() for key in _keys(row["name"]))
+        with self._lock:
+            self._entries, self._rows, self._loaded_at = entries, rows, time.monotonic()
+        return len(rows)
+
+    def refresh(self, record_id):
+        """Vuelve a leer un registro (o lo quita si ya no existe)"""
+        rows = self._load(fields=self._fields, ids=[record_id])
+        with self._lock:
+            old = self._rows.pop(record_id, None)
+            if old is not None:
+                for key in _keys(old["name"]):
+                    i = bisect.bisect_left(self._entries, (key, record_id))
+                    if i < len(self._entries) and self._entries[i] == (key, record_id):
+                        del self._entries[i]
+            if rows:
+                self._rows[record_id] = rows[0]
+                for key in _keys(rows[0]["name"]):
+                    bisect.insort(self._entries, (key, record_id))
+
+    def patch(self, record_id, **values):
+        with self._lock:
+            row = self._rows.get(record_id)
+            if row is not None:
+                self._rows[record_id] = {**row, **values}
+
+    def search(self, prefix, limit=MAX_RESULTS):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > current_app.config["AUTOCOMPLETE_MAX_AGE"]:
+            self.rebuild()
+        prefix = fold(prefix)
+        if not prefix:
+            return []
+        results, seen = [], set()
+        with self._lock:
+            i = bisect.bisect_left(self._entries, (prefix,))
+            while i < len(self._entries) and len(results) < limit:
+                key, rid = self._entries[i]
+                if not key.startswith(prefix):
+                    break
+                if rid not in seen:
+                    seen.add(rid)
+                    results.append(self._rows[rid])
+                i += 1
+        return results
+
+
+indexes = {entity: NameIndex(load, fields) for entity, (load, fields) in ENTITIES.items()}
+
+
+def warm():
+    for index in indexes.values():
+        index.rebuild()
+
+
+def refresh(entity, record_id):
+    indexes[entity].refresh(record_id)
+
+
+def search(entity, prefix, limit=MAX_RESULTS):
+    return indexes[entity].search(prefix[:MAX_QUERY_LENGTH], min(limit, MAX_RESULTS))
+
+
+def _on_event(event):
+    data = event["data"]
+    if event["type"] == "catalog_changed":
+        refresh("product", data["product_id"])
+    elif event["type"] == "customer_changed":
+        refresh("customer", data["customer_id"])
+    elif event["type"] == "stock_changed":
+        for item in data["products"]:
+            indexes["product"].patch(item["id"], stock=item["stock"])
+
+
+def init_app(app):
+    from .events import hub
+    hub.add_listener(_on_event)
@@ -0,0 +1,129 @@
+"""Multiplexado de lecturas: varias peticiones GET en una sola llamada.
+
+El JWT se verifica una vez en /api/batch; cada sub-petición recibe la
+identidad ya validada en el environ (BATCH_IDENTITY_KEY, que un cliente no
+puede enviar porque las cabeceras HTTP llegan como HTTP_*). Las sub-peticiones
+corren en un pool de hilos, cada una con su propio contexto de petición y por
+lo tanto su propia sesión de base de datos.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from flask import request
+from werkzeug.test import EnvironBuilder
+
+BATCH_IDENTITY_KEY = "yandhi.batch_identity"
+
+# Endpoints que no tienen sentido dentro de un batch
+EXCLUDED_ENDPOINTS = {"api.batch", "api.event_stream"}
+
+# Cabeceras de la petición original que se copian a cada sub-petición
+FORWARDED_HEADERS = ("Cookie", "User-Agent", "X-Forwarded-For")
+
+# Cabeceras de la sub-respuesta que se devuelven al cliente
+RETURNED_HEADERS = ("X-Next-Cursor", "ETag", "Retry-After")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_executor(max_workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch")
+        return _executor
+
+
+class BatchError(ValueError):
+    """Sub-petición mal formada"""
+
+
+def parse_item(item):
+    """Valida {method, path, query} -> (path, query_string)"""
+    if not isinstance(item, dict):
+        raise BatchError("each request must be an object")
+    method = str(item.get("method", "GET")).upper()
+    if method != "GET":
+        raise BatchError("only GET requests are allowed in a batch")
+    path = item.get("path")
+    if not isinstance(path, str) or not path.startswith("/") or "?" in path or "://" in path:
+        raise BatchError("path must be an absolute API path without query string")
+    if not path.startswith("/api/"):
+        path = "/api" + path
+
+    query = item.get("query") or ""
+    if isinstance(query, dict):
+        query = urlencode(query, doseq=True)
+    elif not isinstance(query, str):
+        raise BatchError("query must be an object or a string")
+    return path, query.lstrip("?")
+
+
+def _run_one(app, path, query, identity, headers, request_id):
+    environ = EnvironBuilder(
+        path=path,
+        query_string=query,
+        method="GET",
+        headers=headers,
+    ).get_environ()
+    environ[BATCH_IDENTITY_KEY] = identity
+    environ["HTTP_X_REQUEST_ID"] = request_id
+
+    with app.request_context(environ):
+        if request.routing_exception is None and request.endpoint in EXCLUDED_ENDPOINTS:
+            return {"status": 400, "body": {"msg": "endpoint not allowed in a batch"}}
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            response = app.make_response(app.handle_exception(e))
+
+        result = {"status": response.status_code}
+        returned = {name: response.headers[name] for name in RETURNED_HEADERS if name in response.headers}
+        if returned:
+            result["headers"] = returned
+        # Sin Accept-Encoding la sub-respuesta nunca se comprime; el batch
+        # completo se comprime una sola vez
+        data = response.get_data()
+        if response.is_json:
+            result["body"] = app.json.loads(data) if data else None
+        elif response.status_code >= 400:
+            # Páginas de error HTML de werkzeug (404, 405)
+            result["body"] = {"msg": response.status}
+        else:
+            result["body"] = data.decode("utf-8", errors="replace")
+        return result
+
+
+def run_batch(app, items, identity, headers, request_id):
+    """Ejecuta las sub-peticiones en paralelo; una respuesta por item, en orden"""
+    results = [None] * len(items)
+    futures = {}
+    executor = _get_executor(app.config.get("BATCH_MAX_WORKERS", 4))
+    for index, item in enumerate(items):
+        try:
+            path, query = parse_item(item)
+        except BatchError as e:
+            results[index] = {"status": 400, "body": {"msg": str(e)}}
+            continue
+        futures[index] = executor.submit(
+            _run_one, app, path, query, identity, headers, f"{request_id}.{index}"
+        )
+
+    for index, future in futures.items():
+        try:
+            results[index] = future.result()
+        except Exception as e:
+            app.logger.exception("Batch sub-request failed")
+            results[index] = {"status": 500, "body": {"msg": "internal error", "error": str(e)}}
+    return results
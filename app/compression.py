@@ -0,0 +1,78 @@
+"""Compresión gzip/brotli de respuestas según Accept-Encoding.
+
+Solo se comprimen cuerpos en memoria de tipos de texto que superan
+COMPRESS_MIN_SIZE; las respuestas en streaming (SSE, archivos) se dejan igual.
+"""
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "text/html",
+    "text/css",
+    "text/csv",
+    "text/plain",
+    "text/javascript",
+    "image/svg+xml",
+)
+
+
+def _choose_encoding(accept_encodings):
+    """Codificación preferida por el cliente entre las disponibles"""
+    available = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = None
+    best_quality = 0
+    for encoding in available:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _should_compress(response, min_size):
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if "Content-Encoding" in response.headers:
+        return False
+    if response.mimetype not in COMPRESSIBLE_TYPES:
+        return False
+    return response.calculate_content_length() >= min_size
+
+
+def compress_body(data, encoding, level=6, brotli_quality=4):
+    if encoding == "br":
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def init_compression(app):
+    min_size = app.config.get("COMPRESS_MIN_SIZE", 1024)
+    level = app.config.get("COMPRESS_LEVEL", 6)
+    brotli_quality = app.config.get("COMPRESS_BR_QUALITY", 4)
+    if min_size <= 0:
+        return
+
+    @app.after_request
+    def compress_response(response):
+        if not _should_compress(response, min_size):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = _choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        response.set_data(compress_body(response.get_data(), encoding, level, brotli_quality))
+        response.headers["Content-Encoding"] = encoding
+        # El ETag describe el cuerpo sin comprimir
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -1,20 +1,12 @@
 import os
+import tempfile
 from datetime import timedelta
 from dotenv import load_dotenv
+from .database import build_engine_options
 
 load_dotenv()
 
-class Config:
-    # Claves necesarias
-    SECRET_KEY = os.getenv("SECRET_KEY", "supersecret123")
-    JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "jwtsecret456")
-
-    # Base de datos — Railway/Render proveen DATABASE_URL
-    database_url = os.getenv(
-        "DATABASE_URL",
-        "postgresql://localhost/yandhi_db"
-    )
-
+def normalize_database_url(database_url):
     # Corrección: 'postgres://' → 'postgresql+psycopg2://'
     if database_url.startswith("postgres://"):
         database_url = database_url.replace(
@@ -30,22 +22,161 @@ class Config:
             "postgresql+psycopg2://",
             1
         )
+    return database_url
+
+class Config:
+    # Claves necesarias
+    SECRET_KEY = os.getenv("SECRET_KEY", "supersecret123")
+    JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "jwtsecret456")
+
+    # Base de datos — Railway/Render proveen DATABASE_URL
+    database_url = normalize_database_url(os.getenv(
+        "DATABASE_URL",
+        "postgresql://localhost/yandhi_db"
+    ))
 
     SQLALCHEMY_DATABASE_URI = database_url
 
+    # Perfil de servicio (gunicorn.conf.py lee las mismas variables)
+    GUNICORN_WORKERS = int(os.getenv("GUNICORN_WORKERS", os.getenv("WEB_CONCURRENCY", "2")))
+    GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", "4"))
+
+    # Pool de conexiones por worker
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "0")) or None
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
     # Mejores prácticas de SQLAlchemy
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        "pool_pre_ping": True,
-        "pool_recycle": 300,
-    }
+    SQLALCHEMY_ENGINE_OPTIONS = build_engine_options(
+        database_url,
+        threads=GUNICORN_THREADS,
+        busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS,
+        pool_size=DB_POOL_SIZE,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+
+    # Réplica de lectura opcional para reportes y listados (ver app/replica.py)
+    replica_url = os.getenv("REPLICA_DATABASE_URL")
+    SQLALCHEMY_BINDS = {}
+    if replica_url:
+        replica_url = normalize_database_url(replica_url)
+        SQLALCHEMY_BINDS["replica"] = {
+            "url": replica_url,
+            **build_engine_options(
+                replica_url,
+                threads=GUNICORN_THREADS,
+                busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS,
+                pool_size=DB_POOL_SIZE,
+                pool_timeout=DB_POOL_TIMEOUT,
+            ),
+        }
+    # Segundos que un usuario lee de la principal después de escribir
+    REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "10"))
+    # Segundos sin usar la réplica después de un error
+    REPLICA_RETRY_SECONDS = int(os.getenv("REPLICA_RETRY_SECONDS", "30"))
 
     # Configuración de JWT (AGREGADO)
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_TOKEN_LOCATION = ['headers']
     JWT_HEADER_NAME = 'Authorization'
     JWT_HEADER_TYPE = 'Bearer'
+    # Rutas que aceptan ?token= (EventSource y enlaces de descarga no envían cabeceras)
+    JWT_QUERY_STRING_NAME = 'token'
     JWT_IDENTITY_CLAIM = 'sub'
     
+    # Serialización JSON: orjson si está instalado, "stdlib" fuerza el json estándar
+    JSON_ENCODER = os.getenv("JSON_ENCODER", "orjson")
+    # Compresión gzip/brotli de respuestas mayores a COMPRESS_MIN_SIZE bytes (0 la desactiva)
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+    COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+    COMPRESS_BR_QUALITY = int(os.getenv("COMPRESS_BR_QUALITY", "4"))
+
+    # /api/metrics sin token para scrapes desde la misma máquina
+    METRICS_ALLOW_LOCALHOST = os.getenv("METRICS_ALLOW_LOCALHOST", "true").lower() == "true"
+    # Directorio compartido por los workers de gunicorn para sumar sus métricas
+    # (gunicorn.conf.py pone uno por defecto); vacío = solo las de este proceso
+    METRICS_DIR = os.getenv("METRICS_DIR", "")
+    METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+    # Perfilado de consultas (app/profiling.py)
+    QUERY_PROFILING = os.getenv("QUERY_PROFILING", "false").lower() == "true"
+    SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", "500"))
+    N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
     # Logs
-    LOG_FILE = os.getenv("LOG_FILE", "app_operations.log")
\ No newline at end of file
+    LOG_FILE = os.getenv("LOG_FILE", "app_operations.log")
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+    LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "7"))
+    # Copia en stderr (la escribe el mismo hilo que el archivo)
+    LOG_CONSOLE = os.getenv("LOG_CONSOLE", "true").lower() == "true"
+    # Una línea JSON por petición (método, ruta, estado, duración)
+    LOG_REQUESTS = os.getenv("LOG_REQUESTS", "true").lower() == "true"
+
+    # Archivado de la tabla logs (flask archive-logs, app/log_archive.py)
+    LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "log_archive")
+    LOG_ARCHIVE_ROWS_PER_FILE = int(os.getenv("LOG_ARCHIVE_ROWS_PER_FILE", "100000"))
+
+    # Sincronización incremental (GET /api/sync/<entity>, app/sync.py)
+    SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "1000"))
+    # Margen para transacciones que confirman tarde: se reenvían los cambios de esta ventana
+    SYNC_LAG_SECONDS = int(os.getenv("SYNC_LAG_SECONDS", "30"))
+    # Días que se guardan las lápidas; un cursor más viejo fuerza una copia completa
+    SYNC_TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", "30"))
+
+    # Eventos en vivo (GET /api/events, app/events.py). Con gthread cada conexión
+    # SSE ocupa un hilo del worker mientras dura: gunicorn.conf.py suma a
+    # GUNICORN_THREADS un hilo por stream permitido, así los streams no le
+    # quitan hilos a las peticiones
+    EVENTS_MAX_CLIENTS = int(os.getenv("EVENTS_MAX_CLIENTS", "8"))
+    # Vida del token de POST /api/events/token (solo sirve para abrir el stream)
+    EVENTS_TOKEN_SECONDS = int(os.getenv("EVENTS_TOKEN_SECONDS", "60"))
+    EVENTS_STREAM_SECONDS = int(os.getenv("EVENTS_STREAM_SECONDS", "300"))
+    EVENTS_HEARTBEAT_SECONDS = int(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+    EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "1.0"))
+    EVENTS_RETENTION_HOURS = int(os.getenv("EVENTS_RETENTION_HOURS", "24"))
+
+    # POST /api/batch: máximo de sub-peticiones por llamada y hilos por worker.
+    # Cada hilo ocupa una conexión del pool mientras corre su sub-petición
+    BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "10"))
+    BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "4"))
+
+    # GET /api/products/lookup (app/product_lookup.py): recarga completa del
+    # mapa de códigos en memoria, por si algún worker perdió un evento
+    PRODUCT_LOOKUP_MAX_AGE = int(os.getenv("PRODUCT_LOOKUP_MAX_AGE", "600"))
+    # GET /api/autocomplete (app/autocomplete.py): igual, para el índice de nombres
+    AUTOCOMPLETE_MAX_AGE = int(os.getenv("AUTOCOMPLETE_MAX_AGE", "600"))
+
+    # Reportes y exportaciones en segundo plano (POST /api/jobs, app/jobs.py).
+    # Hilos de trabajo por proceso web; 0 si corre `flask worker` aparte
+    JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "1"))
+    JOBS_RESULT_DIR = os.getenv("JOBS_RESULT_DIR", "job_results")
+    # Un pedido idéntico a un trabajo terminado hace menos de esto reutiliza su archivo
+    JOBS_CACHE_SECONDS = int(os.getenv("JOBS_CACHE_SECONDS", "300"))
+    JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1.0"))
+    # Un trabajo en curso sin heartbeat en este tiempo vuelve a la cola
+    JOBS_STALE_SECONDS = int(os.getenv("JOBS_STALE_SECONDS", "300"))
+    JOBS_RETENTION_HOURS = int(os.getenv("JOBS_RETENTION_HOURS", "24"))
+
+    # Control de admisión (app/admission.py): fichas por segundo y ráfaga por
+    # usuario para rutas normal y expensive; cheap y priority no tienen límite
+    ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() == "true"
+    # Estado compartido entre workers de la misma máquina
+    ADMISSION_STORE = os.getenv("ADMISSION_STORE", os.path.join(tempfile.gettempdir(), "crud-yandhi-admission.sqlite"))
+    ADMISSION_NORMAL_RATE = float(os.getenv("ADMISSION_NORMAL_RATE", "10"))
+    ADMISSION_NORMAL_BURST = int(os.getenv("ADMISSION_NORMAL_BURST", "40"))
+    ADMISSION_EXPENSIVE_RATE = float(os.getenv("ADMISSION_EXPENSIVE_RATE", "0.2"))
+    ADMISSION_EXPENSIVE_BURST = int(os.getenv("ADMISSION_EXPENSIVE_BURST", "5"))
+    # Rutas expensive en paralelo sumando todos los workers; el resto de los
+    # hilos queda libre para el cobro y las rutas baratas
+    ADMISSION_EXPENSIVE_MAX = int(os.getenv(
+        "ADMISSION_EXPENSIVE_MAX", str(max(1, GUNICORN_WORKERS * GUNICORN_THREADS // 4))
+    ))
+    # Vencimiento de un lugar del cupo si el worker muere sin liberarlo
+    ADMISSION_SLOT_TTL = int(os.getenv("ADMISSION_SLOT_TTL", "120"))
+    # Statement timeout por clase de ruta (0 = sin límite). El cobro no se corta
+    STATEMENT_TIMEOUT_CHEAP_MS = int(os.getenv("STATEMENT_TIMEOUT_CHEAP_MS", "2000"))
+    STATEMENT_TIMEOUT_NORMAL_MS = int(os.getenv("STATEMENT_TIMEOUT_NORMAL_MS", "10000"))
+    STATEMENT_TIMEOUT_EXPENSIVE_MS = int(os.getenv("STATEMENT_TIMEOUT_EXPENSIVE_MS", "30000"))
+    STATEMENT_TIMEOUT_PRIORITY_MS = int(os.getenv("STATEMENT_TIMEOUT_PRIORITY_MS", "0"))
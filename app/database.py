@@ -0,0 +1,130 @@
+"""Ajustes del engine de SQLAlchemy por driver y métricas del pool."""
+import logging
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from . import metrics
+
+pool_checkout_wait = metrics.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Tiempo esperando una conexión libre del pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0),
+)
+pool_checkout_timeouts = metrics.counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts que agotaron pool_timeout",
+)
+
+_pools = []
+
+# SQLAlchemy nombra el logger del pool con el módulo de la clase; al vivir en
+# "app." heredaría el nivel INFO del logger de la app
+logging.getLogger(__name__ + ".TimedQueuePool").setLevel(logging.WARNING)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que mide cuánto espera cada checkout"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _pools.append(self)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_checkout_timeouts.inc()
+            raise
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        if self in _pools:
+            _pools.remove(self)
+        return pool
+
+
+def _pool_status():
+    samples = {}
+    for index, pool in enumerate(_pools):
+        samples[(str(index), "checked_out")] = pool.checkedout()
+        samples[(str(index), "idle")] = pool.checkedin()
+        samples[(str(index), "overflow")] = max(pool.overflow(), 0)
+    return samples
+
+
+metrics.gauge(
+    "db_pool_connections",
+    "Conexiones del pool por estado",
+    labels=("pool", "state"),
+    callback=_pool_status,
+)
+
+
+def build_engine_options(database_url, threads, busy_timeout_ms=5000, pool_size=None, pool_timeout=10):
+    """Opciones de create_engine según el driver y la concurrencia del worker.
+
+    Cada worker de gunicorn tiene su propio pool, así que se dimensiona con
+    los hilos del worker (uno por petición concurrente) más un margen para
+    hilos de fondo. El total de conexiones es workers * (pool_size + max_overflow).
+    """
+    size = pool_size or threads + 1
+    options = {
+        "pool_pre_ping": True,
+        "pool_recycle": 300,
+    }
+    pooled = {
+        "poolclass": TimedQueuePool,
+        "pool_size": size,
+        "max_overflow": max(2, size // 2),
+        "pool_timeout": pool_timeout,
+    }
+
+    if database_url.startswith("postgresql"):
+        options.update(pooled)
+        options.update({
+            "pool_use_lifo": True,
+            "isolation_level": "READ COMMITTED",
+            "connect_args": {"connect_timeout": 10, "application_name": "crud-yandhi"},
+        })
+    elif database_url.startswith("mysql"):
+        options.update(pooled)
+        options.update({
+            "isolation_level": "READ COMMITTED",
+            "connect_args": {"connect_timeout": 10, "charset": "utf8mb4"},
+        })
+    elif database_url.startswith("sqlite"):
+        # WAL y busy_timeout se aplican al conectar (configure_engine)
+        options = {
+            "connect_args": {"timeout": busy_timeout_ms / 1000, "check_same_thread": False},
+        }
+        if ":memory:" not in database_url and database_url.rstrip("/") != "sqlite:":
+            options.update(pooled)
+    return options
+
+
+def _sqlite_pragmas(busy_timeout_ms):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+    return on_connect
+
+
+def configure_engine(app, engine):
+    """Ajustes que requieren el engine ya creado"""
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _sqlite_pragmas(app.config.get("SQLITE_BUSY_TIMEOUT_MS", 5000)))
+
+
+def dispose_engines(app, db):
+    """Descarta las conexiones heredadas del proceso padre (post_fork de gunicorn)"""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
@@ -0,0 +1,222 @@
+"""Eventos en vivo (SSE) con la tabla events como outbox.
+
+Las rutas llaman emit() antes de su commit, así el evento existe solo si la
+escritura se confirmó. En cada proceso un único hilo lee los eventos nuevos
+y los reparte a todos sus clientes SSE y a los callbacks registrados con
+hub.add_listener() (invalidación de caches entre workers). El trabajo por
+evento no depende del número de clientes: el frame SSE se arma una vez.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from . import db
+from .models import Event
+
+logger = logging.getLogger(__name__)
+
+# Un cliente que no alcanza a leer se desconecta; al reconectar recupera
+# lo perdido con Last-Event-ID
+CLIENT_QUEUE_SIZE = 1000
+REPLAY_LIMIT = 1000
+POLL_BATCH = 500
+
+
+def emit(event_type, **data):
+    """Agrega un evento a la sesión actual; se publica con el commit"""
+    db.session.add(Event(type=event_type, payload=json.dumps(data, separators=(",", ":"))))
+
+
+def format_frame(event_id, event_type, payload):
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+
+class Client:
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.dropped = False
+
+
+class EventHub:
+    def __init__(self):
+        self._app = None
+        self._lock = threading.Lock()
+        self._clients = set()
+        self._listeners = []
+        self._thread = None
+        self._last_id = None
+        # ids que faltaron en una lectura: pueden pertenecer a una transacción
+        # que todavía no confirma (las secuencias no respetan el orden de commit)
+        self._gaps = {}
+        self._last_prune = 0.0
+
+    def init_app(self, app):
+        self._app = app
+        # Los hilos no sobreviven a fork (gunicorn --preload)
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+        @app.before_request
+        def start_event_listeners():
+            if self._listeners:
+                self._ensure_started()
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._clients = set()
+        self._thread = None
+        self._last_id = None
+        self._gaps = {}
+
+    def add_listener(self, callback):
+        """callback(event) en el hilo del hub por cada evento; event es un dict"""
+        self._listeners.append(callback)
+
+    def subscribe(self):
+        """Registra un cliente SSE; None si el proceso ya tiene el máximo"""
+        with self._lock:
+            if len(self._clients) >= self._app.config.get("EVENTS_MAX_CLIENTS", 10):
+                return None
+            client = Client()
+            self._clients.add(client)
+        self._ensure_started()
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+
+    def client_count(self):
+        return len(self._clients)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="event-hub", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        interval = self._app.config.get("EVENTS_POLL_INTERVAL", 1.0)
+        while True:
+            try:
+                with self._app.app_context():
+                    try:
+                        while self._poll() == POLL_BATCH:
+                            pass
+                        self._prune()
+                    finally:
+                        db.session.remove()
+            except Exception:
+                logger.exception("Event hub poll failed")
+            time.sleep(interval)
+
+    def _poll(self):
+        if self._last_id is None:
+            # No se reenvía el historial: solo lo que llegue desde ahora
+            self._last_id = db.session.query(db.func.max(Event.id)).scalar() or 0
+            return 0
+
+        now = time.monotonic()
+        gap_seconds = self._app.config.get("EVENTS_GAP_SECONDS", 10)
+        self._gaps = {i: seen for i, seen in self._gaps.items() if now - seen < gap_seconds}
+
+        condition = Event.id > self._last_id
+        if self._gaps:
+            condition = condition | Event.id.in_(list(self._gaps))
+        rows = db.session.query(Event.id, Event.type, Event.payload)\
+            .filter(condition).order_by(Event.id).limit(POLL_BATCH).all()
+        if not rows:
+            return 0
+
+        for row in rows:
+            self._gaps.pop(row.id, None)
+            if row.id > self._last_id:
+                for missing in range(self._last_id + 1, row.id):
+                    self._gaps[missing] = now
+                self._last_id = row.id
+        self._dispatch(rows)
+        return len(rows)
+
+    def _dispatch(self, rows):
+        for row in rows:
+            frame = format_frame(row.id, row.type, row.payload)
+            with self._lock:
+                clients = list(self._clients)
+            for client in clients:
+                try:
+                    client.queue.put_nowait((row.id, frame))
+                except queue.Full:
+                    client.dropped = True
+                    self.unsubscribe(client)
+
+            if self._listeners:
+                event = {"id": row.id, "type": row.type, "data": json.loads(row.payload)}
+                for callback in self._listeners:
+                    try:
+                        callback(event)
+                    except Exception:
+                        logger.exception("Event listener %r failed", callback)
+
+    def _prune(self):
+        """Borra eventos viejos, como mucho una vez cada 10 minutos por proceso"""
+        if time.monotonic() - self._last_prune < 600:
+            return
+        self._last_prune = time.monotonic()
+        hours = self._app.config.get("EVENTS_RETENTION_HOURS", 24)
+        cutoff = datetime.utcnow() - timedelta(hours=hours)
+        Event.query.filter(Event.created_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+
+
+hub = EventHub()
+
+
+def replay(after_id):
+    """Eventos posteriores a after_id como frames; el bool indica si faltan"""
+    rows = db.session.query(Event.id, Event.type, Event.payload)\
+        .filter(Event.id > after_id).order_by(Event.id).limit(REPLAY_LIMIT + 1).all()
+    frames = [(row.id, format_frame(row.id, row.type, row.payload)) for row in rows[:REPLAY_LIMIT]]
+    # Los eventos siguientes a after_id ya se borraron por antigüedad
+    oldest = db.session.query(db.func.min(Event.id)).scalar()
+    pruned = oldest is not None and oldest > after_id + 1
+    return frames, len(rows) > REPLAY_LIMIT or pruned
+
+
+def stream(client, backlog, truncated):
+    """Generador de la respuesta text/event-stream"""
+    config = current_app.config
+    heartbeat = config.get("EVENTS_HEARTBEAT_SECONDS", 15)
+    deadline = time.monotonic() + config.get("EVENTS_STREAM_SECONDS", 300)
+    retry_ms = config.get("EVENTS_RETRY_MS", 5000)
+
+    def generate():
+        try:
+            yield f"retry: {retry_ms}\n\n"
+            if truncated:
+                # Demasiado atrasado (o ya se borraron): el cliente recarga todo
+                yield "event: resync\ndata: {}\n\n"
+            # Lo reenviado puede llegar también por la cola
+            replayed = set()
+            for event_id, frame in backlog:
+                replayed.add(event_id)
+                yield frame
+            # El servidor cierra cada tanto para liberar el hilo; el navegador
+            # reconecta solo con Last-Event-ID
+            while time.monotonic() < deadline and not client.dropped:
+                try:
+                    event_id, frame = client.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                if event_id not in replayed:
+                    yield frame
+        finally:
+            hub.unsubscribe(client)
+
+    return generate()
@@ -0,0 +1,22 @@
+"""ETag y respuestas 304 para las lecturas JSON.
+
+El ETag es el hash del cuerpo sin comprimir. Si el cliente lo manda en
+If-None-Match y no cambió, se responde 304 sin cuerpo: la consulta se hace
+igual, pero no se comprime ni viaja por la red. Cache-Control no-cache obliga
+al navegador a revalidar siempre (son datos por usuario).
+"""
+from flask import request
+
+
+def init_etags(app):
+    # Registrar después de init_compression: los after_request corren en orden
+    # inverso, así el hash se calcula sobre el cuerpo sin comprimir
+    @app.after_request
+    def add_etag(response):
+        if request.method != "GET" or response.status_code != 200:
+            return response
+        if response.is_streamed or response.direct_passthrough or response.mimetype != "application/json":
+            return response
+        response.add_etag()
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response.make_conditional(request)
@@ -0,0 +1,86 @@
+"""Instrumentación por petición: latencia, tamaño, estado y SQL por endpoint."""
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from . import metrics
+
+request_latency = metrics.histogram(
+    "http_request_duration_seconds",
+    "Latencia de las peticiones por endpoint",
+    labels=("endpoint", "method"),
+)
+request_count = metrics.counter(
+    "http_requests_total",
+    "Peticiones por endpoint y código de estado",
+    labels=("endpoint", "method", "status"),
+)
+response_size = metrics.histogram(
+    "http_response_size_bytes",
+    "Tamaño del cuerpo de la respuesta",
+    labels=("endpoint",),
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+request_queries = metrics.histogram(
+    "http_request_db_queries",
+    "Sentencias SQL ejecutadas por petición",
+    labels=("endpoint",),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+request_db_time = metrics.histogram(
+    "http_request_db_seconds",
+    "Tiempo en la base de datos por petición",
+    labels=("endpoint",),
+)
+db_queries = metrics.counter(
+    "db_queries_total",
+    "Sentencias SQL ejecutadas (incluye fuera de peticiones)",
+)
+
+
+# El inicio va en el contexto de ejecución y no en conn.info: si la sentencia
+# falla after_cursor_execute no corre y el valor quedaría en la conexión del pool
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start", None)
+    elapsed = time.perf_counter() - start if start is not None else 0.0
+    db_queries.inc()
+    if has_request_context():
+        g.sql_count = g.get("sql_count", 0) + 1
+        g.sql_time = g.get("sql_time", 0.0) + elapsed
+
+
+def instrument_engine(engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def init_request_metrics(app, engines):
+    for engine in engines:
+        instrument_engine(engine)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.get("request_start")
+        if start is None:
+            return response
+        endpoint = request.endpoint or "unmatched"
+        request_latency.observe(time.perf_counter() - start, endpoint, request.method)
+        request_count.inc(1, endpoint, request.method, str(response.status_code))
+        if not response.is_streamed:
+            length = response.calculate_content_length()
+            if length is not None:
+                response_size.observe(length, endpoint)
+        request_queries.observe(g.get("sql_count", 0), endpoint)
+        request_db_time.observe(g.get("sql_time", 0.0), endpoint)
+        return response
@@ -0,0 +1,277 @@
+"""Libro de movimientos de inventario.
+
+Cada cambio de stock se inserta en inventory_movements y el saldo de
+products.stock se actualiza con un UPDATE relativo (stock = stock + delta), sin
+leer y reescribir el valor en Python. Los saldos periódicos de
+inventory_snapshots permiten calcular el stock en una fecha con un snapshot
+más los movimientos posteriores, sin recorrer todo el libro.
+"""
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, func, insert, literal, select, update
+from . import db
+from .models import InventoryMovement, InventorySnapshot, LowStockTransition, Product
+from .queries import DEFAULT_MIN_STOCK
+
+MOVEMENT_KINDS = ("opening", "sale", "return", "adjustment", "receipt")
+
+# Los movimientos más recientes que esto pueden pertenecer a transacciones
+# que todavía no confirman; el snapshot no los incluye
+SNAPSHOT_LAG = timedelta(minutes=1)
+
+# Lo mismo para el cursor de transiciones: en Postgres/MySQL una venta
+# concurrente puede confirmar un id menor después de que se leyó uno mayor
+TRANSITIONS_LAG = timedelta(seconds=30)
+
+
+class InsufficientStock(ValueError):
+    """Un movimiento dejaría el stock en negativo"""
+
+    def __init__(self, product_ids):
+        super().__init__(f"insufficient stock for products: {sorted(product_ids)}")
+        self.product_ids = product_ids
+
+
+def apply_movements(movements, user_id=None, allow_negative=False, batch_id=None):
+    """Inserta los movimientos y actualiza products.stock; devuelve {product_id: stock}.
+
+    movements es una lista de dicts con product_id, kind, quantity (con signo) y
+    reference opcional. Todos comparten batch_id y el stock de todos los
+    productos se actualiza con un solo UPDATE correlacionado con el lote.
+    Corre en la transacción actual; el llamador hace commit.
+    """
+    movements = [m for m in movements if m["quantity"]]
+    if not movements:
+        return {}
+    # Productos y ventas recién creados tienen que existir antes de las FKs
+    db.session.flush()
+    now = datetime.utcnow()
+    batch_id = batch_id or uuid.uuid4().hex
+    db.session.execute(insert(InventoryMovement), [
+        {
+            "product_id": m["product_id"],
+            "kind": m["kind"],
+            "quantity": m["quantity"],
+            "reference": m.get("reference"),
+            "batch_id": batch_id,
+            "user_id": user_id,
+            "created_at": now,
+        }
+        for m in movements
+    ])
+
+    products = Product.__table__
+    batch = InventoryMovement.__table__.alias("batch")
+    delta = (
+        select(func.sum(batch.c.quantity))
+        .where(batch.c.batch_id == batch_id, batch.c.product_id == products.c.id)
+        .scalar_subquery()
+    )
+    in_batch = select(batch.c.product_id).where(batch.c.batch_id == batch_id)
+    db.session.execute(
+        update(products)
+        .where(products.c.id.in_(in_batch))
+        .values(stock=func.coalesce(products.c.stock, 0) + delta, updated_at=now)
+    )
+
+    # El UPDATE ya bloqueó las filas: este saldo incluye ventas concurrentes
+    product_ids = {m["product_id"] for m in movements}
+    stocks = dict(db.session.execute(
+        select(products.c.id, products.c.stock).where(products.c.id.in_(product_ids))
+    ).all())
+    refresh_low_stock(product_ids)
+    if not allow_negative:
+        decreased = {m["product_id"] for m in movements if m["quantity"] < 0}
+        negative = [pid for pid in decreased if stocks.get(pid, 0) < 0]
+        if negative:
+            raise InsufficientStock(negative)
+    return stocks
+
+
+def refresh_low_stock(product_ids=None):
+    """Actualiza is_low_stock de los productos dados (o todos) y registra las transiciones.
+
+    Solo lee y escribe las filas cuya bandera cambió; devuelve cuántas fueron.
+    """
+    db.session.flush()
+    products = Product.__table__
+    min_stock = func.coalesce(products.c.min_stock, DEFAULT_MIN_STOCK)
+    low = func.coalesce(products.c.stock, 0) <= min_stock
+    query = select(products.c.id, products.c.stock, min_stock.label("min_stock"), low.label("low"))\
+        .where(products.c.is_low_stock != low)
+    if product_ids is not None:
+        query = query.where(products.c.id.in_(list(product_ids)))
+    changed = db.session.execute(query).all()
+    if not changed:
+        return 0
+
+    db.session.execute(
+        update(products).where(products.c.id == bindparam("pid")).values(is_low_stock=bindparam("low")),
+        [{"pid": r.id, "low": bool(r.low)} for r in changed],
+    )
+    now = datetime.utcnow()
+    db.session.execute(insert(LowStockTransition), [
+        {"product_id": r.id, "low": bool(r.low), "stock": r.stock or 0, "min_stock": r.min_stock, "created_at": now}
+        for r in changed
+    ])
+    return len(changed)
+
+
+def transitions(after=0, limit=500):
+    """Transiciones de stock bajo posteriores al id after, en orden.
+
+    Solo las de hace más de TRANSITIONS_LAG: su transacción ya confirmó, así
+    que un id menor no puede aparecer después de avanzar el cursor.
+    """
+    rows = db.session.execute(
+        select(LowStockTransition.__table__)
+        .where(LowStockTransition.id > after, LowStockTransition.created_at < datetime.utcnow() - TRANSITIONS_LAG)
+        .order_by(LowStockTransition.id)
+        .limit(limit)
+    ).mappings().all()
+    return [dict(row) for row in rows]
+
+
+def set_stock(product_id, stock, user_id=None, reference=None):
+    """Ajuste a un stock absoluto (edición manual del producto)"""
+    current = db.session.execute(
+        select(Product.stock).where(Product.id == product_id).with_for_update()
+    ).scalar() or 0
+    return apply_movements(
+        [{"product_id": product_id, "kind": "adjustment", "quantity": stock - current, "reference": reference}],
+        user_id=user_id,
+        allow_negative=True,
+    )
+
+
+def record_opening_balances():
+    """Movimiento de apertura para los productos que todavía no tienen ninguno"""
+    movements = InventoryMovement.__table__
+    products = Product.__table__
+    has_movements = select(movements.c.id).where(movements.c.product_id == products.c.id).exists()
+    result = db.session.execute(insert(movements).from_select(
+        ["product_id", "kind", "quantity", "reference", "created_at"],
+        select(
+            products.c.id,
+            literal("opening"),
+            func.coalesce(products.c.stock, 0),
+            literal("opening balance"),
+            literal(datetime.utcnow()),
+        ).where(~has_movements),
+    ))
+    db.session.commit()
+    return result.rowcount
+
+
+def _latest_snapshots(at=None):
+    """Subconsulta con el último snapshot de cada producto (hasta la fecha at)"""
+    snapshots = InventorySnapshot.__table__
+    latest = select(func.max(snapshots.c.id).label("id")).group_by(snapshots.c.product_id)
+    if at is not None:
+        latest = latest.where(snapshots.c.taken_at <= at)
+    return select(snapshots).where(snapshots.c.id.in_(latest)).subquery()
+
+
+def take_snapshot():
+    """Guarda el saldo de cada producto con movimientos desde su último snapshot"""
+    movements = InventoryMovement.__table__
+    cutoff = datetime.utcnow() - SNAPSHOT_LAG
+    upper = db.session.execute(
+        select(func.max(movements.c.id)).where(movements.c.created_at < cutoff)
+    ).scalar()
+    if upper is None:
+        return 0
+
+    last = _latest_snapshots()
+    delta = (
+        select(
+            movements.c.product_id,
+            (func.coalesce(func.max(last.c.stock), 0) + func.sum(movements.c.quantity)).label("stock"),
+            func.max(movements.c.id).label("last_movement_id"),
+        )
+        .select_from(movements.outerjoin(last, last.c.product_id == movements.c.product_id))
+        .where(
+            movements.c.id > func.coalesce(last.c.last_movement_id, 0),
+            movements.c.id <= upper,
+        )
+        .group_by(movements.c.product_id)
+    )
+    rows = [
+        {"product_id": r.product_id, "stock": r.stock, "last_movement_id": r.last_movement_id, "taken_at": cutoff}
+        for r in db.session.execute(delta)
+    ]
+    if rows:
+        db.session.execute(insert(InventorySnapshot), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def stock_at(at, product_ids=None):
+    """{product_id: stock} en la fecha at: último snapshot anterior + movimientos hasta at"""
+    movements = InventoryMovement.__table__
+    snap = _latest_snapshots(at)
+    base = select(snap.c.product_id, snap.c.stock, snap.c.last_movement_id)
+    if product_ids is not None:
+        base = base.where(snap.c.product_id.in_(product_ids))
+    result = {r.product_id: r.stock for r in db.session.execute(base)}
+
+    delta = (
+        select(movements.c.product_id, func.sum(movements.c.quantity).label("quantity"))
+        .select_from(movements.outerjoin(snap, snap.c.product_id == movements.c.product_id))
+        .where(
+            movements.c.id > func.coalesce(snap.c.last_movement_id, 0),
+            movements.c.created_at <= at,
+        )
+        .group_by(movements.c.product_id)
+    )
+    if product_ids is not None:
+        delta = delta.where(movements.c.product_id.in_(product_ids))
+    for r in db.session.execute(delta):
+        result[r.product_id] = result.get(r.product_id, 0) + r.quantity
+    return result
+
+
+def reconcile(fix=False):
+    """Compara products.stock con la suma del libro; devuelve [(id, stock, libro)]"""
+    movements = InventoryMovement.__table__
+    products = Product.__table__
+    ledger = (
+        select(movements.c.product_id, func.sum(movements.c.quantity).label("total"))
+        .group_by(movements.c.product_id)
+        .subquery()
+    )
+    query = (
+        select(products.c.id, func.coalesce(products.c.stock, 0), func.coalesce(ledger.c.total, 0))
+        .select_from(products.outerjoin(ledger, ledger.c.product_id == products.c.id))
+        .where(func.coalesce(products.c.stock, 0) != func.coalesce(ledger.c.total, 0))
+        .order_by(products.c.id)
+    )
+    mismatches = [tuple(r) for r in db.session.execute(query)]
+    if fix and mismatches:
+        # El libro es la fuente de verdad
+        db.session.execute(
+            update(products).where(products.c.id == bindparam("pid"))
+            .values(stock=bindparam("total"), updated_at=datetime.utcnow()),
+            [{"pid": pid, "total": total} for pid, _, total in mismatches],
+        )
+        refresh_low_stock([pid for pid, _, _ in mismatches])
+        db.session.commit()
+    return mismatches
+
+
+def movements_for(product_id, before=None, limit=100):
+    """Movimientos de un producto, del más reciente al más viejo"""
+    query = InventoryMovement.query.filter_by(product_id=product_id)
+    if before is not None:
+        query = query.filter(InventoryMovement.id < before)
+    return [
+        {
+            "id": m.id,
+            "kind": m.kind,
+            "quantity": m.quantity,
+            "reference": m.reference,
+            "user_id": m.user_id,
+            "created_at": m.created_at,
+        }
+        for m in query.order_by(InventoryMovement.id.desc()).limit(limit)
+    ]
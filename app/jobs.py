@@ -0,0 +1,364 @@
+"""Reportes y exportaciones en segundo plano, sin broker externo.
+
+POST /api/jobs inserta una fila en jobs y responde de inmediato; un worker la
+toma, genera el archivo en JOBS_RESULT_DIR y guarda el avance en la fila.
+Los workers son hilos del proceso web (JOBS_WORKERS por proceso) o un proceso
+aparte con `flask worker`. Para tomar un trabajo basta un UPDATE condicionado
+a status='queued': si otro worker lo tomó primero, el UPDATE no afecta filas.
+
+Un pedido idéntico (mismo tipo y parámetros) a uno pendiente, en curso o
+terminado hace menos de JOBS_CACHE_SECONDS reutiliza ese trabajo.
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import desc, func, select, update
+from . import db
+from .models import Customer, Job, Product, Sale, SaleItem, User
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+EXPORT_CHUNK = 5000
+
+
+class JobError(ValueError):
+    """Tipo de trabajo o parámetros inválidos"""
+
+
+def _date_range(params):
+    """start/end ISO obligatorios -> (datetime, datetime) normalizados"""
+    try:
+        start = datetime.fromisoformat(params["start"])
+        end = datetime.fromisoformat(params["end"])
+    except (KeyError, TypeError, ValueError):
+        raise JobError("params.start and params.end must be ISO dates")
+    if end < start:
+        raise JobError("params.end must not be before params.start")
+    return start, end
+
+
+# ==================== TIPOS DE TRABAJO ====================
+# Cada tipo valida sus parámetros y escribe el resultado en path; progress(pct)
+# guarda el avance. Devuelve el content type del archivo.
+
+def _validate_range(params):
+    start, end = _date_range(params)
+    return {"start": start.isoformat(), "end": end.isoformat()}
+
+
+def sales_report(params, path, progress):
+    """Totales por día y productos más vendidos del rango (JSON)"""
+    start, end = _date_range(params)
+    in_range = (Sale.created_at >= start, Sale.created_at <= end)
+    day = func.date(Sale.created_at)
+    by_day = db.session.execute(
+        select(day.label("day"), func.count(Sale.id), func.sum(Sale.total))
+        .where(*in_range).group_by(day).order_by(day)
+    ).all()
+    progress(50)
+    top = db.session.execute(
+        select(Product.id, Product.name, func.sum(SaleItem.quantity).label("quantity"), func.sum(SaleItem.subtotal))
+        .join(SaleItem, SaleItem.product_id == Product.id)
+        .join(Sale, Sale.id == SaleItem.sale_id)
+        .where(*in_range)
+        .group_by(Product.id, Product.name)
+        .order_by(desc("quantity"))
+        .limit(50)
+    ).all()
+    report = {
+        "start": params["start"],
+        "end": params["end"],
+        "count": sum(row[1] for row in by_day),
+        "total": round(sum(row[2] or 0 for row in by_day), 2),
+        "by_day": [{"day": str(row[0]), "count": row[1], "total": round(row[2] or 0, 2)} for row in by_day],
+        "top_products": [
+            {"product_id": row[0], "product": row[1], "quantity": row[2], "revenue": round(row[3] or 0, 2)} for row in top
+        ],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False)
+    return "application/json"
+
+
+def sales_export(params, path, progress):
+    """Una fila por línea de venta del rango (CSV), leída por bloques de id"""
+    start, end = _date_range(params)
+    in_range = (Sale.created_at >= start, Sale.created_at <= end)
+    total = db.session.execute(select(func.count(Sale.id)).where(*in_range)).scalar() or 0
+    query = (
+        select(
+            Sale.id, Sale.created_at, Customer.name, User.username, Sale.payment_method,
+            SaleItem.product_id, Product.name, SaleItem.quantity, SaleItem.unit_price, SaleItem.subtotal,
+        )
+        .join(SaleItem, SaleItem.sale_id == Sale.id)
+        .join(Product, Product.id == SaleItem.product_id)
+        .outerjoin(Customer, Customer.id == Sale.customer_id)
+        .outerjoin(User, User.id == Sale.user_id)
+        .where(*in_range)
+        .order_by(Sale.id, SaleItem.id)
+    )
+    done, last_id = 0, 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["sale_id", "created_at", "customer", "user", "payment_method",
+                         "product_id", "product", "quantity", "unit_price", "subtotal"])
+        while True:
+            # Bloques por id de venta: cada consulta usa el índice y no hay OFFSET
+            ids = db.session.execute(
+                select(Sale.id).where(*in_range, Sale.id > last_id).order_by(Sale.id).limit(EXPORT_CHUNK)
+            ).scalars().all()
+            if not ids:
+                break
+            writer.writerows(db.session.execute(query.where(Sale.id.in_(ids))))
+            last_id = ids[-1]
+            done += len(ids)
+            progress(int(done * 100 / max(total, 1)))
+    return "text/csv"
+
+
+def products_export(params, path, progress):
+    """Catálogo con stock y precios (CSV)"""
+    from . import queries
+    fields = ["id", "sku", "name", "category", "price", "iva", "price_with_iva", "stock", "min_stock",
+              "is_low_stock", "supplier_name"]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        writer.writerows([row[name] for name in fields] for row in queries.products(fields=fields))
+    return "text/csv"
+
+
+# tipo -> (validación de params, función, extensión del archivo)
+JOB_KINDS = {
+    "sales-report": (_validate_range, sales_report, "json"),
+    "sales-export": (_validate_range, sales_export, "csv"),
+    "products-export": (lambda params: {}, products_export, "csv"),
+}
+
+
+# ==================== COLA ====================
+def cache_key(kind, params):
+    raw = json.dumps([kind, params], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def enqueue(kind, params, user_id=None):
+    """Crea el trabajo o devuelve uno equivalente; (job, reutilizado)"""
+    if kind not in JOB_KINDS:
+        raise JobError(f"kind must be one of: {', '.join(JOB_KINDS)}")
+    if params is not None and not isinstance(params, dict):
+        raise JobError("params must be an object")
+    validate, _, _ = JOB_KINDS[kind]
+    params = validate(params or {})
+    key = cache_key(kind, params)
+
+    fresh = datetime.utcnow() - timedelta(seconds=current_app.config["JOBS_CACHE_SECONDS"])
+    existing = Job.query.filter(
+        Job.cache_key == key,
+        Job.status.in_(("queued", "running")) | ((Job.status == "done") & (Job.finished_at >= fresh)),
+    ).order_by(Job.id.desc()).first()
+    if existing is not None and (existing.status != "done" or os.path.exists(existing.result_path or "")):
+        return existing, True
+
+    job = Job(kind=kind, params=json.dumps(params), cache_key=key, status="queued", progress=0,
+              attempts=0, user_id=user_id)
+    db.session.add(job)
+    db.session.commit()
+    return job, False
+
+
+def claim_next():
+    """Marca como running el trabajo pendiente más viejo; None si no hay"""
+    while True:
+        job_id = db.session.execute(
+            select(Job.id).where(Job.status == "queued").order_by(Job.id).limit(1)
+        ).scalar()
+        if job_id is None:
+            return None
+        now = datetime.utcnow()
+        claimed = db.session.execute(
+            update(Job).where(Job.id == job_id, Job.status == "queued")
+            .values(status="running", started_at=now, heartbeat_at=now, attempts=Job.attempts + 1)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, job_id)
+
+
+def _heartbeat(app, job_id, stop, interval):
+    """Marca el trabajo como vivo mientras corre, reporte avance o no"""
+    while not stop.wait(interval):
+        with app.app_context():
+            try:
+                db.session.execute(
+                    update(Job).where(Job.id == job_id, Job.status == "running")
+                    .values(heartbeat_at=datetime.utcnow())
+                )
+                db.session.commit()
+            except Exception:
+                logger.exception("Heartbeat of job %s failed", job_id)
+            finally:
+                db.session.remove()
+
+
+def run(job):
+    """Ejecuta el trabajo ya tomado y guarda el resultado o el error"""
+    _, function, extension = JOB_KINDS[job.kind]
+    result_dir = current_app.config["JOBS_RESULT_DIR"]
+    os.makedirs(result_dir, exist_ok=True)
+    path = os.path.abspath(os.path.join(result_dir, f"job-{job.id}-{uuid.uuid4().hex[:8]}.{extension}"))
+
+    def progress(pct):
+        db.session.execute(
+            update(Job).where(Job.id == job.id)
+            .values(progress=max(0, min(int(pct), 99)), heartbeat_at=datetime.utcnow())
+        )
+        db.session.commit()
+
+    # Un hilo aparte mantiene el heartbeat: requeue_stale no debe repetir un
+    # trabajo largo que sigue corriendo
+    stop = threading.Event()
+    beat = threading.Thread(
+        target=_heartbeat,
+        args=(current_app._get_current_object(), job.id, stop, max(current_app.config["JOBS_STALE_SECONDS"] / 3, 1)),
+        name=f"job-heartbeat-{job.id}",
+        daemon=True,
+    )
+    started = time.monotonic()
+    beat.start()
+    try:
+        content_type = function(json.loads(job.params), path, progress)
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Job %s (%s) failed", job.id, job.kind)
+        if os.path.exists(path):
+            os.remove(path)
+        db.session.execute(update(Job).where(Job.id == job.id).values(
+            status="failed", error=str(e), finished_at=datetime.utcnow()))
+        db.session.commit()
+        return False
+    finally:
+        stop.set()
+        beat.join()
+
+    db.session.execute(update(Job).where(Job.id == job.id).values(
+        status="done", progress=100, result_path=path, content_type=content_type, finished_at=datetime.utcnow()))
+    db.session.commit()
+    logger.info("Job %s (%s) done in %.1fs", job.id, job.kind, time.monotonic() - started)
+    return True
+
+
+def requeue_stale():
+    """Devuelve a la cola los trabajos de un worker que murió (sin heartbeat)"""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config["JOBS_STALE_SECONDS"])
+    stale = (Job.status == "running") & (Job.heartbeat_at < cutoff)
+    failed = db.session.execute(
+        update(Job).where(stale, Job.attempts >= MAX_ATTEMPTS)
+        .values(status="failed", error="worker lost", finished_at=datetime.utcnow())
+    ).rowcount
+    requeued = db.session.execute(update(Job).where(stale).values(status="queued", progress=0)).rowcount
+    db.session.commit()
+    return requeued, failed
+
+
+def prune():
+    """Borra los trabajos terminados (y sus archivos) más viejos que JOBS_RETENTION_HOURS"""
+    cutoff = datetime.utcnow() - timedelta(hours=current_app.config["JOBS_RETENTION_HOURS"])
+    old = Job.query.filter(Job.status.in_(("done", "failed")), Job.finished_at < cutoff).all()
+    for job in old:
+        if job.result_path and os.path.exists(job.result_path):
+            os.remove(job.result_path)
+        db.session.delete(job)
+    db.session.commit()
+    return len(old)
+
+
+def serialize(job):
+    data = {
+        "id": job.id,
+        "kind": job.kind,
+        "params": json.loads(job.params),
+        "status": job.status,
+        "progress": job.progress,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+    if job.status == "done":
+        data["download_url"] = f"/api/jobs/{job.id}/result"
+    return data
+
+
+# ==================== WORKERS ====================
+def work(app, stop=None, poll_interval=None, once=False):
+    """Toma y ejecuta trabajos hasta que stop se active (o, con once, hasta vaciar la cola)"""
+    poll_interval = poll_interval or app.config["JOBS_POLL_INTERVAL"]
+    last_maintenance = 0.0
+    while stop is None or not stop.is_set():
+        try:
+            with app.app_context():
+                try:
+                    if time.monotonic() - last_maintenance > 60:
+                        last_maintenance = time.monotonic()
+                        requeue_stale()
+                        prune()
+                    job = claim_next()
+                    if job is not None:
+                        run(job)
+                        continue
+                finally:
+                    db.session.remove()
+        except Exception:
+            logger.exception("Job worker loop failed")
+        if once:
+            return
+        if stop is not None:
+            stop.wait(poll_interval)
+        else:
+            time.sleep(poll_interval)
+
+
+class WorkerPool:
+    """Hilos de trabajo dentro del proceso web; arrancan con la primera petición"""
+
+    def __init__(self):
+        self._app = None
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def init_app(self, app):
+        self._app = app
+        # Los hilos no sobreviven a fork (gunicorn --preload)
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+        @app.before_request
+        def start_job_workers():
+            if not self._threads and app.config["JOBS_WORKERS"] > 0:
+                self._start()
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=work, args=(self._app,), name=f"job-worker-{i}", daemon=True)
+                for i in range(self._app.config["JOBS_WORKERS"])
+            ]
+            for thread in self._threads:
+                thread.start()
+
+
+pool = WorkerPool()
@@ -0,0 +1,77 @@
+"""Proveedor JSON de la app: orjson si está instalado, json de la stdlib si no.
+
+Los dos serializan datetime/date/time en ISO 8601 (igual que .isoformat()),
+así que las rutas pueden devolver los valores de las columnas tal cual.
+Las claves no se ordenan: el orden es el de los dicts que arman las rutas.
+"""
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date, datetime, time
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+
+def _default(o):
+    if isinstance(o, (datetime, date, time)):
+        return o.isoformat()
+    if isinstance(o, decimal.Decimal):
+        return float(o)
+    if isinstance(o, uuid.UUID):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(JSONProvider):
+    """Proveedor para app.json; se elige con JSON_ENCODER=orjson|stdlib"""
+
+    mimetype = "application/json"
+
+    def __init__(self, app, encoder=None):
+        super().__init__(app)
+        encoder = encoder or app.config.get("JSON_ENCODER", "orjson")
+        self.use_orjson = encoder == "orjson" and orjson is not None
+        self.encoder = "orjson" if self.use_orjson else "stdlib"
+
+    def _indent(self):
+        return self._app.debug
+
+    def dumps_bytes(self, obj):
+        """Serializa directo a bytes (lo que se escribe en la respuesta)"""
+        if self.use_orjson:
+            option = orjson.OPT_NON_STR_KEYS
+            if self._indent():
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=_default, option=option)
+        return self.dumps(obj).encode("utf-8")
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson and not kwargs:
+            return self.dumps_bytes(obj).decode("utf-8")
+        kwargs.setdefault("default", _default)
+        kwargs.setdefault("ensure_ascii", False)
+        if self._indent():
+            kwargs.setdefault("indent", 2)
+        else:
+            kwargs.setdefault("separators", (",", ":"))
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,273 @@
+"""Retención y archivado de la tabla logs.
+
+`flask archive-logs --older-than 90d` exporta los registros viejos por
+bloques a archivos NDJSON comprimidos, los registra en log_archives y los
+elimina de la tabla por lotes. En Postgres los meses completos anteriores
+al corte se eliminan con DROP de su partición.
+"""
+import gzip
+import json
+import os
+import re
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import text, tuple_
+from . import db
+from .models import LogEntry, LogArchive
+
+_DURATION = re.compile(r"^(\d+)([hdw])$")
+_PARTITION_NAME = re.compile(r"^logs_p(\d{4})_(\d{2})$")
+
+
+def parse_duration(value):
+    """'90d', '12h' o '4w' -> timedelta"""
+    match = _DURATION.match(value.strip().lower())
+    if not match:
+        raise ValueError(f"Duración inválida: {value} (usa por ejemplo 90d, 12h o 4w)")
+    amount, unit = int(match.group(1)), match.group(2)
+    return {"h": timedelta(hours=amount), "d": timedelta(days=amount), "w": timedelta(weeks=amount)}[unit]
+
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def _next_month(value):
+    return datetime(value.year + (value.month == 12), value.month % 12 + 1, 1)
+
+
+def _is_partitioned():
+    if db.engine.dialect.name != "postgresql":
+        return False
+    return bool(db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = 'logs'"
+    )).scalar())
+
+
+def _partitions():
+    rows = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'logs'"
+    )).scalars()
+    partitions = {}
+    for name in rows:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions[name] = datetime(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+
+def ensure_log_partitions(months_ahead=2):
+    """Crea las particiones mensuales que falten (solo Postgres).
+
+    Cubre el mes actual, months_ahead meses más y cualquier mes que ya tenga
+    filas en logs_default (el comando no corrió a tiempo): esas filas se pasan
+    a su partición en la misma transacción, porque Postgres no deja crear una
+    partición cuyo rango ya tiene filas en la DEFAULT.
+    """
+    if not _is_partitioned():
+        return []
+    existing = set(_partitions())
+    month = _month_start(datetime.utcnow())
+    months = set()
+    for _ in range(months_ahead + 1):
+        months.add(month)
+        month = _next_month(month)
+    months.update(db.session.execute(text(
+        "SELECT DISTINCT date_trunc('month', timestamp) FROM logs_default"
+    )).scalars())
+
+    created = []
+    for month in sorted(months):
+        name = f"logs_p{month:%Y_%m}"
+        if name in existing:
+            continue
+        bounds = {"lower": month, "upper": _next_month(month)}
+        in_range = "WHERE timestamp >= :lower AND timestamp < :upper"
+        # Sin inserciones en la DEFAULT hasta el commit: ninguna fila del mes se queda atrás
+        db.session.execute(text("LOCK TABLE logs_default IN EXCLUSIVE MODE"))
+        db.session.execute(text(
+            f"CREATE TEMP TABLE logs_moving ON COMMIT DROP AS SELECT * FROM logs_default {in_range}"
+        ), bounds)
+        db.session.execute(text(f"DELETE FROM logs_default {in_range}"), bounds)
+        db.session.execute(text(
+            f"CREATE TABLE {name} PARTITION OF logs "
+            f"FOR VALUES FROM ('{bounds['lower']:%Y-%m-%d}') TO ('{bounds['upper']:%Y-%m-%d}')"
+        ))
+        db.session.execute(text("INSERT INTO logs SELECT * FROM logs_moving"))
+        db.session.execute(text("DROP TABLE logs_moving"))
+        created.append(name)
+    db.session.commit()
+    return created
+
+
+def _serialize(entry):
+    return {
+        "id": entry.id,
+        "user_id": entry.user_id,
+        "username": entry.username,
+        "action": entry.action,
+        "details": entry.details,
+        "timestamp": entry.timestamp.isoformat() if entry.timestamp else None,
+    }
+
+
+def _archive_path(archive_dir, first_ts, last_ts):
+    name = f"logs-{first_ts:%Y%m%dT%H%M%S}-{last_ts:%Y%m%dT%H%M%S}.ndjson.gz"
+    path = os.path.join(archive_dir, name)
+    counter = 0
+    while os.path.exists(path):
+        counter += 1
+        path = os.path.join(archive_dir, name.replace(".ndjson.gz", f"-{counter}.ndjson.gz"))
+    return path
+
+
+class _ArchiveWriter:
+    """Un archivo NDJSON comprimido que se escribe fila por fila.
+
+    Se escribe en un temporal; close() le da su nombre final (con el rango de
+    timestamps) y lo registra en log_archives.
+    """
+
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        self.tmp_path = os.path.join(archive_dir, f".logs-{os.getpid()}.ndjson.gz.tmp")
+        self.fh = gzip.open(self.tmp_path, "wt", encoding="utf-8")
+        self.count = 0
+        self.first_ts = self.last_ts = None
+
+    def write(self, row):
+        self.fh.write(json.dumps(row, ensure_ascii=False))
+        self.fh.write("\n")
+        self.last_ts = datetime.fromisoformat(row["timestamp"])
+        if self.first_ts is None:
+            self.first_ts = self.last_ts
+        self.count += 1
+
+    def close(self):
+        self.fh.close()
+        path = _archive_path(self.archive_dir, self.first_ts, self.last_ts)
+        os.replace(self.tmp_path, path)
+        db.session.add(LogArchive(path=path, start_ts=self.first_ts, end_ts=self.last_ts, row_count=self.count))
+        db.session.commit()
+        return path
+
+    def discard(self):
+        self.fh.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def archive_logs(older_than, chunk_size=5000, rows_per_file=100000, archive_dir=None, progress=None):
+    """Exporta y elimina los logs con timestamp anterior a ahora - older_than.
+
+    Devuelve (filas_archivadas, archivos). Cada bloque leído se escribe de
+    inmediato en el archivo abierto, así la memoria depende de chunk_size y no
+    de rows_per_file. Los archivos quedan escritos y registrados antes de
+    borrar cualquier fila.
+    """
+    archive_dir = archive_dir or current_app.config["LOG_ARCHIVE_DIR"]
+    os.makedirs(archive_dir, exist_ok=True)
+    cutoff = datetime.utcnow() - older_than
+
+    # 1) Exportar por bloques con paginación por (timestamp, id)
+    files = []
+    total = 0
+    writer = None
+    last_key = None
+    try:
+        while True:
+            query = LogEntry.query.filter(LogEntry.timestamp < cutoff)
+            if last_key is not None:
+                query = query.filter(tuple_(LogEntry.timestamp, LogEntry.id) > last_key)
+            chunk = query.order_by(LogEntry.timestamp, LogEntry.id).limit(chunk_size).all()
+            if not chunk:
+                break
+            for entry in chunk:
+                if writer is None:
+                    writer = _ArchiveWriter(archive_dir)
+                writer.write(_serialize(entry))
+                if writer.count >= rows_per_file:
+                    files.append(writer.close())
+                    writer = None
+            last_key = (chunk[-1].timestamp, chunk[-1].id)
+            total += len(chunk)
+            db.session.expunge_all()
+            if progress:
+                progress(len(chunk))
+        if writer is not None:
+            files.append(writer.close())
+            writer = None
+    finally:
+        if writer is not None:
+            writer.discard()
+    if not total:
+        return 0, files
+
+    # 2) Postgres: meses completos antes del corte se eliminan con DROP
+    if _is_partitioned():
+        for name, month in _partitions().items():
+            if _next_month(month) <= cutoff:
+                db.session.execute(text(f"ALTER TABLE logs DETACH PARTITION {name}"))
+                db.session.execute(text(f"DROP TABLE {name}"))
+        db.session.commit()
+
+    # 3) Lo que queda antes del corte se borra por lotes
+    while True:
+        ids = [row[0] for row in db.session.query(LogEntry.id)
+               .filter(LogEntry.timestamp < cutoff).limit(chunk_size).all()]
+        if not ids:
+            break
+        LogEntry.query.filter(LogEntry.id.in_(ids), LogEntry.timestamp < cutoff)\
+            .delete(synchronize_session=False)
+        db.session.commit()
+
+    return total, files
+
+
+def _matches(row, search, action):
+    if search:
+        needle = search.lower()
+        if needle not in (row.get("username") or "").lower() and needle not in (row.get("details") or "").lower():
+            return False
+    if action and action.lower() not in (row.get("action") or "").lower():
+        return False
+    return True
+
+
+def iter_archived_logs(before=None, search="", action="", start=None, end=None):
+    """Registros archivados del más reciente al más antiguo.
+
+    before es una llave (timestamp, id): solo se devuelven filas anteriores.
+    Los archivos fuera del rango pedido no se abren.
+    """
+    query = LogArchive.query
+    if before is not None:
+        query = query.filter(LogArchive.start_ts <= before[0])
+    if start is not None:
+        query = query.filter(LogArchive.end_ts >= start)
+    if end is not None:
+        query = query.filter(LogArchive.start_ts <= end)
+    archives = query.order_by(LogArchive.end_ts.desc(), LogArchive.id.desc()).all()
+
+    for archive in archives:
+        try:
+            with gzip.open(archive.path, "rt", encoding="utf-8") as fh:
+                rows = [json.loads(line) for line in fh]
+        except OSError:
+            current_app.logger.warning("Log archive missing or unreadable: %s", archive.path)
+            continue
+        for row in reversed(rows):
+            ts = datetime.fromisoformat(row["timestamp"])
+            if before is not None and (ts, row["id"]) >= before:
+                continue
+            if start is not None and ts < start:
+                continue
+            if end is not None and ts > end:
+                continue
+            if _matches(row, search, action):
+                row["archived"] = True
+                yield row
@@ -1,12 +1,192 @@
+import atexit
+import copy
+import gzip
+import json
 import logging
-from logging.handlers import RotatingFileHandler
-from flask import g
+import os
+import queue
+import shutil
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+# Campos de contexto que se copian al registro JSON si existen
+CONTEXT_FIELDS = ("request_id", "user", "route", "method", "path", "status", "duration_ms")
+
+
+class RequestContextFilter(logging.Filter):
+    """Captura request id, usuario y ruta en el hilo de la petición"""
+
+    def filter(self, record):
+        if has_request_context():
+            if not hasattr(record, "request_id"):
+                record.request_id = g.get("request_id")
+            user = g.get("current_user")
+            if isinstance(user, dict) and not hasattr(record, "user"):
+                record.user = user.get("username")
+            if not hasattr(record, "route"):
+                record.route = request.endpoint
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        elif record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ContextQueueHandler(QueueHandler):
+    """Encola el registro sin formatearlo; el archivo se escribe en otro hilo"""
+
+    def prepare(self, record):
+        # Los args pueden cambiar después de loguear: se fusionan aquí,
+        # solo para registros que pasaron el filtro de nivel
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SizeAndTimeRotatingFileHandler(TimedRotatingFileHandler):
+    """Rota al llegar a max_bytes o al cambiar de periodo y comprime con gzip"""
+
+    def __init__(self, filename, max_bytes, when="midnight", backup_count=7):
+        super().__init__(filename, when=when, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.max_bytes = max_bytes
+
+    def emit(self, record):
+        # Se formatea una sola vez: el mismo texto decide la rotación y se escribe
+        try:
+            msg = self.format(record) + self.terminator
+            if self.shouldRollover(record) or self._exceeds_max_bytes(len(msg)):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(msg)
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def _exceeds_max_bytes(self, size):
+        if self.max_bytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        self.stream.seek(0, 2)
+        return self.stream.tell() + size >= self.max_bytes
+
+    def _backups(self):
+        directory, base = os.path.split(self.baseFilename)
+        names = [n for n in os.listdir(directory or ".") if n.startswith(base + ".") and n.endswith(".gz")]
+        paths = [os.path.join(directory, n) for n in names]
+        return sorted(paths, key=os.path.getmtime)
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        if os.path.exists(self.baseFilename):
+            target = f"{self.baseFilename}.{time.strftime('%Y%m%d-%H%M%S')}"
+            counter = 0
+            while os.path.exists(target + ".gz"):
+                counter += 1
+                target = f"{self.baseFilename}.{time.strftime('%Y%m%d-%H%M%S')}.{counter}"
+            os.rename(self.baseFilename, target)
+            with open(target, "rb") as source, gzip.open(target + ".gz", "wb") as dest:
+                shutil.copyfileobj(source, dest)
+            os.remove(target)
+
+        if self.backupCount > 0:
+            backups = self._backups()
+            for old in backups[:-self.backupCount]:
+                os.remove(old)
+
+        self.rolloverAt = self.computeRollover(int(time.time()))
+
 
 def setup_app_logger(app):
     log_file = app.config.get("LOG_FILE", "app_operations.log")
-    handler = RotatingFileHandler(log_file, maxBytes=5*1024*1024, backupCount=2)
-    formatter = logging.Formatter('%(asctime)s %(levelname)s: %(message)s')
-    handler.setFormatter(formatter)
-    handler.setLevel(logging.INFO)
-    app.logger.addHandler(handler)
+    file_handler = SizeAndTimeRotatingFileHandler(
+        log_file,
+        max_bytes=app.config.get("LOG_MAX_BYTES", 5 * 1024 * 1024),
+        when=app.config.get("LOG_ROTATE_WHEN", "midnight"),
+        backup_count=app.config.get("LOG_BACKUP_COUNT", 7),
+    )
+    file_handler.setFormatter(JsonFormatter())
+
+    handlers = [file_handler]
+    if app.config.get("LOG_CONSOLE", True):
+        console_handler = logging.StreamHandler(sys.stderr)
+        console_handler.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s in %(module)s: %(message)s"))
+        handlers.append(console_handler)
+
+    # El hilo del listener hace la escritura (archivo y consola), rotación y compresión
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+
+    queue_handler = ContextQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    queue_handler.setLevel(logging.INFO)
+    # Sin el handler de Flask ni el de consola del root (que instala fileConfig
+    # de Alembic): ninguna escritura queda en el hilo de la petición
+    app.logger.removeHandler(default_handler)
+    app.logger.propagate = False
+    app.logger.addHandler(queue_handler)
     app.logger.setLevel(logging.INFO)
+
+    def restart_listener_in_child():
+        # Los hilos no sobreviven a fork (gunicorn --preload): cada worker
+        # necesita su propia cola y su propio hilo escritor
+        fresh_queue = queue.SimpleQueue()
+        queue_handler.queue = fresh_queue
+        listener.queue = fresh_queue
+        listener._thread = None
+        listener.start()
+
+    os.register_at_fork(after_in_child=restart_listener_in_child)
+    atexit.register(listener.stop)
+
+    @app.before_request
+    def assign_request_id():
+        g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+        g.log_start = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        request_id = g.get("request_id")
+        if request_id:
+            response.headers["X-Request-ID"] = request_id
+        if app.config.get("LOG_REQUESTS", True) and "log_start" in g:
+            duration_ms = round((time.perf_counter() - g.log_start) * 1000, 2)
+            app.logger.info(
+                "%s %s %s %.2fms", request.method, request.path, response.status_code, duration_ms,
+                extra={
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "duration_ms": duration_ms,
+                },
+            )
+        return response
@@ -0,0 +1,341 @@
+"""Métricas en memoria con exportación en formato de texto de Prometheus.
+
+Registrar una observación es solo un lock y unas sumas; el texto se arma
+únicamente cuando alguien consulta /api/metrics.
+
+Con gunicorn cada worker es un proceso con sus propios valores y cada scrape
+cae en uno cualquiera. Con METRICS_DIR cada worker vuelca sus valores en
+METRICS_DIR/<pid>.json cada METRICS_FLUSH_SECONDS (y al salir) y el scrape
+suma todos los archivos, como el modo multiproceso de prometheus_client.
+Cuando un worker termina, el maestro pasa sus contadores a dead.json para que
+los totales nunca bajen. Los gauges no se suman: llevan la etiqueta pid.
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin gunicorn no hay varios workers
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    @staticmethod
+    def merge(total, value):
+        return total + value
+
+    def render(self, samples):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(samples.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # [conteos por bucket..., +Inf], suma
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self):
+        with self._lock:
+            return {k: [list(v[0]), v[1]] for k, v in self._series.items()}
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    @staticmethod
+    def merge(total, value):
+        if len(total[0]) != len(value[0]):
+            return total
+        return [[a + b for a, b in zip(total[0], value[0])], total[1] + value[1]]
+
+    def render(self, samples):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total) in sorted(samples.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, label_values, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Valor calculado al momento de exportar (callback sin argumentos)"""
+
+    def __init__(self, name, help_text, labels=(), callback=None):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.callback = callback
+
+    def collect(self):
+        try:
+            samples = self.callback() if self.callback else {}
+        except Exception:
+            samples = {}
+        if _directory:
+            # Un valor por proceso: sumar conexiones u ocupación no tiene sentido
+            return {label_values + (str(os.getpid()),): value for label_values, value in samples.items()}
+        return samples
+
+    def reset(self):
+        pass
+
+    @staticmethod
+    def merge(total, value):
+        return value
+
+    def render(self, samples):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        names = self.label_names + (("pid",) if _directory else ())
+        for label_values, value in sorted(samples.items()):
+            lines.append(f"{self.name}{_format_labels(names, label_values)} {_format_value(value)}")
+        return lines
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric):
+    with _registry_lock:
+        existing = _registry.get(metric.name)
+        if existing is not None:
+            return existing
+        _registry[metric.name] = metric
+        return metric
+
+
+def counter(name, help_text, labels=()):
+    return _register(Counter(name, help_text, labels))
+
+
+def histogram(name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram(name, help_text, labels, buckets))
+
+
+def gauge(name, help_text, labels=(), callback=None):
+    return _register(Gauge(name, help_text, labels, callback))
+
+
+def _metrics():
+    with _registry_lock:
+        return list(_registry.values())
+
+
+# ==================== VARIOS PROCESOS ====================
+_directory = None
+_flush_seconds = 5
+DEAD_FILE = "dead.json"
+LOCK_FILE = ".lock"
+
+
+def configure(directory, flush_seconds=5):
+    """Activa la agregación entre procesos en directory (vacío la desactiva)"""
+    global _directory, _flush_seconds
+    _directory = directory or None
+    _flush_seconds = flush_seconds
+    if _directory:
+        os.makedirs(_directory, exist_ok=True)
+
+
+class _DirectoryLock:
+    """flock sobre METRICS_DIR/.lock: compartido al leer, exclusivo al compactar"""
+
+    def __init__(self, exclusive=False):
+        self.exclusive = exclusive
+
+    def __enter__(self):
+        self.file = open(os.path.join(_directory, LOCK_FILE), "a")
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+        return self
+
+    def __exit__(self, *exc):
+        self.file.close()
+
+
+def _write_json(path, data):
+    # Escritura atómica: quien lee ve el archivo anterior o el nuevo, nunca uno a medias
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _dump(samples_by_name):
+    return {name: [[list(k), v] for k, v in samples.items()] for name, samples in samples_by_name.items()}
+
+
+def _merge_into(totals, data, registry):
+    for name, rows in data.items():
+        metric = registry.get(name)
+        if metric is None:
+            continue
+        samples = totals.setdefault(name, {})
+        for labels, value in rows:
+            key = tuple(labels)
+            samples[key] = metric.merge(samples[key], value) if key in samples else value
+
+
+def flush():
+    """Vuelca los valores de este proceso en METRICS_DIR/<pid>.json"""
+    if not _directory:
+        return
+    _write_json(
+        os.path.join(_directory, f"{os.getpid()}.json"),
+        _dump({metric.name: metric.collect() for metric in _metrics()}),
+    )
+
+
+def _flush_loop():
+    while True:
+        time.sleep(_flush_seconds)
+        try:
+            flush()
+        except OSError as e:
+            logger.warning("Could not flush metrics to %s: %s", _directory, e)
+
+
+def _after_fork():
+    # Lo registrado en el maestro antes del fork no es de este worker
+    for metric in _metrics():
+        metric.reset()
+    if _directory:
+        threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def mark_process_dead(pid):
+    """Pasa los contadores e histogramas de un worker que terminó a dead.json.
+
+    Lo llama el maestro de gunicorn (child_exit); los gauges del worker se descartan.
+    """
+    if not _directory:
+        return
+    path = os.path.join(_directory, f"{pid}.json")
+    if not os.path.exists(path):
+        return
+    registry = {metric.name: metric for metric in _metrics() if not isinstance(metric, Gauge)}
+    with _DirectoryLock(exclusive=True):
+        dead_path = os.path.join(_directory, DEAD_FILE)
+        totals = {}
+        _merge_into(totals, _read_json(dead_path), registry)
+        _merge_into(totals, _read_json(path), registry)
+        _write_json(dead_path, _dump(totals))
+        os.remove(path)
+
+
+def clear_directory(directory):
+    """Borra los valores de una ejecución anterior; el maestro lo llama al arrancar"""
+    if not directory or not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith(".json") or name.endswith(".tmp"):
+            os.remove(os.path.join(directory, name))
+
+
+def _collect_all(metrics):
+    """Valores de todos los workers, incluidos los que ya terminaron.
+
+    Este proceso también se lee de su archivo (recién volcado): mezclar valores
+    en vivo con los volcados de otros haría que el total bajara entre scrapes
+    atendidos por workers distintos.
+    """
+    if not _directory:
+        return {metric.name: metric.collect() for metric in metrics}
+    flush()
+    registry = {metric.name: metric for metric in metrics}
+    totals = {}
+    with _DirectoryLock():
+        for name in os.listdir(_directory):
+            if name.endswith(".json"):
+                _merge_into(totals, _read_json(os.path.join(_directory, name)), registry)
+    return totals
+
+
+def render_metrics():
+    """Texto en formato de exposición de Prometheus (versión 0.0.4)"""
+    metrics = _metrics()
+    samples = _collect_all(metrics)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render(samples.get(metric.name, {})))
+    return "\n".join(lines) + "\n"
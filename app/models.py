@@ -30,6 +30,7 @@ class Customer(db.Model):
     phone = db.Column(db.String(20))
     address = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
 class Supplier(db.Model):
     __tablename__ = "suppliers"
@@ -40,16 +41,20 @@ class Supplier(db.Model):
     phone = db.Column(db.String(20))
     address = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
 class SupplierProduct(db.Model):
     """Tabla intermedia para relacionar proveedores con productos que venden"""
     __tablename__ = "supplier_products"
+    __table_args__ = (
+        db.UniqueConstraint("supplier_id", "product_id", name="uq_supplier_products_supplier_product"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     supplier_id = db.Column(db.Integer, db.ForeignKey("suppliers.id"), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
     purchase_price = db.Column(db.Float, nullable=False)
     quantity_available = db.Column(db.Integer, default=0)
-    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     supplier = db.relationship("Supplier", backref="supplier_products")
     product = db.relationship("Product", backref="supplier_products")
@@ -68,47 +73,51 @@ class SupplierProduct(db.Model):
             return ((self.product.price - self.purchase_price) / self.purchase_price) * 100
         return 0
 
+# Precio con IVA; IVA nulo se trata como 16% (0 es tasa cero)
+PRICE_WITH_IVA_SQL = "price + price * COALESCE(iva, 16) / 100.0"
+
+
 class Product(db.Model):
     __tablename__ = "products"
+    __table_args__ = (
+        # Listar los productos con stock bajo lee solo esas entradas del índice
+        db.Index("ix_products_is_low_stock_id", "is_low_stock", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(150), nullable=False)
+    name = db.Column(db.String(150), nullable=False, index=True)
+    sku = db.Column(db.String(64), unique=True, index=True)
     description = db.Column(db.Text)
     price = db.Column(db.Float, nullable=False)
     iva = db.Column(db.Integer, default=16)
-    stock = db.Column(db.Integer, default=0)
+    # Columna generada por la base: siempre consistente con price e iva
+    price_with_iva = db.Column(db.Float, db.Computed(PRICE_WITH_IVA_SQL, persisted=True), index=True)
+    stock = db.Column(db.Integer, default=0, index=True)
     min_stock = db.Column(db.Integer, default=10)
-    category = db.Column(db.String(100))
-    supplier_id = db.Column(db.Integer, db.ForeignKey("suppliers.id"))
+    category = db.Column(db.String(100), index=True)
+    supplier_id = db.Column(db.Integer, db.ForeignKey("suppliers.id"), index=True)
     supplier = db.relationship("Supplier", backref="products")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    @property
-    def is_low_stock(self):
-        """Verifica si el stock está por debajo del mínimo"""
-        try:
-            min_stock = self.min_stock if self.min_stock else 10
-            return self.stock <= min_stock
-        except:
-            return False
-    
-    @property
-    def price_with_iva(self):
-        """Calcula el precio con IVA incluido"""
-        try:
-            iva_rate = self.iva if self.iva else 16
-            return self.price * (1 + (iva_rate / 100))
-        except:
-            return self.price * 1.16
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # stock <= min_stock; lo mantiene app/inventory.py (refresh_low_stock)
+    is_low_stock = db.Column(db.Boolean, nullable=False, default=False)
+
+class ProductBarcode(db.Model):
+    """Códigos de barras de un producto (un producto puede tener varios)"""
+    __tablename__ = "product_barcodes"
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False, index=True)
+    code = db.Column(db.String(64), nullable=False, unique=True, index=True)
+    product = db.relationship("Product", backref=db.backref("barcodes", cascade="all, delete-orphan"))
 
 class Sale(db.Model):
     __tablename__ = "sales"
     id = db.Column(db.Integer, primary_key=True)
-    customer_id = db.Column(db.Integer, db.ForeignKey("customers.id"))
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey("customers.id"), index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
     total = db.Column(db.Float, nullable=False)
     payment_method = db.Column(db.String(50))
     status = db.Column(db.String(50), default="completed")
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     customer = db.relationship("Customer", backref="sales")
     user = db.relationship("User", backref="sales")
@@ -116,8 +125,8 @@ class Sale(db.Model):
 class SaleItem(db.Model):
     __tablename__ = "sale_items"
     id = db.Column(db.Integer, primary_key=True)
-    sale_id = db.Column(db.Integer, db.ForeignKey("sales.id"), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    sale_id = db.Column(db.Integer, db.ForeignKey("sales.id"), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     unit_price = db.Column(db.Float, nullable=False)
     subtotal = db.Column(db.Float, nullable=False)
@@ -132,4 +141,128 @@ class LogEntry(db.Model):
     username = db.Column(db.String(80))
     action = db.Column(db.String(255))
     details = db.Column(db.Text)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class LogArchive(db.Model):
+    """Archivo NDJSON comprimido con registros de logs ya eliminados de la tabla"""
+    __tablename__ = "log_archives"
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(500), nullable=False)
+    start_ts = db.Column(db.DateTime, nullable=False, index=True)
+    end_ts = db.Column(db.DateTime, nullable=False, index=True)
+    row_count = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SyncTombstone(db.Model):
+    """Fila eliminada de una tabla sincronizada (GET /api/sync/<entity>)"""
+    __tablename__ = "sync_tombstones"
+    __table_args__ = (
+        db.Index("ix_sync_tombstones_entity_deleted_at", "entity", "deleted_at"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class Event(db.Model):
+    """Evento para los clientes conectados a GET /api/events (outbox)"""
+    __tablename__ = "events"
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+class InventoryMovement(db.Model):
+    """Movimiento de inventario (solo se insertan); quantity con signo"""
+    __tablename__ = "inventory_movements"
+    __table_args__ = (
+        db.Index("ix_inventory_movements_product_id_id", "product_id", "id"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    reference = db.Column(db.String(100))
+    # Movimientos insertados juntos; el saldo se actualiza con un solo UPDATE por lote
+    batch_id = db.Column(db.String(36), index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+class InventorySnapshot(db.Model):
+    """Saldo de un producto con todos los movimientos hasta last_movement_id"""
+    __tablename__ = "inventory_snapshots"
+    __table_args__ = (
+        db.Index("ix_inventory_snapshots_product_id_taken_at", "product_id", "taken_at"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    stock = db.Column(db.Integer, nullable=False)
+    last_movement_id = db.Column(db.Integer, nullable=False)
+    taken_at = db.Column(db.DateTime, nullable=False)
+
+class PurchaseOrder(db.Model):
+    """Orden de compra a un proveedor; las líneas toman el precio de su catálogo"""
+    __tablename__ = "purchase_orders"
+    id = db.Column(db.Integer, primary_key=True)
+    supplier_id = db.Column(db.Integer, db.ForeignKey("suppliers.id"), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    # open, partial, received, cancelled
+    status = db.Column(db.String(20), nullable=False, default="open", index=True)
+    notes = db.Column(db.Text)
+    total_cost = db.Column(db.Float, nullable=False, default=0)
+    # Costo recibido incluyendo fletes y otros gastos prorrateados
+    landed_cost = db.Column(db.Float, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    received_at = db.Column(db.DateTime)
+
+    supplier = db.relationship("Supplier", backref="purchase_orders")
+    lines = db.relationship("PurchaseOrderLine", backref="order", cascade="all, delete-orphan")
+
+class PurchaseOrderLine(db.Model):
+    __tablename__ = "purchase_order_lines"
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey("purchase_orders.id"), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False, index=True)
+    quantity_ordered = db.Column(db.Integer, nullable=False)
+    quantity_received = db.Column(db.Integer, nullable=False, default=0)
+    unit_cost = db.Column(db.Float, nullable=False)
+    # Promedio ponderado de lo recibido: unit_cost + gastos prorrateados
+    landed_unit_cost = db.Column(db.Float)
+
+    product = db.relationship("Product")
+
+class LowStockTransition(db.Model):
+    """Outbox: un producto entró (low=True) o salió (low=False) de stock bajo"""
+    __tablename__ = "low_stock_transitions"
+    id = db.Column(db.Integer, primary_key=True)
+    # Sin FK: las transiciones se conservan aunque el producto se elimine
+    product_id = db.Column(db.Integer, nullable=False)
+    low = db.Column(db.Boolean, nullable=False)
+    stock = db.Column(db.Integer, nullable=False)
+    min_stock = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class Job(db.Model):
+    """Reporte o exportación que corre en segundo plano (app/jobs.py)"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Los workers buscan el trabajo pendiente más viejo
+        db.Index("ix_jobs_status_id", "status", "id"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text, nullable=False)
+    # Hash de kind + params: pedidos idénticos reutilizan el mismo trabajo
+    cache_key = db.Column(db.String(64), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default="queued")  # queued, running, done, failed
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    result_path = db.Column(db.String(500))
+    content_type = db.Column(db.String(100))
+    error = db.Column(db.Text)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
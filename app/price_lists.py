@@ -0,0 +1,172 @@
+"""Carga masiva de la lista de precios de un proveedor (supplier_products).
+
+La lista completa se compara con el catálogo actual en una sola lectura y
+solo las líneas nuevas o con cambios se escriben, con el upsert nativo del
+motor (ON CONFLICT en Postgres/SQLite, ON DUPLICATE KEY en MySQL) por bloques.
+"""
+import csv
+import io
+from datetime import datetime
+from sqlalchemy import delete, select
+from . import db, sync
+from .models import Product, SupplierProduct
+
+CHUNK_SIZE = 1000
+MAX_LINES = 50000
+MAX_ERRORS = 20
+
+
+class PriceListError(ValueError):
+    """Lista de precios inválida; errors trae el detalle por línea"""
+
+    def __init__(self, msg, errors=None):
+        super().__init__(msg)
+        self.errors = errors or []
+
+
+def parse_csv(text):
+    """CSV con encabezado product_id,purchase_price[,quantity_available]"""
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames or not {"product_id", "purchase_price"} <= set(reader.fieldnames):
+        raise PriceListError("CSV header must include product_id and purchase_price")
+    return list(reader)
+
+
+def normalize(lines):
+    """Valida las líneas -> {product_id: (purchase_price, quantity_available)}; la última gana.
+
+    quantity_available es None si la línea no la trae: se conserva la actual.
+    """
+    if not isinstance(lines, list) or not lines:
+        raise PriceListError("price list must be a non-empty list of lines")
+    if len(lines) > MAX_LINES:
+        raise PriceListError(f"price list too long (max {MAX_LINES} lines)")
+
+    result = {}
+    errors = []
+    for number, line in enumerate(lines, start=1):
+        try:
+            product_id = int(line["product_id"])
+            price = float(line["purchase_price"])
+            quantity = line.get("quantity_available")
+            quantity = None if quantity in (None, "") else int(quantity)
+            if price < 0 or (quantity is not None and quantity < 0):
+                raise ValueError("negative value")
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            errors.append({"line": number, "error": str(e)})
+            if len(errors) >= MAX_ERRORS:
+                break
+            continue
+        result[product_id] = (price, quantity)
+    if errors:
+        raise PriceListError("invalid lines in price list", errors)
+    return result
+
+
+def _upsert_statement(columns):
+    """Upsert que en conflicto actualiza solo columns (y last_updated)"""
+    table = SupplierProduct.__table__
+    columns = [*columns, "last_updated"]
+    dialect = db.session.get_bind(mapper=SupplierProduct).dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        return stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in columns})
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"upsert no soportado para el dialecto {dialect}")
+    stmt = insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.supplier_id, table.c.product_id],
+        set_={name: stmt.excluded[name] for name in columns},
+    )
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def apply_price_list(supplier_id, lines, delete_missing=False, dry_run=False):
+    """Compara y aplica la lista; devuelve el resumen de diferencias"""
+    incoming = normalize(lines)
+
+    known = set()
+    for chunk in _chunks(list(incoming)):
+        known.update(db.session.execute(select(Product.id).where(Product.id.in_(chunk))).scalars())
+    unknown = sorted(set(incoming) - known)
+    if unknown:
+        raise PriceListError("unknown products in price list", [{"product_id": pid} for pid in unknown[:MAX_ERRORS]])
+
+    current = {
+        row.product_id: row
+        for row in db.session.execute(
+            select(
+                SupplierProduct.id,
+                SupplierProduct.product_id,
+                SupplierProduct.purchase_price,
+                SupplierProduct.quantity_available,
+            ).where(SupplierProduct.supplier_id == supplier_id)
+        )
+    }
+
+    added, price_changed, quantity_changed = [], [], []
+    # Líneas con cantidad (o nuevas) y líneas existentes que solo traen precio
+    writes, price_writes = [], []
+    now = datetime.utcnow()
+    for product_id, (price, quantity) in incoming.items():
+        row = current.get(product_id)
+        if row is None:
+            added.append(product_id)
+        else:
+            changed = False
+            if row.purchase_price != price:
+                price_changed.append({"product_id": product_id, "old": row.purchase_price, "new": price})
+                changed = True
+            if quantity is not None and (row.quantity_available or 0) != quantity:
+                quantity_changed.append(product_id)
+                changed = True
+            if not changed:
+                continue
+        write = {"supplier_id": supplier_id, "product_id": product_id, "purchase_price": price, "last_updated": now}
+        if quantity is None and row is not None:
+            price_writes.append(write)
+        else:
+            writes.append({**write, "quantity_available": quantity or 0})
+
+    missing = [row for product_id, row in current.items() if product_id not in incoming]
+    removed = [row.product_id for row in missing] if delete_missing else []
+
+    if not dry_run:
+        for rows, columns in ((writes, ["purchase_price", "quantity_available"]), (price_writes, ["purchase_price"])):
+            if rows:
+                stmt = _upsert_statement(columns)
+                for chunk in _chunks(rows):
+                    db.session.execute(stmt, chunk)
+        if delete_missing and missing:
+            for chunk in _chunks(missing):
+                db.session.execute(delete(SupplierProduct.__table__).where(
+                    SupplierProduct.__table__.c.id.in_([row.id for row in chunk])
+                ))
+            # El DELETE masivo no dispara los listeners de sync
+            sync.record_deletes("supplier_products", [row.id for row in missing])
+        db.session.commit()
+
+    return {
+        "dry_run": dry_run,
+        "lines": len(incoming),
+        "added": len(added),
+        "price_changed": len(price_changed),
+        "quantity_changed": len(quantity_changed),
+        "unchanged": len(incoming) - len(writes) - len(price_writes),
+        "removed": len(removed),
+        "missing": len(missing),
+        "changes": {
+            "added": sorted(added),
+            "price_changed": price_changed,
+            "removed": sorted(removed),
+        },
+    }
@@ -0,0 +1,104 @@
+"""Búsqueda exacta por SKU o código de barras para el punto de venta.
+
+Cada proceso guarda en memoria {código: product_id} y {product_id: producto},
+así un escaneo es una consulta a un dict y no toca la base. El mapa se llena
+al arrancar, se invalida por producto con los eventos catalog_changed (de
+cualquier worker, vía events.hub) y se le actualiza el stock con
+stock_changed. Un código que no está en el mapa se busca en la base y se
+agrega; cada PRODUCT_LOOKUP_MAX_AGE segundos se recarga completo por si se
+perdió algún evento.
+"""
+import threading
+import time
+from flask import current_app
+from sqlalchemy import select
+from . import db, queries
+from .models import Product, ProductBarcode
+
+LOOKUP_FIELDS = ["id", "sku", "name", "price", "iva", "price_with_iva", "stock", "category"]
+
+_lock = threading.Lock()
+_codes = {}
+_products = {}
+_loaded_at = None
+
+
+class CodeInUse(ValueError):
+    """El SKU o código de barras ya pertenece a otro producto"""
+
+
+def normalize(code):
+    return str(code or "").strip()
+
+
+def check_codes(product_id, sku=None, barcodes=()):
+    """Los índices únicos son por tabla: un SKU no puede ser el código de barras
+    de otro producto ni al revés. product_id es None para un producto nuevo."""
+    if sku:
+        query = select(ProductBarcode.id).where(ProductBarcode.code == sku)
+        if product_id is not None:
+            query = query.where(ProductBarcode.product_id != product_id)
+        if db.session.execute(query.limit(1)).first():
+            raise CodeInUse(sku)
+    if barcodes:
+        query = select(Product.id).where(Product.sku.in_(list(barcodes)))
+        if product_id is not None:
+            query = query.where(Product.id != product_id)
+        if db.session.execute(query.limit(1)).first():
+            raise CodeInUse(barcodes)
+
+
+def warm():
+    """Carga todos los códigos y productos; devuelve cuántos códigos quedaron"""
+    global _codes, _products, _loaded_at
+    products = {row["id"]: row for row in queries.products(fields=LOOKUP_FIELDS)}
+    # El SKU gana si choca con un código de barras, igual que queries.product_by_code
+    codes = dict(db.session.execute(select(ProductBarcode.code, ProductBarcode.product_id)).all())
+    codes.update((row["sku"], pid) for pid, row in products.items() if row["sku"])
+    with _lock:
+        _codes, _products, _loaded_at = codes, products, time.monotonic()
+    return len(codes)
+
+
+def lookup(code):
+    """Producto cuyo SKU o código de barras es code; None si no existe"""
+    code = normalize(code)
+    if not code:
+        return None
+    if _loaded_at is None or time.monotonic() - _loaded_at > current_app.config["PRODUCT_LOOKUP_MAX_AGE"]:
+        warm()
+
+    product = _products.get(_codes.get(code))
+    if product is not None:
+        return product
+
+    product = queries.product_by_code(code, LOOKUP_FIELDS)
+    if product is not None:
+        with _lock:
+            _codes[code] = product["id"]
+            _products[product["id"]] = product
+    return product
+
+
+def invalidate(product_id):
+    """Olvida el producto y sus códigos; el siguiente escaneo los lee de la base"""
+    with _lock:
+        _products.pop(product_id, None)
+        for code in [c for c, pid in _codes.items() if pid == product_id]:
+            del _codes[code]
+
+
+def _on_event(event):
+    if event["type"] == "catalog_changed":
+        invalidate(event["data"]["product_id"])
+    elif event["type"] == "stock_changed":
+        with _lock:
+            for item in event["data"]["products"]:
+                product = _products.get(item["id"])
+                if product is not None:
+                    _products[item["id"]] = {**product, "stock": item["stock"]}
+
+
+def init_app(app):
+    from .events import hub
+    hub.add_listener(_on_event)
@@ -0,0 +1,155 @@
+"""Perfilado de consultas: log de consultas lentas, detector de N+1 y
+presupuesto de consultas para pruebas.
+
+- SLOW_QUERY_MS > 0: toda sentencia más lenta se registra con sus
+  parámetros y la ruta que la ejecutó.
+- QUERY_PROFILING=true: guarda las sentencias de cada petición y avisa
+  cuando la misma sentencia se repite con distintos parámetros (N+1);
+  agrega la cabecera X-Query-Count a la respuesta.
+- assert_max_queries(n): context manager para CI, falla si el bloque
+  ejecuta más de n sentencias. QUERY_BUDGETS lo aplica a los endpoints
+  principales (flask check-query-budgets).
+"""
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+
+def _route():
+    if has_request_context():
+        return f"{request.method} {request.path} ({request.endpoint})"
+    return "fuera de petición"
+
+
+def _profile_listeners(app):
+    threshold = app.config.get("SLOW_QUERY_MS", 0)
+
+    # Como en instrumentation.py: el inicio va en el contexto, no en la conexión del pool
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._profile_start = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_profile_start", None)
+        elapsed_ms = (time.perf_counter() - start) * 1000 if start is not None else 0.0
+        if threshold and elapsed_ms >= threshold:
+            app.logger.warning(
+                "Slow query %.1f ms on %s: %s | params=%r",
+                elapsed_ms, _route(), statement, parameters,
+            )
+        if has_request_context() and "query_log" in g:
+            g.query_log.append((statement, parameters, elapsed_ms))
+
+    return before_cursor_execute, after_cursor_execute
+
+
+def _report_n_plus_one(app, response):
+    query_log = g.pop("query_log", None)
+    if query_log is None:
+        return response
+    response.headers["X-Query-Count"] = str(len(query_log))
+
+    threshold = app.config.get("N_PLUS_ONE_THRESHOLD", 5)
+    params_by_statement = {}
+    for statement, parameters, _elapsed in query_log:
+        params_by_statement.setdefault(statement, []).append(repr(parameters))
+    for statement, params in params_by_statement.items():
+        if len(params) >= threshold and len(set(params)) > 1:
+            app.logger.warning(
+                "Possible N+1 on %s: %d executions with different params of: %s",
+                _route(), len(params), statement,
+            )
+    return response
+
+
+def init_query_profiling(app, engines):
+    if not app.config.get("QUERY_PROFILING") and not app.config.get("SLOW_QUERY_MS"):
+        return
+
+    before, after = _profile_listeners(app)
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before)
+        event.listen(engine, "after_cursor_execute", after)
+
+    if app.config.get("QUERY_PROFILING"):
+        @app.before_request
+        def start_query_log():
+            g.query_log = []
+
+        @app.after_request
+        def check_query_log(response):
+            return _report_n_plus_one(app, response)
+
+
+@contextmanager
+def assert_max_queries(n, app=None):
+    """Falla con AssertionError si el bloque ejecuta más de n sentencias SQL.
+
+    Solo cuenta las sentencias del hilo actual, así que funciona con el
+    test client de Flask:
+
+        with assert_max_queries(3, app):
+            client.get("/api/products", headers=auth)
+    """
+    from . import db
+    app = app or current_app._get_current_object()
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    thread_id = threading.get_ident()
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread_id:
+            statements.append(statement)
+
+    for engine in engines:
+        event.listen(engine, "after_cursor_execute", count)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, "after_cursor_execute", count)
+
+    if len(statements) > n:
+        listing = "\n".join(f"  {i + 1}. {s}" for i, s in enumerate(statements))
+        raise AssertionError(f"Expected at most {n} queries, got {len(statements)}:\n{listing}")
+
+
+# Sentencias SQL máximas por endpoint (flask check-query-budgets). No dependen
+# del tamaño de la página: un N+1 las hace crecer con los datos sembrados
+QUERY_BUDGETS = [
+    ("/api/products", 1),
+    ("/api/products?low_stock=true", 1),
+    ("/api/products/1/movements", 1),
+    ("/api/customers", 1),
+    ("/api/suppliers", 1),
+    ("/api/suppliers/1/products", 2),
+    ("/api/suppliers/1/products-catalog", 2),
+    ("/api/sales", 1),
+    ("/api/sales/1", 2),
+    ("/api/purchase-orders", 1),
+    ("/api/dashboard", 7),
+    ("/api/reports/sales-summary", 1),
+    ("/api/reports/top-products", 1),
+    ("/api/reports/top-customers", 1),
+    ("/api/logs", 1),
+    ("/api/users", 1),
+]
+
+
+def check_query_budgets(app, headers, budgets=QUERY_BUDGETS):
+    """GET a cada endpoint con el test client -> [(path, presupuesto, sentencias, estado)]"""
+    client = app.test_client()
+    results = []
+    for path, budget in budgets:
+        statements = []
+        try:
+            with assert_max_queries(budget, app) as statements:
+                response = client.get(path, headers=headers)
+        except AssertionError:
+            pass
+        results.append((path, budget, len(statements), response.status_code))
+    return results
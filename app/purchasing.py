@@ -0,0 +1,192 @@
+"""Órdenes de compra a proveedores y recepción de mercancía.
+
+Las líneas se valoran con purchase_price del catálogo del proveedor. Recibir
+una entrega es una sola transacción: los movimientos de inventario entran
+como un lote (un INSERT y un UPDATE de stock para todas las líneas) y
+quantity_available del proveedor baja con otro UPDATE correlacionado.
+"""
+import uuid
+from datetime import datetime
+from sqlalchemy import bindparam, case, func, select, update
+from . import db, inventory
+from .models import InventoryMovement, PurchaseOrder, PurchaseOrderLine, SupplierProduct
+
+OPEN_STATUSES = ("open", "partial")
+
+
+class PurchaseOrderError(ValueError):
+    """Orden de compra o recepción inválida"""
+
+
+def _quantities(lines, key="quantity"):
+    """[{product_id, quantity}] -> {product_id: quantity} sumando repetidos"""
+    if not isinstance(lines, list) or not lines:
+        raise PurchaseOrderError("lines must be a non-empty list")
+    result = {}
+    for line in lines:
+        try:
+            product_id = int(line["product_id"])
+            quantity = int(line[key])
+        except (KeyError, TypeError, ValueError):
+            raise PurchaseOrderError(f"invalid line: {line}")
+        if quantity <= 0:
+            raise PurchaseOrderError(f"quantity must be positive for product {product_id}")
+        result[product_id] = result.get(product_id, 0) + quantity
+    return result
+
+
+def create_order(supplier_id, lines, user_id=None, notes=None):
+    """Crea la orden con el precio actual del catálogo del proveedor"""
+    quantities = _quantities(lines)
+    prices = dict(db.session.execute(
+        select(SupplierProduct.product_id, SupplierProduct.purchase_price).where(
+            SupplierProduct.supplier_id == supplier_id,
+            SupplierProduct.product_id.in_(list(quantities)),
+        )
+    ).all())
+    missing = sorted(set(quantities) - set(prices))
+    if missing:
+        raise PurchaseOrderError(f"products not in supplier catalog: {missing}")
+
+    order = PurchaseOrder(supplier_id=supplier_id, user_id=user_id, notes=notes, status="open")
+    order.lines = [
+        PurchaseOrderLine(product_id=pid, quantity_ordered=qty, quantity_received=0, unit_cost=prices[pid])
+        for pid, qty in quantities.items()
+    ]
+    order.total_cost = round(sum(line.quantity_ordered * line.unit_cost for line in order.lines), 2)
+    order.landed_cost = 0
+    db.session.add(order)
+    db.session.commit()
+    return order
+
+
+def receive(order_id, lines=None, extra_costs=0.0, user_id=None):
+    """Recibe las líneas indicadas (o todo lo pendiente); devuelve {product_id: stock}.
+
+    extra_costs (flete, aduana) se prorratea según el valor de lo recibido y
+    queda en landed_unit_cost de cada línea y en landed_cost de la orden.
+    """
+    order = db.session.execute(
+        select(PurchaseOrder).where(PurchaseOrder.id == order_id).with_for_update()
+    ).scalar_one_or_none()
+    if order is None:
+        return None
+    if order.status not in OPEN_STATUSES:
+        raise PurchaseOrderError(f"order is {order.status}")
+    if extra_costs < 0:
+        raise PurchaseOrderError("extra_costs must not be negative")
+
+    by_product = {line.product_id: line for line in order.lines}
+    if lines is None:
+        received = {
+            line.product_id: line.quantity_ordered - line.quantity_received
+            for line in order.lines
+            if line.quantity_ordered > line.quantity_received
+        }
+    else:
+        received = _quantities(lines)
+        for product_id, quantity in received.items():
+            line = by_product.get(product_id)
+            if line is None:
+                raise PurchaseOrderError(f"product {product_id} is not in the order")
+            if quantity > line.quantity_ordered - line.quantity_received:
+                raise PurchaseOrderError(f"product {product_id}: received more than pending")
+    if not received:
+        raise PurchaseOrderError("nothing to receive")
+
+    # Prorrateo de los gastos según el valor de cada línea recibida
+    value = sum(by_product[pid].unit_cost * qty for pid, qty in received.items())
+    line_updates = []
+    for product_id, quantity in received.items():
+        line = by_product[product_id]
+        share = extra_costs * (line.unit_cost * quantity / value) if value else extra_costs / len(received)
+        landed = line.unit_cost * quantity + share
+        previous = (line.landed_unit_cost or line.unit_cost) * line.quantity_received
+        total_received = line.quantity_received + quantity
+        line_updates.append({
+            "line_id": line.id,
+            "received": total_received,
+            "landed": round((previous + landed) / total_received, 4),
+        })
+
+    batch_id = uuid.uuid4().hex
+    stocks = inventory.apply_movements(
+        [
+            {"product_id": pid, "kind": "receipt", "quantity": qty, "reference": f"po:{order.id}"}
+            for pid, qty in received.items()
+        ],
+        user_id=user_id,
+        batch_id=batch_id,
+    )
+
+    # Lo recibido ya no está disponible en el proveedor (sin bajar de 0)
+    batch = InventoryMovement.__table__
+    catalog = SupplierProduct.__table__
+    taken = (
+        select(func.sum(batch.c.quantity))
+        .where(batch.c.batch_id == batch_id, batch.c.product_id == catalog.c.product_id)
+        .scalar_subquery()
+    )
+    available = func.coalesce(catalog.c.quantity_available, 0)
+    db.session.execute(
+        update(catalog)
+        .where(
+            catalog.c.supplier_id == order.supplier_id,
+            catalog.c.product_id.in_(select(batch.c.product_id).where(batch.c.batch_id == batch_id)),
+        )
+        .values(
+            quantity_available=case((available > taken, available - taken), else_=0),
+            last_updated=datetime.utcnow(),
+        )
+    )
+
+    order_lines = PurchaseOrderLine.__table__
+    db.session.execute(
+        update(order_lines)
+        .where(order_lines.c.id == bindparam("line_id"))
+        .values(quantity_received=bindparam("received"), landed_unit_cost=bindparam("landed")),
+        line_updates,
+    )
+
+    # Las líneas en memoria quedan viejas hasta el commit (expire_on_commit)
+    totals = {u["line_id"]: u["received"] for u in line_updates}
+    order.landed_cost = round(order.landed_cost + value + extra_costs, 2)
+    complete = all(totals.get(line.id, line.quantity_received) >= line.quantity_ordered for line in order.lines)
+    order.status = "received" if complete else "partial"
+    order.received_at = datetime.utcnow()
+    return stocks
+
+
+def cancel(order):
+    if order.status != "open":
+        raise PurchaseOrderError(f"only open orders can be cancelled (order is {order.status})")
+    order.status = "cancelled"
+    db.session.commit()
+
+
+def serialize(order, with_lines=True):
+    data = {
+        "id": order.id,
+        "supplier_id": order.supplier_id,
+        "supplier": order.supplier.name if order.supplier else None,
+        "status": order.status,
+        "notes": order.notes,
+        "total_cost": order.total_cost,
+        "landed_cost": order.landed_cost,
+        "created_at": order.created_at,
+        "received_at": order.received_at,
+    }
+    if with_lines:
+        data["lines"] = [
+            {
+                "id": line.id,
+                "product_id": line.product_id,
+                "product": line.product.name if line.product else None,
+                "quantity_ordered": line.quantity_ordered,
+                "quantity_received": line.quantity_received,
+                "unit_cost": line.unit_cost,
+                "landed_unit_cost": line.landed_unit_cost,
+            }
+            for line in order.lines
+        ]
+    return data
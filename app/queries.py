@@ -0,0 +1,403 @@
+"""Lecturas de los listados sin instancias del ORM.
+
+Cada función arma un select() solo con las columnas que devuelve la API y
+entrega las filas como dicts listos para jsonify: sin identity map, sin
+atributos instrumentados y sin cargar relaciones.
+
+Con fields= (parse_fields) solo se seleccionan los campos pedidos; los
+joins y agregados que dependen de campos no pedidos no se ejecutan.
+"""
+from sqlalchemy import case, func, null, select, true, tuple_
+from . import db
+from .models import User, Role, Customer, Product, ProductBarcode, Sale, SaleItem, LogEntry, Supplier, SupplierProduct
+
+DEFAULT_IVA = 16
+DEFAULT_MIN_STOCK = 10
+
+
+class UnknownFieldError(ValueError):
+    """fields= pidió un campo que el recurso no tiene"""
+
+
+def parse_fields(value):
+    """'id,name' -> ['id', 'name']; vacío -> None (todos los campos)"""
+    if not value:
+        return None
+    return [name.strip() for name in value.split(",") if name.strip()] or None
+
+
+def _project(available, fields, always=("id",)):
+    """Columnas a seleccionar y dependencias (joins/agregados) que requieren.
+
+    available es {campo: (expresión, dependencias)} en el orden de la respuesta.
+    """
+    if fields is None:
+        names = list(available)
+    else:
+        unknown = [name for name in fields if name not in available]
+        if unknown:
+            raise UnknownFieldError(
+                f"unknown fields: {', '.join(unknown)} (available: {', '.join(available)})"
+            )
+        names = [name for name in available if name in fields or name in always]
+    columns = [available[name][0].label(name) for name in names]
+    needs = {dep for name in names for dep in available[name][1]}
+    return columns, needs
+
+
+def fetch(stmt):
+    """Ejecuta el select y devuelve una lista de dicts"""
+    return [row._asdict() for row in db.session.execute(stmt)]
+
+
+def _contains(column, text):
+    return column.ilike(f"%{text}%")
+
+
+# ==================== USERS ====================
+USER_FIELDS = {
+    "id": (User.id, ()),
+    "username": (User.username, ()),
+    "role": (Role.name, ("role",)),
+    "created_at": (User.created_at, ()),
+}
+
+
+def users(fields=None):
+    columns, needs = _project(USER_FIELDS, fields)
+    stmt = select(*columns).select_from(User).order_by(User.id)
+    if "role" in needs:
+        stmt = stmt.join(Role, Role.id == User.role_id)
+    return fetch(stmt)
+
+
+# ==================== CUSTOMERS ====================
+# Totales de compras en una sola consulta agregada
+_purchases = select(
+    Sale.customer_id,
+    func.sum(Sale.total).label("total_purchases"),
+    func.count(Sale.id).label("purchase_count"),
+).group_by(Sale.customer_id).subquery()
+
+CUSTOMER_FIELDS = {
+    "id": (Customer.id, ()),
+    "name": (Customer.name, ()),
+    "email": (Customer.email, ()),
+    "phone": (Customer.phone, ()),
+    "address": (Customer.address, ()),
+    "total_purchases": (func.coalesce(_purchases.c.total_purchases, 0), ("purchases",)),
+    "purchase_count": (func.coalesce(_purchases.c.purchase_count, 0), ("purchases",)),
+}
+
+
+def _customers_select(fields, available=CUSTOMER_FIELDS):
+    columns, needs = _project(available, fields)
+    stmt = select(*columns).select_from(Customer)
+    if "purchases" in needs:
+        stmt = stmt.outerjoin(_purchases, _purchases.c.customer_id == Customer.id)
+    return stmt
+
+
+def customers(search="", fields=None, ids=None):
+    stmt = _customers_select(fields).order_by(Customer.id)
+    if ids is not None:
+        stmt = stmt.where(Customer.id.in_(ids))
+
+    if search:
+        stmt = stmt.where(
+            _contains(Customer.name, search) |
+            _contains(Customer.email, search) |
+            _contains(Customer.phone, search)
+        )
+    return fetch(stmt)
+
+
+# ==================== SUPPLIERS ====================
+_catalog = select(
+    SupplierProduct.supplier_id,
+    func.count(SupplierProduct.id).label("product_count"),
+).group_by(SupplierProduct.supplier_id).subquery()
+
+SUPPLIER_FIELDS = {
+    "id": (Supplier.id, ()),
+    "name": (Supplier.name, ()),
+    "contact_name": (Supplier.contact_name, ()),
+    "email": (Supplier.email, ()),
+    "phone": (Supplier.phone, ()),
+    "address": (Supplier.address, ()),
+    "product_count": (func.coalesce(_catalog.c.product_count, 0), ("catalog",)),
+}
+
+
+def _suppliers_select(fields, available=SUPPLIER_FIELDS):
+    columns, needs = _project(available, fields)
+    stmt = select(*columns).select_from(Supplier)
+    if "catalog" in needs:
+        stmt = stmt.outerjoin(_catalog, _catalog.c.supplier_id == Supplier.id)
+    return stmt
+
+
+def suppliers(search="", fields=None):
+    stmt = _suppliers_select(fields).order_by(Supplier.id)
+
+    if search:
+        stmt = stmt.where(
+            _contains(Supplier.name, search) |
+            _contains(Supplier.contact_name, search) |
+            _contains(Supplier.email, search)
+        )
+    return fetch(stmt)
+
+
+# ==================== PRODUCTS ====================
+# IVA nulo se trata como 16%, igual que la columna Product.price_with_iva
+_iva = func.coalesce(Product.iva, DEFAULT_IVA)
+_min_stock = func.coalesce(Product.min_stock, DEFAULT_MIN_STOCK)
+
+PRODUCT_FIELDS = {
+    "id": (Product.id, ()),
+    "name": (Product.name, ()),
+    "sku": (Product.sku, ()),
+    "description": (Product.description, ()),
+    "price": (Product.price, ()),
+    "price_with_iva": (Product.price_with_iva, ()),
+    "iva": (_iva, ()),
+    "stock": (Product.stock, ()),
+    "min_stock": (_min_stock, ()),
+    "category": (Product.category, ()),
+    "supplier_id": (Product.supplier_id, ()),
+    "supplier_name": (Supplier.name, ("supplier",)),
+    "is_low_stock": (Product.is_low_stock, ()),
+}
+
+# Forma de GET /suppliers/<sid>/products
+SUPPLIER_PRODUCT_FIELDS = ["id", "name", "category", "price", "price_with_iva", "stock", "min_stock", "is_low_stock"]
+
+
+def _products_select(fields, available=PRODUCT_FIELDS):
+    columns, needs = _project(available, fields)
+    stmt = select(*columns).select_from(Product)
+    if "supplier" in needs:
+        stmt = stmt.outerjoin(Supplier, Supplier.id == Product.supplier_id)
+    return stmt
+
+
+# ?sort= (con "-" adelante, descendente) -> columna indexada; price es el precio con IVA
+PRODUCT_SORTS = {
+    "price": Product.price_with_iva,
+    "name": Product.name,
+    "stock": Product.stock,
+}
+
+
+def products(search="", category="", supplier_id=None, low_stock=False, fields=None, ids=None,
+             min_price=None, max_price=None, sort=None):
+    stmt = _products_select(fields)
+    if sort:
+        column = PRODUCT_SORTS[sort.lstrip("-")]
+        stmt = stmt.order_by(column.desc() if sort.startswith("-") else column, Product.id)
+    else:
+        stmt = stmt.order_by(Product.id)
+    if ids is not None:
+        stmt = stmt.where(Product.id.in_(ids))
+
+    if search:
+        stmt = stmt.where(_contains(Product.name, search))
+    if category:
+        stmt = stmt.where(Product.category == category)
+    if supplier_id:
+        stmt = stmt.where(Product.supplier_id == supplier_id)
+    if low_stock:
+        # Bandera mantenida por inventory.refresh_low_stock (índice is_low_stock, id)
+        stmt = stmt.where(Product.is_low_stock == true())
+    if min_price is not None:
+        stmt = stmt.where(Product.price_with_iva >= min_price)
+    if max_price is not None:
+        stmt = stmt.where(Product.price_with_iva <= max_price)
+    return fetch(stmt)
+
+
+def product_by_code(code, fields=None):
+    """Producto con ese SKU o código de barras exacto (índices únicos); None si no hay"""
+    rows = fetch(_products_select(fields).where(Product.sku == code))
+    if not rows:
+        by_barcode = select(ProductBarcode.product_id).where(ProductBarcode.code == code).scalar_subquery()
+        rows = fetch(_products_select(fields).where(Product.id == by_barcode))
+    return rows[0] if rows else None
+
+
+# ==================== SUPPLIER PRODUCTS ====================
+_margin = Product.price - SupplierProduct.purchase_price
+
+CATALOG_FIELDS = {
+    "id": (SupplierProduct.id, ()),
+    "product_id": (SupplierProduct.product_id, ()),
+    "product_name": (Product.name, ("product",)),
+    "product_category": (Product.category, ("product",)),
+    "purchase_price": (SupplierProduct.purchase_price, ()),
+    "sale_price": (Product.price, ("product",)),
+    "quantity_available": (SupplierProduct.quantity_available, ()),
+    "profit_margin": (func.coalesce(_margin, 0), ("product",)),
+    "profit_percentage": (case(
+        (SupplierProduct.purchase_price > 0, func.coalesce(_margin / SupplierProduct.purchase_price * 100, 0)),
+        else_=0,
+    ), ("product",)),
+    "last_updated": (SupplierProduct.last_updated, ()),
+}
+
+
+def supplier_catalog(supplier_id, fields=None):
+    columns, needs = _project(CATALOG_FIELDS, fields)
+    stmt = select(*columns).select_from(SupplierProduct)\
+        .where(SupplierProduct.supplier_id == supplier_id).order_by(SupplierProduct.id)
+    if "product" in needs:
+        stmt = stmt.outerjoin(Product, Product.id == SupplierProduct.product_id)
+    return fetch(stmt)
+
+
+# ==================== SALES ====================
+SALE_FIELDS = {
+    "id": (Sale.id, ()),
+    "customer": (func.coalesce(Customer.name, "N/A"), ("customer",)),
+    "user": (User.username, ("user",)),
+    "subtotal": (null(), ()),
+    "iva": (null(), ()),
+    "total": (Sale.total, ()),
+    "payment_method": (Sale.payment_method, ()),
+    "status": (Sale.status, ()),
+    "created_at": (Sale.created_at, ()),
+}
+
+SALE_ITEM_FIELDS = {
+    "product": (Product.name, ("product",)),
+    "quantity": (SaleItem.quantity, ()),
+    "unit_price": (SaleItem.unit_price, ()),
+    "iva_amount": (null(), ()),
+    "subtotal": (SaleItem.subtotal, ()),
+}
+
+
+def _sales_select(fields):
+    columns, needs = _project(SALE_FIELDS, fields)
+    stmt = select(*columns).select_from(Sale)
+    if "customer" in needs:
+        stmt = stmt.outerjoin(Customer, Customer.id == Sale.customer_id)
+    if "user" in needs:
+        stmt = stmt.join(User, User.id == Sale.user_id)
+    return stmt
+
+
+def sales(start=None, end=None, customer_id=None, user_id=None, payment_method="", fields=None):
+    stmt = _sales_select(fields).order_by(Sale.created_at.desc())
+
+    if start:
+        stmt = stmt.where(Sale.created_at >= start)
+    if end:
+        stmt = stmt.where(Sale.created_at <= end)
+    if customer_id:
+        stmt = stmt.where(Sale.customer_id == customer_id)
+    if user_id:
+        stmt = stmt.where(Sale.user_id == user_id)
+    if payment_method:
+        stmt = stmt.where(Sale.payment_method == payment_method)
+    return fetch(stmt)
+
+
+def sale(sale_id, fields=None):
+    """Detalle de una venta; "items" es un campo más y solo se consulta si se pide"""
+    with_items = fields is None or "items" in fields
+    if fields is not None:
+        fields = [name for name in fields if name != "items"]
+    rows = fetch(_sales_select(fields).where(Sale.id == sale_id))
+    if not rows:
+        return None
+
+    result = rows[0]
+    if with_items:
+        columns, needs = _project(SALE_ITEM_FIELDS, None, always=())
+        stmt = select(*columns).select_from(SaleItem)\
+            .where(SaleItem.sale_id == sale_id).order_by(SaleItem.id)
+        if "product" in needs:
+            stmt = stmt.join(Product, Product.id == SaleItem.product_id)
+        result["items"] = fetch(stmt)
+    return result
+
+
+# ==================== LOGS ====================
+LOG_FIELDS = {
+    "id": (LogEntry.id, ()),
+    "username": (LogEntry.username, ()),
+    "action": (LogEntry.action, ()),
+    "details": (LogEntry.details, ()),
+    "timestamp": (LogEntry.timestamp, ()),
+}
+
+
+def logs(search="", action="", start=None, end=None, before=None, limit=100, fields=None):
+    """Página de logs del más reciente al más antiguo; before es (timestamp, id).
+
+    id y timestamp siempre se incluyen porque forman el cursor.
+    """
+    columns, _ = _project(LOG_FIELDS, fields, always=("id", "timestamp"))
+    stmt = select(*columns).order_by(LogEntry.timestamp.desc(), LogEntry.id.desc()).limit(limit)
+
+    if search:
+        stmt = stmt.where(_contains(LogEntry.username, search) | _contains(LogEntry.details, search))
+    if action:
+        stmt = stmt.where(_contains(LogEntry.action, action))
+    if start:
+        stmt = stmt.where(LogEntry.timestamp >= start)
+    if end:
+        stmt = stmt.where(LogEntry.timestamp <= end)
+    if before:
+        stmt = stmt.where(tuple_(LogEntry.timestamp, LogEntry.id) < before)
+    return fetch(stmt)
+
+
+# ==================== SYNC ====================
+def _without(available, *names):
+    return {name: spec for name, spec in available.items() if name not in names}
+
+
+def _plain_select(model):
+    def build(fields, available):
+        columns, _ = _project(available, fields)
+        return select(*columns).select_from(model)
+    return build
+
+
+# Entidad -> (campos, armado del select, columna de cambio, id). Los agregados
+# (totales de compras, productos por proveedor) no cambian updated_at y no se
+# sincronizan; supplier_name puede quedar atrasado si se renombra el proveedor.
+SYNC_ENTITIES = {
+    "products": (PRODUCT_FIELDS, _products_select, Product.updated_at, Product.id),
+    "customers": (
+        _without(CUSTOMER_FIELDS, "total_purchases", "purchase_count"),
+        _customers_select, Customer.updated_at, Customer.id,
+    ),
+    "suppliers": (
+        _without(SUPPLIER_FIELDS, "product_count"),
+        _suppliers_select, Supplier.updated_at, Supplier.id,
+    ),
+    "supplier_products": ({
+        "id": (SupplierProduct.id, ()),
+        "supplier_id": (SupplierProduct.supplier_id, ()),
+        "product_id": (SupplierProduct.product_id, ()),
+        "purchase_price": (SupplierProduct.purchase_price, ()),
+        "quantity_available": (SupplierProduct.quantity_available, ()),
+        "last_updated": (SupplierProduct.last_updated, ()),
+    }, _plain_select(SupplierProduct), SupplierProduct.last_updated, SupplierProduct.id),
+}
+
+
+def changed_rows(entity, after=None, limit=1000, fields=None):
+    """Filas con (updated_at, id) posterior a after, en ese orden.
+
+    Cada fila trae updated_at para que el llamador arme el cursor.
+    """
+    available, build, updated, key = SYNC_ENTITIES[entity]
+    stmt = build(fields, available).add_columns(updated.label("updated_at"))\
+        .order_by(updated, key).limit(limit)
+    if after is not None:
+        stmt = stmt.where(tuple_(updated, key) > after)
+    return fetch(stmt)
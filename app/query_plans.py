@@ -0,0 +1,147 @@
+"""Verificación de planes de ejecución de las consultas principales.
+
+Corre EXPLAIN sobre las consultas que usan listados, reportes y dashboard y
+detecta las que recorren la tabla completa en lugar de usar un índice.
+Se ejecuta con `flask check-query-plans` (sale con código 1 si alguna falla).
+"""
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from . import db
+
+# nombre -> (tabla que debe usar índice, SQL con parámetros :nombre)
+MAIN_QUERIES = {
+    "list_sales (rango de fechas)": (
+        "sales",
+        "SELECT id, total, created_at FROM sales WHERE created_at >= :start ORDER BY created_at DESC",
+    ),
+    "list_sales (por cliente)": (
+        "sales",
+        "SELECT id, total FROM sales WHERE customer_id = :id",
+    ),
+    "list_sales (por vendedor)": (
+        "sales",
+        "SELECT id, total FROM sales WHERE user_id = :id",
+    ),
+    "dashboard (ventas de hoy)": (
+        "sales",
+        "SELECT SUM(total) FROM sales WHERE created_at >= :start",
+    ),
+    "get_sale (items)": (
+        "sale_items",
+        "SELECT id, quantity, subtotal FROM sale_items WHERE sale_id = :id",
+    ),
+    "delete_product (ventas del producto)": (
+        "sale_items",
+        "SELECT id FROM sale_items WHERE product_id = :id",
+    ),
+    "list_products (por categoría)": (
+        "products",
+        "SELECT id, name FROM products WHERE category = :category",
+    ),
+    "lookup (por SKU)": (
+        "products",
+        "SELECT id, name, price FROM products WHERE sku = :code",
+    ),
+    "lookup (por código de barras)": (
+        "product_barcodes",
+        "SELECT product_id FROM product_barcodes WHERE code = :code",
+    ),
+    "list_products (rango de precio)": (
+        "products",
+        "SELECT id, name FROM products WHERE price_with_iva BETWEEN :low AND :high ORDER BY price_with_iva",
+    ),
+    "list_products (por proveedor)": (
+        "products",
+        "SELECT id, name FROM products WHERE supplier_id = :id",
+    ),
+    "catálogo del proveedor": (
+        "supplier_products",
+        "SELECT id, purchase_price FROM supplier_products WHERE supplier_id = :id",
+    ),
+    "producto asignado a proveedor": (
+        "supplier_products",
+        "SELECT id FROM supplier_products WHERE supplier_id = :id AND product_id = :id",
+    ),
+    "list_logs (recientes)": (
+        "logs",
+        "SELECT id, action, timestamp FROM logs ORDER BY timestamp DESC LIMIT 100",
+    ),
+}
+
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)(.*)$")
+
+
+def _params():
+    return {
+        "start": datetime.utcnow() - timedelta(days=1),
+        "id": 1,
+        "category": "Cervezas",
+        "code": "7501064191459",
+        "low": 100.0,
+        "high": 200.0,
+    }
+
+
+def _explain_sqlite(conn, table, sql):
+    rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql), _params()).fetchall()
+    plan = [row[3] for row in rows]
+    full_scan = False
+    for detail in plan:
+        match = _SQLITE_SCAN.match(detail)
+        if match and match.group(1) == table and "USING" not in match.group(2):
+            full_scan = True
+    return full_scan, plan
+
+
+def _walk_pg_plan(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk_pg_plan(child)
+
+
+def _explain_postgresql(conn, table, sql):
+    # Con tablas pequeñas Postgres prefiere Seq Scan aunque exista índice;
+    # desactivarlo solo deja el Seq Scan cuando no hay índice utilizable.
+    conn.execute(text("SET LOCAL enable_seqscan = off"))
+    result = conn.execute(text("EXPLAIN (FORMAT JSON) " + sql), _params()).scalar()
+    nodes = list(_walk_pg_plan(result[0]["Plan"]))
+    plan = [f"{n['Node Type']} {n.get('Relation Name', '')}".strip() for n in nodes]
+    full_scan = any(
+        n["Node Type"] == "Seq Scan" and n.get("Relation Name") == table for n in nodes
+    )
+    return full_scan, plan
+
+
+def _explain_mysql(conn, table, sql):
+    rows = conn.execute(text("EXPLAIN " + sql), _params()).mappings().all()
+    plan = [f"{r['table']} type={r['type']} key={r['key']}" for r in rows]
+    full_scan = any(
+        r["table"] == table and r["type"] == "ALL" and not r["key"] and not r["possible_keys"]
+        for r in rows
+    )
+    return full_scan, plan
+
+
+_EXPLAINERS = {
+    "sqlite": _explain_sqlite,
+    "postgresql": _explain_postgresql,
+    "mysql": _explain_mysql,
+    "mariadb": _explain_mysql,
+}
+
+
+def check_query_plans():
+    """Devuelve [(nombre, hace_escaneo_completo, plan)] para cada consulta principal"""
+    dialect = db.engine.dialect.name
+    explain = _EXPLAINERS.get(dialect)
+    if explain is None:
+        raise RuntimeError(f"EXPLAIN no soportado para el dialecto {dialect}")
+
+    results = []
+    with db.engine.connect() as conn:
+        for name, (table, sql) in MAIN_QUERIES.items():
+            with conn.begin():
+                full_scan, plan = explain(conn, table, sql)
+            results.append((name, full_scan, plan))
+    return results
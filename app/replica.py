@@ -0,0 +1,148 @@
+"""Enrutamiento de lecturas a una réplica opcional (bind "replica").
+
+Los handlers GET marcados con @read_replica consultan la réplica si
+REPLICA_DATABASE_URL está configurada. Si la réplica falla se repite el
+handler contra la base principal y la réplica queda en pausa unos segundos.
+Después de que un usuario escribe, sus lecturas se quedan en la principal
+durante REPLICA_PIN_SECONDS (cookie para el navegador y memoria del worker
+para clientes sin cookies), así ve sus propios cambios aunque la réplica
+vaya atrasada.
+"""
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_BIND = "replica"
+PIN_COOKIE = "yandhi_primary_until"
+
+_state_lock = threading.Lock()
+_replica_down_until = 0.0
+_user_pins = {}
+
+
+def _use_replica():
+    return has_app_context() and g.get("db_route") == REPLICA_BIND
+
+
+def _mark_write():
+    if has_request_context():
+        g.db_wrote = True
+
+
+class RoutingSession(Session):
+    """Sesión que manda las lecturas a la réplica cuando el handler lo pide"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+            and _use_replica()
+        ):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _after_flush(session, flush_context):
+    _mark_write()
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _on_orm_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _mark_write()
+
+
+def _current_user_id():
+    user = g.get("current_user")
+    return user.get("id") if isinstance(user, dict) else None
+
+
+def _pinned_to_primary():
+    now = time.time()
+    try:
+        if float(request.cookies.get(PIN_COOKIE, 0)) > now:
+            return True
+    except ValueError:
+        pass
+    user_id = _current_user_id()
+    with _state_lock:
+        return user_id is not None and _user_pins.get(user_id, 0) > now
+
+
+def _replica_available():
+    from . import db
+    if REPLICA_BIND not in current_app.config.get("SQLALCHEMY_BINDS", {}):
+        return False
+    with _state_lock:
+        if _replica_down_until > time.time():
+            return False
+    return REPLICA_BIND in db.engines
+
+
+def _mark_replica_down():
+    global _replica_down_until
+    with _state_lock:
+        _replica_down_until = time.time() + current_app.config.get("REPLICA_RETRY_SECONDS", 30)
+
+
+def read_replica(fn):
+    """Ejecuta un handler GET de solo lectura contra la réplica"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if request.method != "GET" or not _replica_available() or _pinned_to_primary():
+            return fn(*args, **kwargs)
+
+        from . import db
+        g.db_route = REPLICA_BIND
+        try:
+            return fn(*args, **kwargs)
+        except DBAPIError as e:
+            from .admission import is_statement_timeout
+            if is_statement_timeout(e):
+                # La consulta era lenta, la réplica está bien: no repetirla en la principal
+                raise
+            db.session.rollback()
+            _mark_replica_down()
+            current_app.logger.warning("Replica failed on %s, falling back to primary: %s", request.path, e)
+            g.db_route = None
+            return fn(*args, **kwargs)
+        finally:
+            g.db_route = None
+    return wrapper
+
+
+def init_replica(app):
+    """Registra el pin de lectura-después-de-escritura"""
+    if REPLICA_BIND not in app.config.get("SQLALCHEMY_BINDS", {}):
+        return
+
+    @app.after_request
+    def pin_after_write(response):
+        if g.get("db_wrote") and response.status_code < 400:
+            until = time.time() + app.config.get("REPLICA_PIN_SECONDS", 10)
+            user_id = _current_user_id()
+            if user_id is not None:
+                with _state_lock:
+                    _user_pins[user_id] = until
+                    # Limpiar pins vencidos de vez en cuando
+                    if len(_user_pins) > 1000:
+                        now = time.time()
+                        for uid in [u for u, t in _user_pins.items() if t <= now]:
+                            del _user_pins[uid]
+            response.set_cookie(
+                PIN_COOKIE,
+                f"{until:.3f}",
+                max_age=app.config.get("REPLICA_PIN_SECONDS", 10),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
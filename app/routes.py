@@ -1,15 +1,34 @@
-from flask import Blueprint, request, jsonify, current_app, g
+import os
+from flask import Blueprint, request, jsonify, current_app, g, abort, send_file
+from flask_jwt_extended import create_access_token, get_jwt_identity
 from . import db
+from .metrics import render_metrics
 from .utils import role_required, log_db_action
+from .admission import route_cost
+from .replica import read_replica
+from .log_archive import iter_archived_logs
+from . import autocomplete, batch, events, inventory, jobs, price_lists, product_lookup, purchasing, queries, sync
 from .auth import bp as auth_bp
 from datetime import datetime, timedelta
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, true
 from sqlalchemy.exc import IntegrityError
-from .models import User, Role, Customer, Product, Sale, SaleItem, LogEntry, Supplier, SupplierProduct
+from sqlalchemy.orm import joinedload, selectinload
+from .models import (
+    User, Role, Customer, Product, Sale, SaleItem, Supplier, SupplierProduct,
+    InventoryMovement, Job, ProductBarcode, PurchaseOrder, PurchaseOrderLine,
+)
 
 bp = Blueprint("api", __name__)
 bp.register_blueprint(auth_bp)
 
+def _fields():
+    """Campos pedidos con ?fields=id,name (None = todos)"""
+    return queries.parse_fields(request.args.get('fields'))
+
+@bp.errorhandler(queries.UnknownFieldError)
+def unknown_field(e):
+    return jsonify({"msg": str(e)}), 400
+
 # ==================== USERS ====================
 @bp.route("/users", methods=["POST"])
 @role_required(["admin"])
@@ -39,13 +58,7 @@ def create_user():
 @bp.route("/users", methods=["GET"])
 @role_required(["admin", "manager"])
 def list_users():
-    users = User.query.all()
-    return jsonify([{
-        "id": u.id,
-        "username": u.username,
-        "role": u.role.name,
-        "created_at": u.created_at.isoformat()
-    } for u in users])
+    return jsonify(queries.users(fields=_fields()))
 
 @bp.route("/users/<int:user_id>", methods=["DELETE"])
 @role_required(["admin"])
@@ -69,7 +82,10 @@ def create_customer():
         address=data.get("address")
     )
     db.session.add(customer)
+    db.session.flush()
+    events.emit("customer_changed", customer_id=customer.id, action="created")
     db.session.commit()
+    autocomplete.refresh("customer", customer.id)
     log_db_action("create_customer", f"customer_id={customer.id}, name={customer.name}")
     return jsonify({"id": customer.id, "name": customer.name}), 201
 
@@ -77,26 +93,7 @@ def create_customer():
 @role_required(["admin", "manager", "viewer"])
 def list_customers():
     search = request.args.get('search', '')
-    
-    query = Customer.query
-    
-    if search:
-        query = query.filter(
-            (Customer.name.ilike(f'%{search}%')) |
-            (Customer.email.ilike(f'%{search}%')) |
-            (Customer.phone.ilike(f'%{search}%'))
-        )
-    
-    customers = query.all()
-    return jsonify([{
-        "id": c.id,
-        "name": c.name,
-        "email": c.email,
-        "phone": c.phone,
-        "address": c.address,
-        "total_purchases": sum(s.total for s in c.sales) if hasattr(c, 'sales') else 0,
-        "purchase_count": len(c.sales) if hasattr(c, 'sales') else 0
-    } for c in customers])
+    return jsonify(queries.customers(search, fields=_fields()))
 
 @bp.route("/customers/<int:cid>", methods=["PUT"])
 @role_required(["admin", "manager"])
@@ -107,7 +104,9 @@ def update_customer(cid):
     customer.email = data.get("email", customer.email)
     customer.phone = data.get("phone", customer.phone)
     customer.address = data.get("address", customer.address)
+    events.emit("customer_changed", customer_id=cid, action="updated")
     db.session.commit()
+    autocomplete.refresh("customer", cid)
     log_db_action("update_customer", f"customer_id={cid}")
     return jsonify({"msg": "updated"})
 
@@ -116,7 +115,9 @@ def update_customer(cid):
 def delete_customer(cid):
     customer = Customer.query.get_or_404(cid)
     db.session.delete(customer)
+    events.emit("customer_changed", customer_id=cid, action="deleted")
     db.session.commit()
+    autocomplete.refresh("customer", cid)
     log_db_action("delete_customer", f"customer_id={cid}")
     return jsonify({"msg": "deleted"})
 
@@ -141,35 +142,13 @@ def create_supplier():
 @role_required(["admin", "manager", "viewer"])
 def list_suppliers():
     search = request.args.get('search', '')
-    
-    query = Supplier.query
-    
-    if search:
-        query = query.filter(
-            (Supplier.name.ilike(f'%{search}%')) |
-            (Supplier.contact_name.ilike(f'%{search}%')) |
-            (Supplier.email.ilike(f'%{search}%'))
-        )
-    
-    suppliers = query.all()
-    return jsonify([{
-        "id": s.id,
-        "name": s.name,
-        "contact_name": s.contact_name,
-        "email": s.email,
-        "phone": s.phone,
-        "address": s.address,
-        # contar productos del catálogo proveedor-producto si existe,
-        # si no, caer en la relación directa "products"
-        "product_count": len(s.supplier_products) if hasattr(s, "supplier_products") else len(getattr(s, "products", []))
-    } for s in suppliers])
+    return jsonify(queries.suppliers(search, fields=_fields()))
 
 @bp.route("/suppliers/<int:sid>/products", methods=["GET"])
 @role_required(["admin", "manager", "viewer"])
 def list_supplier_products(sid):
     """Obtener todos los productos de un proveedor específico"""
     supplier = Supplier.query.get_or_404(sid)
-    products = Product.query.filter_by(supplier_id=sid).all()
     
     return jsonify({
         "supplier": {
@@ -177,16 +156,7 @@ def list_supplier_products(sid):
             "name": supplier.name,
             "contact_name": supplier.contact_name
         },
-        "products": [{
-            "id": p.id,
-            "name": p.name,
-            "category": p.category,
-            "price": p.price,
-            "price_with_iva": p.price_with_iva,
-            "stock": p.stock,
-            "min_stock": getattr(p, 'min_stock', 10),
-            "is_low_stock": p.is_low_stock
-        } for p in products]
+        "products": queries.products(supplier_id=sid, fields=_fields() or queries.SUPPLIER_PRODUCT_FIELDS)
     })
 
 @bp.route("/suppliers/<int:sid>", methods=["PUT"])
@@ -213,6 +183,18 @@ def delete_supplier(sid):
     return jsonify({"msg": "deleted"})
 
 # ==================== PRODUCTS ====================
+def _apply_codes(product, data):
+    """sku y barcodes del JSON; barcodes reemplaza la lista actual"""
+    sku = (product_lookup.normalize(data["sku"]) or None) if "sku" in data else None
+    codes = {product_lookup.normalize(code) for code in data.get("barcodes") or []} - {""}
+    product_lookup.check_codes(product.id, sku, codes)
+    if "sku" in data:
+        product.sku = sku
+    if "barcodes" in data:
+        current = {barcode.code for barcode in product.barcodes}
+        product.barcodes = [b for b in product.barcodes if b.code in codes] + \
+            [ProductBarcode(code=code) for code in sorted(codes - current)]
+
 @bp.route("/products", methods=["POST"])
 @role_required(["admin", "manager"])
 def create_product():
@@ -227,105 +209,74 @@ def create_product():
             description=data.get("description"),
             price=data.get("price"),
             iva=iva,
-            stock=data.get("stock", 0),
+            stock=0,
             min_stock=data.get("min_stock", 10),
             category=data.get("category"),
             supplier_id=data.get("supplier_id")
         )
+        _apply_codes(product, data)
         db.session.add(product)
+        db.session.flush()
+        # El stock inicial entra por el libro de inventario
+        inventory.apply_movements(
+            [{"product_id": product.id, "kind": "opening", "quantity": int(data.get("stock") or 0)}],
+            user_id=g.current_user.get("id"),
+        )
+        inventory.refresh_low_stock([product.id])
+        events.emit("catalog_changed", product_id=product.id, action="created")
         db.session.commit()
+        autocomplete.refresh("product", product.id)
         log_db_action("create_product", f"product_id={product.id}, name={product.name}")
         return jsonify({"id": product.id, "name": product.name}), 201
+    except (IntegrityError, product_lookup.CodeInUse):
+        db.session.rollback()
+        return jsonify({"msg": "sku or barcode already in use"}), 409
     except Exception as e:
-        current_app.logger.error(f"Error creating product: {str(e)}")
+        current_app.logger.error("Error creating product: %s", e)
         db.session.rollback()
         return jsonify({"msg": f"Error creating product: {str(e)}"}), 500
 
 @bp.route("/products", methods=["GET"])
 @role_required(["admin", "manager", "viewer"])
 def list_products():
+    # Filtros de búsqueda
+    search = request.args.get('search', '')
+    category = request.args.get('category', '')
+    supplier_id = request.args.get('supplier_id', '')
+    low_stock = request.args.get('low_stock', '')
+    sort = request.args.get('sort', '')
+    
+    if supplier_id and not supplier_id.isdigit():
+        return jsonify({"msg": "invalid supplier_id"}), 400
+    if sort and sort.lstrip('-') not in queries.PRODUCT_SORTS:
+        return jsonify({"msg": f"sort must be one of: {', '.join(queries.PRODUCT_SORTS)} (prefix - for descending)"}), 400
     try:
-        # Filtros de búsqueda
-        search = request.args.get('search', '')
-        category = request.args.get('category', '')
-        supplier_id = request.args.get('supplier_id', '')
-        low_stock = request.args.get('low_stock', '')
-        
-        query = Product.query
-        
-        if search:
-            query = query.filter(Product.name.ilike(f'%{search}%'))
-        
-        if category:
-            query = query.filter_by(category=category)
-        
-        if supplier_id:
-            query = query.filter_by(supplier_id=int(supplier_id))
-        
-        if low_stock == 'true':
-            query = query.filter(Product.stock <= Product.min_stock)
-        
-        products = query.all()
-        result = []
-        
-        for p in products:
-            try:
-                # Obtener IVA de forma segura (puede ser iva, iva_rate, o default 16)
-                iva = 16
-                if hasattr(p, 'iva') and p.iva:
-                    iva = p.iva
-                elif hasattr(p, 'iva_rate') and p.iva_rate:
-                    iva = p.iva_rate
-                
-                # Calcular precio con IVA
-                price_with_iva = p.price * (1 + iva / 100)
-                
-                # Obtener nombre del proveedor
-                supplier_name = None
-                if p.supplier_id and hasattr(p, 'supplier') and p.supplier:
-                    supplier_name = p.supplier.name
-                
-                # Construir diccionario del producto
-                product_data = {
-                    "id": p.id,
-                    "name": p.name,
-                    "description": p.description,
-                    "price": p.price,
-                    "price_with_iva": price_with_iva,
-                    "iva": iva,  # Solo devolver el porcentaje de IVA
-                    "stock": p.stock,
-                    "min_stock": getattr(p, 'min_stock', 10),
-                    "category": p.category,
-                    "supplier_id": p.supplier_id,
-                    "supplier_name": supplier_name,
-                    "is_low_stock": p.stock <= getattr(p, 'min_stock', 10)
-                }
-                
-                result.append(product_data)
-            except Exception as e:
-                current_app.logger.error(f"Error processing product {p.id}: {str(e)}")
-                # Agregar producto con datos mínimos
-                result.append({
-                    "id": p.id,
-                    "name": p.name,
-                    "description": p.description or "",
-                    "price": p.price,
-                    "price_with_iva": p.price * 1.16,
-                    "iva": 16,
-                    "stock": p.stock,
-                    "min_stock": 10,
-                    "category": p.category or "",
-                    "supplier_id": None,
-                    "supplier_name": "Error",
-                    "is_low_stock": False
-                })
-        
-        return jsonify(result)
-    except Exception as e:
-        current_app.logger.error(f"Error in list_products: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({"msg": f"Error loading products: {str(e)}"}), 500
+        # Rango sobre el precio con IVA
+        min_price = float(request.args['min_price']) if request.args.get('min_price') else None
+        max_price = float(request.args['max_price']) if request.args.get('max_price') else None
+    except ValueError:
+        return jsonify({"msg": "invalid min_price or max_price"}), 400
+    
+    return jsonify(queries.products(
+        search=search,
+        category=category,
+        supplier_id=int(supplier_id) if supplier_id else None,
+        low_stock=low_stock == 'true',
+        fields=_fields(),
+        min_price=min_price,
+        max_price=max_price,
+        sort=sort or None,
+    ))
+
+@bp.route("/products/lookup", methods=["GET"])
+@role_required(["admin", "manager", "viewer"])
+@route_cost("cheap")
+def lookup_product():
+    """Producto por SKU o código de barras exacto (?code=), para el escáner"""
+    product = product_lookup.lookup(request.args.get('code'))
+    if product is None:
+        return jsonify({"msg": "product not found"}), 404
+    return jsonify(product)
 
 @bp.route("/products/<int:pid>", methods=["PUT"])
 @role_required(["admin", "manager"])
@@ -337,7 +288,6 @@ def update_product(pid):
         product.name = data.get("name", product.name)
         product.description = data.get("description", product.description)
         product.price = data.get("price", product.price)
-        product.stock = data.get("stock", product.stock)
         
         # Actualizar min_stock de forma segura
         if "min_stock" in data:
@@ -347,6 +297,7 @@ def update_product(pid):
         
         product.category = data.get("category", product.category)
         product.supplier_id = data.get("supplier_id", product.supplier_id)
+        _apply_codes(product, data)
         
         # Actualizar IVA (puede venir como iva o iva_rate)
         if "iva" in data:
@@ -357,11 +308,28 @@ def update_product(pid):
             elif hasattr(product, 'iva_rate'):
                 product.iva_rate = data.get("iva_rate")
         
+        # Un cambio de stock es un ajuste en el libro de inventario
+        stocks = {}
+        if data.get("stock") is not None:
+            stocks = inventory.set_stock(pid, int(data["stock"]), user_id=g.current_user.get("id"),
+                                         reference="product edit")
+        if "min_stock" in data:
+            inventory.refresh_low_stock([pid])
+        
+        events.emit("catalog_changed", product_id=pid, action="updated")
+        if stocks:
+            events.emit("stock_changed", products=[{"id": pid, "stock": stocks[pid]}])
         db.session.commit()
+        # Los demás workers lo invalidan con el evento catalog_changed
+        product_lookup.invalidate(pid)
+        autocomplete.refresh("product", pid)
         log_db_action("update_product", f"product_id={pid}")
         return jsonify({"msg": "updated"})
+    except (IntegrityError, product_lookup.CodeInUse):
+        db.session.rollback()
+        return jsonify({"msg": "sku or barcode already in use"}), 409
     except Exception as e:
-        current_app.logger.error(f"Error updating product {pid}: {str(e)}")
+        current_app.logger.error("Error updating product %s: %s", pid, e)
         db.session.rollback()
         return jsonify({"msg": f"Error updating product: {str(e)}"}), 500
 
@@ -376,14 +344,26 @@ def delete_product(pid):
                 "msg": "No se puede eliminar el producto porque tiene ventas registradas."
             }), 400
 
-        # 2) Eliminar relaciones del catálogo proveedor-producto
+        # 2) Las líneas de órdenes de compra lo referencian (abiertas o recibidas)
+        if db.session.query(PurchaseOrderLine.id).filter_by(product_id=pid).first() is not None:
+            return jsonify({"msg": "product has purchase orders"}), 409
+
+        # 3) El libro de inventario es de solo inserción: con movimientos
+        #    (aunque sea solo la apertura) el producto se queda
+        if db.session.query(InventoryMovement.id).filter_by(product_id=pid).first() is not None:
+            return jsonify({"msg": "product has inventory movements"}), 409
+
+        # 4) Eliminar relaciones del catálogo proveedor-producto
         if hasattr(product, "supplier_products") and product.supplier_products:
             for sp in list(product.supplier_products):
                 db.session.delete(sp)
 
-        # 3) Ahora sí, eliminar el producto
+        # 5) Ahora sí, eliminar el producto
         db.session.delete(product)
+        events.emit("catalog_changed", product_id=pid, action="deleted")
         db.session.commit()
+        product_lookup.invalidate(pid)
+        autocomplete.refresh("product", pid)
         log_db_action("delete_product", f"product_id={pid}")
         return jsonify({"msg": "deleted"})
 
@@ -403,9 +383,25 @@ def delete_product(pid):
             "error": str(e)
         }), 500
 
+# ==================== AUTOCOMPLETE ====================
+@bp.route("/autocomplete", methods=["GET"])
+@role_required(["admin", "manager", "viewer"])
+@route_cost("cheap")
+def autocomplete_names():
+    """Hasta 10 productos o clientes cuyo nombre (o una palabra) empieza con q"""
+    entity = request.args.get('entity', '')
+    if entity not in autocomplete.ENTITIES:
+        return jsonify({"msg": f"entity must be one of: {', '.join(autocomplete.ENTITIES)}"}), 400
+    try:
+        limit = int(request.args.get('limit', autocomplete.MAX_RESULTS))
+    except ValueError:
+        return jsonify({"msg": "invalid limit"}), 400
+    return jsonify(autocomplete.search(entity, request.args.get('q', ''), max(limit, 1)))
+
 # ==================== SALES ====================
 @bp.route("/sales", methods=["POST"])
 @role_required(["admin", "manager"])
+@route_cost("priority")
 def create_sale():
     try:
         data = request.get_json() or {}
@@ -416,30 +412,41 @@ def create_sale():
 
         subtotal = 0.0
         total_iva = 0.0
+        lines = []
 
-        # --- Validar items y calcular totales ---
+        items = []
         for item in items_data:
-            product_id = item.get("product_id")
+            if not isinstance(item, dict):
+                return jsonify({"msg": "Invalid item data"}), 400
             quantity = item.get("quantity")
+            # Se acepta "1" igual que 1; las claves del dict de productos son int
+            try:
+                product_id = int(item.get("product_id"))
+            except (TypeError, ValueError):
+                return jsonify({"msg": "Invalid item data"}), 400
 
             if not product_id or not isinstance(quantity, (int, float)) or quantity <= 0:
                 return jsonify({"msg": "Invalid item data"}), 400
+            items.append((product_id, quantity))
 
-            product = Product.query.get(product_id)
+        # Cargar todos los productos de la venta en una sola consulta
+        product_ids = {product_id for product_id, _ in items}
+        products = {p.id: p for p in Product.query.filter(Product.id.in_(product_ids)).all()}
+
+        # --- Validar items y calcular totales ---
+        for product_id, quantity in items:
+            product = products.get(product_id)
             if not product:
                 return jsonify({"msg": f"Product {product_id} not found"}), 404
 
             if product.stock < quantity:
                 return jsonify({"msg": f"Insufficient stock for {product.name}"}), 400
 
-            # IVA seguro (si product.iva es None, usa 16 por defecto)
-            iva_attr = getattr(product, "iva", None)
-            if iva_attr is None:
-                iva_attr = getattr(product, "iva_rate", 16)
-            iva_rate = iva_attr if isinstance(iva_attr, (int, float)) else 16
-
+            # price_with_iva es una columna calculada por la base
             line_subtotal = product.price * quantity
-            line_iva = line_subtotal * (iva_rate / 100.0)
+            line_total = product.price_with_iva * quantity
+            line_iva = round(line_total - line_subtotal, 2)
+            lines.append((product, quantity, line_total, line_iva))
 
             subtotal += line_subtotal
             total_iva += line_iva
@@ -476,20 +483,9 @@ def create_sale():
         db.session.add(sale)
         db.session.flush()  # para obtener sale.id
 
-        # --- Crear items y actualizar stock ---
-        for item in items_data:
-            product = Product.query.get(item["product_id"])
-            quantity = item["quantity"]
-
-            iva_attr = getattr(product, "iva", None)
-            if iva_attr is None:
-                iva_attr = getattr(product, "iva_rate", 16)
-            iva_rate = iva_attr if isinstance(iva_attr, (int, float)) else 16
-
-            line_subtotal = product.price * quantity
-            line_iva = line_subtotal * (iva_rate / 100.0)
-            line_total = line_subtotal + line_iva
-
+        # --- Crear items y registrar la salida de inventario ---
+        movements = []
+        for product, quantity, line_total, line_iva in lines:
             sale_item = SaleItem(
                 sale_id=sale.id,
                 product_id=product.id,
@@ -502,9 +498,21 @@ def create_sale():
             if hasattr(SaleItem, "iva_amount"):
                 sale_item.iva_amount = line_iva
 
-            product.stock -= quantity
+            movements.append({
+                "product_id": product.id, "kind": "sale", "quantity": -quantity, "reference": f"sale:{sale.id}"
+            })
             db.session.add(sale_item)
 
+        # UPDATE relativo: si una venta concurrente consumió el stock, se rechaza
+        try:
+            stocks = inventory.apply_movements(movements, user_id=user_id)
+        except inventory.InsufficientStock as e:
+            names = ", ".join(products[pid].name for pid in e.product_ids)
+            db.session.rollback()
+            return jsonify({"msg": f"Insufficient stock for {names}"}), 400
+
+        events.emit("sale_created", sale_id=sale.id, total=total)
+        events.emit("stock_changed", products=[{"id": k, "stock": v} for k, v in stocks.items()])
         db.session.commit()
         log_db_action("create_sale", f"sale_id={sale.id}, total=${total:.2f}")
 
@@ -524,6 +532,8 @@ def create_sale():
 
 @bp.route("/sales", methods=["GET"])
 @role_required(["admin", "manager", "viewer"])
+@route_cost("expensive")
+@read_replica
 def list_sales():
     # Filtros de consulta
     start_date = request.args.get('start_date', '')
@@ -532,80 +542,181 @@ def list_sales():
     user_id = request.args.get('user_id', '')
     payment_method = request.args.get('payment_method', '')
 
-    query = Sale.query
-
-    if start_date:
-        query = query.filter(Sale.created_at >= datetime.fromisoformat(start_date))
-
-    if end_date:
-        query = query.filter(Sale.created_at <= datetime.fromisoformat(end_date))
-
-    if customer_id:
-        query = query.filter_by(customer_id=int(customer_id))
-
-    if user_id:
-        query = query.filter_by(user_id=int(user_id))
-
-    if payment_method:
-        query = query.filter_by(payment_method=payment_method)
-
-    sales = query.order_by(Sale.created_at.desc()).all()
-
-    return jsonify([{
-        "id": s.id,
-        "customer": s.customer.name if s.customer else "N/A",
-        "user": s.user.username,
-        "subtotal": getattr(s, 'subtotal', None),
-        "iva": getattr(s, 'iva', None),
-        "total": s.total,
-        "payment_method": s.payment_method,
-        "status": s.status,
-        "created_at": s.created_at.isoformat()
-    } for s in sales])
+    return jsonify(queries.sales(
+        start=datetime.fromisoformat(start_date) if start_date else None,
+        end=datetime.fromisoformat(end_date) if end_date else None,
+        customer_id=int(customer_id) if customer_id else None,
+        user_id=int(user_id) if user_id else None,
+        payment_method=payment_method,
+        fields=_fields(),
+    ))
 
 
 @bp.route("/sales/<int:sid>", methods=["GET"])
 @role_required(["admin", "manager", "viewer"])
+@route_cost("cheap")
 def get_sale(sid):
-    sale = Sale.query.get_or_404(sid)
-    return jsonify({
-        "id": sale.id,
-        "customer": sale.customer.name if sale.customer else "N/A",
-        "user": sale.user.username,
-        "subtotal": getattr(sale, 'subtotal', None),
-        "iva": getattr(sale, 'iva', None),
-        "total": sale.total,
-        "payment_method": sale.payment_method,
-        "status": sale.status,
-        "created_at": sale.created_at.isoformat(),
-        "items": [{
-            "product": item.product.name,
-            "quantity": item.quantity,
-            "unit_price": item.unit_price,
-            "iva_amount": getattr(item, 'iva_amount', None),
-            "subtotal": item.subtotal
-        } for item in sale.items]
-    })
+    sale = queries.sale(sid, fields=_fields())
+    if sale is None:
+        abort(404)
+    return jsonify(sale)
 
 
 @bp.route("/sales/<int:sid>", methods=["DELETE"])
 @role_required(["admin"])
 def delete_sale(sid):
-    sale = Sale.query.get_or_404(sid)
-    # Restaurar stock
-    for item in sale.items:
-        product = Product.query.get(item.product_id)
-        if product:
-            product.stock += item.quantity
-    db.session.delete(sale)
+    if db.session.get(Sale, sid) is None:
+        abort(404)
+    items = db.session.query(SaleItem.product_id, SaleItem.quantity).filter_by(sale_id=sid).all()
+    # Restaurar stock con una devolución en el libro
+    restored = inventory.apply_movements(
+        [{"product_id": i.product_id, "kind": "return", "quantity": i.quantity, "reference": f"sale:{sid}"}
+         for i in items],
+        user_id=g.current_user.get("id"),
+    )
+    # Los items primero: la relación no tiene cascade y sale_id es NOT NULL
+    SaleItem.query.filter_by(sale_id=sid).delete(synchronize_session=False)
+    Sale.query.filter_by(id=sid).delete(synchronize_session=False)
+    events.emit("sale_deleted", sale_id=sid)
+    if restored:
+        events.emit("stock_changed", products=[{"id": k, "stock": v} for k, v in restored.items()])
     db.session.commit()
     log_db_action("delete_sale", f"sale_id={sid}")
     return jsonify({"msg": "deleted"})
 
 
+# ==================== INVENTORY ====================
+@bp.route("/products/<int:pid>/movements", methods=["GET"])
+@role_required(["admin", "manager", "viewer"])
+@read_replica
+def list_product_movements(pid):
+    """Libro de inventario de un producto, del más reciente al más viejo (?before=<id>)"""
+    before = request.args.get('before', '')
+    if before and not before.isdigit():
+        return jsonify({"msg": "invalid before"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 100)), 1), 500)
+    except ValueError:
+        return jsonify({"msg": "invalid limit"}), 400
+    return jsonify(inventory.movements_for(pid, before=int(before) if before else None, limit=limit))
+
+@bp.route("/inventory/stock-at", methods=["GET"])
+@role_required(["admin", "manager", "viewer"])
+@route_cost("expensive")
+@read_replica
+def inventory_stock_at():
+    """Stock por producto en una fecha: ?at=2026-01-31T23:59:59[&product_id=1,2]"""
+    try:
+        at = datetime.fromisoformat(request.args['at'])
+    except (KeyError, ValueError):
+        return jsonify({"msg": "at must be an ISO date"}), 400
+    product_ids = request.args.get('product_id', '')
+    if product_ids and not all(p.isdigit() for p in product_ids.split(',')):
+        return jsonify({"msg": "invalid product_id"}), 400
+    stocks = inventory.stock_at(at, [int(p) for p in product_ids.split(',')] if product_ids else None)
+    return jsonify([{"product_id": pid, "stock": stock} for pid, stock in sorted(stocks.items())])
+
+@bp.route("/inventory/low-stock-transitions", methods=["GET"])
+@role_required(["admin", "manager", "viewer"])
+@read_replica
+def low_stock_transitions():
+    """Outbox de entradas/salidas de stock bajo: ?after=<id> del último leído"""
+    after = request.args.get('after', '0')
+    if not after.isdigit():
+        return jsonify({"msg": "invalid after"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 500)), 1), 1000)
+    except ValueError:
+        return jsonify({"msg": "invalid limit"}), 400
+    rows = inventory.transitions(after=int(after), limit=limit)
+    return jsonify({"transitions": rows, "cursor": rows[-1]["id"] if rows else int(after)})
+
+
+# ==================== PURCHASE ORDERS ====================
+def _load_order(order_id):
+    return PurchaseOrder.query.options(
+        joinedload(PurchaseOrder.supplier),
+        selectinload(PurchaseOrder.lines).joinedload(PurchaseOrderLine.product),
+    ).filter_by(id=order_id).first_or_404()
+
+@bp.route("/purchase-orders", methods=["POST"])
+@role_required(["admin", "manager"])
+def create_purchase_order():
+    """{"supplier_id", "lines": [{"product_id", "quantity"}], "notes"}; precios del catálogo"""
+    data = request.get_json(silent=True) or {}
+    supplier = Supplier.query.get_or_404(data.get("supplier_id") or 0)
+    try:
+        order = purchasing.create_order(
+            supplier.id, data.get("lines"), user_id=g.current_user.get("id"), notes=data.get("notes")
+        )
+    except purchasing.PurchaseOrderError as e:
+        return jsonify({"msg": str(e)}), 400
+    log_db_action("create_purchase_order", f"po_id={order.id}, supplier_id={supplier.id}, lines={len(order.lines)}")
+    return jsonify(purchasing.serialize(_load_order(order.id))), 201
+
+@bp.route("/purchase-orders", methods=["GET"])
+@role_required(["admin", "manager", "viewer"])
+@read_replica
+def list_purchase_orders():
+    query = PurchaseOrder.query.options(joinedload(PurchaseOrder.supplier))
+    status = request.args.get('status', '')
+    supplier_id = request.args.get('supplier_id', '')
+    if status:
+        query = query.filter(PurchaseOrder.status == status)
+    if supplier_id:
+        if not supplier_id.isdigit():
+            return jsonify({"msg": "invalid supplier_id"}), 400
+        query = query.filter(PurchaseOrder.supplier_id == int(supplier_id))
+    orders = query.order_by(PurchaseOrder.created_at.desc()).limit(200).all()
+    return jsonify([purchasing.serialize(o, with_lines=False) for o in orders])
+
+@bp.route("/purchase-orders/<int:po_id>", methods=["GET"])
+@role_required(["admin", "manager", "viewer"])
+@route_cost("cheap")
+def get_purchase_order(po_id):
+    return jsonify(purchasing.serialize(_load_order(po_id)))
+
+@bp.route("/purchase-orders/<int:po_id>/receive", methods=["POST"])
+@role_required(["admin", "manager"])
+def receive_purchase_order(po_id):
+    """Recibe la entrega en una transacción: {"lines": [{"product_id", "quantity"}]?, "extra_costs"}.
+
+    Sin lines se recibe todo lo pendiente. extra_costs (flete, aduana) se
+    prorratea en el costo de llegada de cada línea.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        extra_costs = float(data.get("extra_costs") or 0)
+        stocks = purchasing.receive(
+            po_id, lines=data.get("lines"), extra_costs=extra_costs, user_id=g.current_user.get("id")
+        )
+    except (purchasing.PurchaseOrderError, ValueError, TypeError) as e:
+        db.session.rollback()
+        return jsonify({"msg": str(e)}), 400
+    if stocks is None:
+        abort(404)
+    events.emit("stock_changed", products=[{"id": k, "stock": v} for k, v in stocks.items()])
+    db.session.commit()
+    log_db_action("receive_purchase_order", f"po_id={po_id}, products={len(stocks)}")
+    return jsonify(purchasing.serialize(_load_order(po_id)))
+
+@bp.route("/purchase-orders/<int:po_id>/cancel", methods=["POST"])
+@role_required(["admin", "manager"])
+def cancel_purchase_order(po_id):
+    order = PurchaseOrder.query.get_or_404(po_id)
+    try:
+        purchasing.cancel(order)
+    except purchasing.PurchaseOrderError as e:
+        return jsonify({"msg": str(e)}), 400
+    log_db_action("cancel_purchase_order", f"po_id={po_id}")
+    return jsonify({"msg": "cancelled"})
+
+
 # ==================== REPORTS / CONSULTAS ====================
 @bp.route("/reports/sales-summary", methods=["GET"])
 @role_required(["admin", "manager", "viewer"])
+@route_cost("expensive")
+@read_replica
 def sales_summary():
     """Resumen de ventas por período"""
     period = request.args.get('period', 'today')
@@ -639,6 +750,8 @@ def sales_summary():
 
 @bp.route("/reports/top-products", methods=["GET"])
 @role_required(["admin", "manager", "viewer"])
+@route_cost("expensive")
+@read_replica
 def top_products():
     """Productos más vendidos"""
     limit = request.args.get('limit', 10, type=int)
@@ -658,6 +771,8 @@ def top_products():
 
 @bp.route("/reports/top-customers", methods=["GET"])
 @role_required(["admin", "manager", "viewer"])
+@route_cost("expensive")
+@read_replica
 def top_customers():
     """Clientes frecuentes"""
     limit = request.args.get('limit', 10, type=int)
@@ -676,42 +791,199 @@ def top_customers():
     } for row in top])
 
 # ==================== LOGS ====================
+LOGS_PAGE_SIZE = 100
+LOGS_MAX_PAGE_SIZE = 500
+
+def _log_cursor(value):
+    """'timestamp|id' -> (datetime, id)"""
+    timestamp, _, log_id = value.rpartition("|")
+    return datetime.fromisoformat(timestamp), int(log_id)
+
 @bp.route("/logs", methods=["GET"])
 @role_required(["admin", "manager"])
+@route_cost("expensive")
+@read_replica
 def list_logs():
+    """Logs del más reciente al más antiguo, paginados por cursor.
+
+    La respuesta sigue siendo una lista; la cabecera X-Next-Cursor trae el
+    cursor de la siguiente página. Con archived=true, al agotarse la tabla
+    se sigue buscando en los archivos de flask archive-logs.
+    """
     search = request.args.get('search', '')
     action = request.args.get('action', '')
+    include_archived = request.args.get('archived', 'false').lower() == 'true'
+    try:
+        limit = min(max(int(request.args.get('limit', LOGS_PAGE_SIZE)), 1), LOGS_MAX_PAGE_SIZE)
+        cursor = _log_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        start = datetime.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = datetime.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        return jsonify({"msg": "invalid limit, cursor, start or end"}), 400
     
-    query = LogEntry.query
+    fields = _fields()
+    results = queries.logs(search=search, action=action, start=start, end=end, before=cursor, limit=limit,
+                           fields=fields)
     
-    if search:
-        query = query.filter(
-            (LogEntry.username.ilike(f'%{search}%')) |
-            (LogEntry.details.ilike(f'%{search}%'))
-        )
+    if include_archived and len(results) < limit:
+        before = (results[-1]["timestamp"], results[-1]["id"]) if results else cursor
+        archived = iter_archived_logs(before=before, search=search, action=action, start=start, end=end)
+        for row in archived:
+            results.append({
+                **{k: row[k] for k in queries.LOG_FIELDS if fields is None or k in fields or k in ("id", "timestamp")},
+                "archived": True,
+            })
+            if len(results) >= limit:
+                break
     
-    if action:
-        query = query.filter(LogEntry.action.ilike(f'%{action}%'))
+    response = jsonify(results)
+    if len(results) == limit:
+        last = results[-1]
+        timestamp = last["timestamp"].isoformat() if isinstance(last["timestamp"], datetime) else last["timestamp"]
+        response.headers["X-Next-Cursor"] = f"{timestamp}|{last['id']}"
+    return response
+
+# ==================== JOBS ====================
+@bp.route("/jobs", methods=["POST"])
+@role_required(["admin", "manager", "viewer"])
+def create_job():
+    """Encola un reporte o exportación; un pedido idéntico reciente reutiliza el trabajo existente"""
+    data = request.get_json() or {}
+    try:
+        job, reused = jobs.enqueue(data.get("kind"), data.get("params"), user_id=g.current_user.get("id"))
+    except jobs.JobError as e:
+        return jsonify({"msg": str(e)}), 400
+    if not reused:
+        log_db_action("create_job", f"job_id={job.id}, kind={job.kind}")
+    response = jsonify({**jobs.serialize(job), "reused": reused})
+    response.status_code = 200 if job.status == "done" else 202
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return response
+
+@bp.route("/jobs/<int:job_id>", methods=["GET"])
+@role_required(["admin", "manager", "viewer"])
+@route_cost("cheap")
+def get_job(job_id):
+    """Estado y avance; download_url cuando terminó"""
+    return jsonify(jobs.serialize(Job.query.get_or_404(job_id)))
+
+@bp.route("/jobs/<int:job_id>/result", methods=["GET"])
+@role_required(["admin", "manager", "viewer"], locations=["headers", "query_string"])
+@route_cost("cheap")
+def download_job_result(job_id):
+    """Archivo generado; el token puede ir en ?token= para descargar con un enlace"""
+    job = Job.query.get_or_404(job_id)
+    if job.status != "done":
+        return jsonify({"msg": f"job is {job.status}", "status": job.status}), 409
+    if not job.result_path or not os.path.exists(job.result_path):
+        return jsonify({"msg": "result expired, request the job again"}), 404
+    extension = os.path.splitext(job.result_path)[1]
+    return send_file(job.result_path, mimetype=job.content_type, as_attachment=True,
+                     download_name=f"{job.kind}-{job.id}{extension}", max_age=0)
+
+# ==================== EVENTS ====================
+@bp.route("/events/token", methods=["POST"])
+@role_required(["admin", "manager", "viewer"])
+@route_cost("cheap")
+def event_stream_token():
+    """Token corto que solo sirve para abrir /api/events.
+
+    EventSource no permite cabeceras y lo que va en la URL queda en los logs
+    de acceso: ahí va este token y no el de sesión.
+    """
+    seconds = current_app.config["EVENTS_TOKEN_SECONDS"]
+    token = create_access_token(
+        identity=get_jwt_identity(), expires_delta=timedelta(seconds=seconds), additional_claims={"scope": "events"}
+    )
+    return jsonify({"token": token, "expires_in": seconds})
+
+@bp.route("/events", methods=["GET"])
+@role_required(["admin", "manager", "viewer"], locations=["headers", "query_string"], scope="events")
+@route_cost("cheap")
+def event_stream():
+    """Canal SSE: stock_changed, sale_created, sale_deleted y catalog_changed.
+
+    El token va en ?token= y es el de POST /api/events/token. Al reconectar se
+    envía last_event_id (o Last-Event-ID) y se reenvía lo perdido.
+    """
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    if last_event_id and not last_event_id.isdigit():
+        return jsonify({"msg": "invalid Last-Event-ID"}), 400
     
-    logs = query.order_by(LogEntry.timestamp.desc()).limit(100).all()
+    client = events.hub.subscribe()
+    if client is None:
+        response = jsonify({"msg": "too many event streams, retry later"})
+        response.status_code = 503
+        response.headers["Retry-After"] = "15"
+        return response
     
-    return jsonify([{
-        "id": l.id,
-        "username": l.username,
-        "action": l.action,
-        "details": l.details,
-        "timestamp": l.timestamp.isoformat()
-    } for l in logs])
+    try:
+        backlog, truncated = events.replay(int(last_event_id)) if last_event_id else ([], False)
+    except Exception:
+        events.hub.unsubscribe(client)
+        raise
+    response = current_app.response_class(events.stream(client, backlog, truncated), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Sin buffer en nginx para que cada evento salga al momento
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+# ==================== SYNC ====================
+SYNC_MAX_PAGE_SIZE = 5000
+
+@bp.route("/sync/<entity>", methods=["GET"])
+@role_required(["admin", "manager", "viewer"])
+def sync_changes(entity):
+    """Cambios de products, customers, suppliers o supplier_products desde ?since=<cursor>.
+
+    rows trae las filas nuevas o modificadas y deleted los ids eliminados;
+    con reset=true el cliente descarta su copia antes de aplicar. Mientras
+    has_more sea true se repite con el cursor devuelto.
+    """
+    if entity not in sync.TRACKED_MODELS:
+        return jsonify({"msg": f"unknown entity: {entity}"}), 404
+    try:
+        limit = min(max(int(request.args.get('limit', current_app.config["SYNC_PAGE_SIZE"])), 1), SYNC_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"msg": "invalid limit"}), 400
+    try:
+        result = sync.changes(entity, since=request.args.get('since'), limit=limit, fields=_fields())
+    except sync.InvalidCursor as e:
+        return jsonify({"msg": str(e)}), 400
+    return jsonify(result)
+
+# ==================== BATCH ====================
+@bp.route("/batch", methods=["POST"])
+@role_required(["admin", "manager", "viewer"])
+def batch_requests():
+    """Varias lecturas en una llamada: {"requests": [{"method", "path", "query"}, ...]}.
+
+    Devuelve {"responses": [{"status", "body", "headers"?}, ...]} en el mismo
+    orden. Cada sub-petición pasa por los mismos permisos de rol que su ruta.
+    """
+    items = (request.get_json(silent=True) or {}).get("requests")
+    if not isinstance(items, list) or not items:
+        return jsonify({"msg": "requests must be a non-empty list"}), 400
+    max_items = current_app.config["BATCH_MAX_REQUESTS"]
+    if len(items) > max_items:
+        return jsonify({"msg": f"too many requests in batch (max {max_items})"}), 400
+    
+    headers = {name: request.headers[name] for name in batch.FORWARDED_HEADERS if name in request.headers}
+    responses = batch.run_batch(
+        current_app._get_current_object(), items, g.current_user, headers, g.get("request_id", "batch")
+    )
+    return jsonify({"responses": responses})
 
 # ==================== DASHBOARD ====================
 @bp.route("/dashboard", methods=["GET"])
 @role_required(["admin", "manager", "viewer"])
+@read_replica
 def dashboard():
     total_sales = db.session.query(func.sum(Sale.total)).scalar() or 0
     total_products = Product.query.count()
     total_customers = Customer.query.count()
     total_suppliers = Supplier.query.count()
-    low_stock_products = Product.query.filter(Product.stock <= Product.min_stock).count()
+    low_stock_products = Product.query.filter(Product.is_low_stock == true()).count()
     recent_sales = Sale.query.order_by(Sale.created_at.desc()).limit(5).all()
     
     # Ventas de hoy
@@ -728,10 +1000,30 @@ def dashboard():
         "recent_sales": [{
             "id": s.id,
             "total": s.total,
-            "created_at": s.created_at.isoformat()
+            "created_at": s.created_at
         } for s in recent_sales]
     })
 
+# ==================== METRICS ====================
+LOCAL_ADDRESSES = ("127.0.0.1", "::1")
+
+def _metrics_response():
+    return current_app.response_class(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+@role_required(["admin"])
+def _admin_metrics():
+    return _metrics_response()
+
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    """Métricas del proceso en formato de texto de Prometheus (admin o localhost)"""
+    # Detrás de un proxy la IP es la del proxy: solo confiar en localhost si no hay X-Forwarded-For
+    if (current_app.config.get("METRICS_ALLOW_LOCALHOST")
+            and request.remote_addr in LOCAL_ADDRESSES
+            and "X-Forwarded-For" not in request.headers):
+        return _metrics_response()
+    return _admin_metrics()
+
 # ==================== SUPPLIER PRODUCTS (AGREGAR AL FINAL) ====================
 
 @bp.route("/suppliers/<int:sid>/products-catalog", methods=["GET"])
@@ -739,7 +1031,6 @@ def dashboard():
 def list_supplier_products_catalog(sid):
     """Obtener todos los productos que vende un proveedor (catálogo del proveedor)"""
     supplier = Supplier.query.get_or_404(sid)
-    supplier_products = SupplierProduct.query.filter_by(supplier_id=sid).all()
     
     return jsonify({
         "supplier": {
@@ -747,18 +1038,7 @@ def list_supplier_products_catalog(sid):
             "name": supplier.name,
             "contact_name": supplier.contact_name
         },
-        "products": [{
-            "id": sp.id,
-            "product_id": sp.product_id,
-            "product_name": sp.product.name,
-            "product_category": sp.product.category,
-            "purchase_price": sp.purchase_price,
-            "sale_price": sp.product.price,
-            "quantity_available": sp.quantity_available,
-            "profit_margin": sp.profit_margin,
-            "profit_percentage": sp.profit_percentage,
-            "last_updated": sp.last_updated.isoformat()
-        } for sp in supplier_products]
+        "products": queries.supplier_catalog(sid, fields=_fields())
     })
 
 @bp.route("/suppliers/<int:sid>/products-catalog", methods=["POST"])
@@ -805,6 +1085,45 @@ def add_product_to_supplier(sid):
         "purchase_price": supplier_product.purchase_price
     }), 201
 
+@bp.route("/suppliers/<int:sid>/products-catalog/bulk", methods=["PUT"])
+@role_required(["admin", "manager"])
+def bulk_update_supplier_catalog(sid):
+    """Carga la lista de precios completa del proveedor (JSON o CSV).
+
+    JSON: [{"product_id", "purchase_price", "quantity_available"}, ...] o {"lines": [...]}.
+    CSV (text/csv o archivo "file"): encabezado product_id,purchase_price[,quantity_available].
+    Sin quantity_available se conserva la cantidad actual (0 en líneas nuevas).
+    ?delete_missing=true quita del catálogo lo que no viene en la lista y
+    ?dry_run=true solo devuelve las diferencias.
+    """
+    Supplier.query.get_or_404(sid)
+    try:
+        if "file" in request.files:
+            lines = price_lists.parse_csv(request.files["file"].read().decode("utf-8-sig"))
+        elif request.mimetype in ("text/csv", "text/plain"):
+            lines = price_lists.parse_csv(request.get_data(as_text=True))
+        else:
+            data = request.get_json(silent=True)
+            lines = data.get("lines") if isinstance(data, dict) else data
+        summary = price_lists.apply_price_list(
+            sid,
+            lines,
+            delete_missing=request.args.get('delete_missing') == 'true',
+            dry_run=request.args.get('dry_run') == 'true',
+        )
+    except price_lists.PriceListError as e:
+        return jsonify({"msg": str(e), "errors": e.errors}), 400
+    except UnicodeDecodeError:
+        return jsonify({"msg": "CSV must be UTF-8"}), 400
+    
+    if not summary["dry_run"]:
+        log_db_action(
+            "bulk_update_supplier_catalog",
+            f"supplier_id={sid}, added={summary['added']}, price_changed={summary['price_changed']}, "
+            f"removed={summary['removed']}",
+        )
+    return jsonify(summary)
+
 @bp.route("/suppliers/<int:sid>/products-catalog/<int:sp_id>", methods=["PUT"])
 @role_required(["admin", "manager"])
 def update_supplier_product(sid, sp_id):
@@ -0,0 +1,294 @@
+"""Datos sintéticos para pruebas de escala (`flask seed`).
+
+Genera proveedores, productos, clientes y ventas con distribuciones parecidas
+a las de una tienda real: la popularidad de los productos sigue una ley de
+Zipf (pocos productos concentran la mayoría de las ventas), las ventas se
+concentran en las tardes y los fines de semana, y cada ticket tiene varias
+líneas. Todo sale de un random.Random(seed), así la misma semilla produce
+los mismos datos.
+
+Las filas se escriben por bloques con COPY en Postgres y con executemany en
+MySQL y SQLite. Los ids se asignan aquí (a partir del máximo actual) para
+poder enlazar ventas y líneas sin leer nada de vuelta.
+"""
+import bisect
+import csv
+import io
+import itertools
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, text
+from . import db
+from .models import Customer, Product, Sale, SaleItem, Supplier, SupplierProduct, User
+
+CHUNK_SIZE = 10000
+
+# Exponente de Zipf: con 1.1 el 20% de los productos se lleva cerca del 80% de las ventas
+PRODUCT_ZIPF = 1.1
+CUSTOMER_ZIPF = 0.8
+# Fracción de ventas con cliente registrado
+CUSTOMER_SHARE = 0.4
+
+# Peso por hora del día (0-23) y por día de la semana (lunes=0)
+HOUR_WEIGHTS = [1, 0.5, 0.2, 0, 0, 0, 0, 0.2, 0.5, 1, 2, 3, 4, 4, 4, 4, 5, 6, 8, 9, 9, 8, 6, 3]
+WEEKDAY_WEIGHTS = [0.8, 0.8, 0.9, 1.0, 1.4, 1.8, 1.3]
+# Líneas por ticket (1, 2, 3...) y unidades por línea
+LINE_WEIGHTS = [45, 25, 14, 8, 4, 2, 1, 1]
+QUANTITY_WEIGHTS = [70, 18, 6, 3, 1, 1, 1]
+PAYMENT_WEIGHTS = {"cash": 60, "card": 35, "transfer": 5}
+
+# categoría -> (nombres base, rango de precio, IVA)
+CATEGORIES = {
+    "Cervezas": (["Cerveza Clara", "Cerveza Oscura", "Cerveza Ámbar", "Cerveza Light"], (15, 60), 16),
+    "Vinos": (["Vino Tinto", "Vino Blanco", "Vino Rosado", "Espumoso"], (120, 900), 16),
+    "Tequilas": (["Tequila Blanco", "Tequila Reposado", "Tequila Añejo"], (180, 1500), 16),
+    "Mezcales": (["Mezcal Espadín", "Mezcal Tobalá", "Mezcal Ensamble"], (250, 1800), 16),
+    "Rones": (["Ron Blanco", "Ron Añejo", "Ron Especiado"], (150, 700), 16),
+    "Vodkas": (["Vodka", "Vodka Sabor"], (150, 800), 16),
+    "Whiskys": (["Whisky Escocés", "Bourbon", "Whisky Irlandés"], (300, 2500), 16),
+    "Refrescos": (["Refresco Cola", "Refresco Limón", "Agua Mineral", "Agua Tónica"], (10, 40), 16),
+    "Jugos": (["Jugo de Naranja", "Jugo de Uva", "Néctar de Mango"], (15, 45), 16),
+    "Botanas": (["Papas", "Cacahuates", "Chicharrón", "Pretzels"], (15, 80), 16),
+    "Hielo": (["Hielo en Bolsa", "Hielo en Cubos"], (20, 60), 0),
+    "Cigarros": (["Cigarros", "Cigarros Mentolados"], (60, 120), 16),
+}
+BRANDS = ["Sierra", "Del Valle", "Los Altos", "Real", "Antigua", "Costa", "Montaña", "Don Julio",
+          "La Hacienda", "San Miguel", "El Puerto", "Oaxaca", "Jalisco", "Norteña", "Imperial"]
+SIZES = ["355ml", "473ml", "600ml", "750ml", "1L", "1.75L", "Six pack", "Caja 12"]
+
+FIRST_NAMES = ["Juan", "María", "José", "Guadalupe", "Luis", "Ana", "Carlos", "Sofía", "Jorge", "Lucía",
+               "Miguel", "Fernanda", "Ramón", "Valeria", "Íñigo", "Ximena", "Raúl", "Mónica", "Andrés", "Paola"]
+LAST_NAMES = ["Pérez", "García", "López", "Martínez", "Sánchez", "Hernández", "González", "Ramírez",
+              "Flores", "Gómez", "Díaz", "Cruz", "Morales", "Ortiz", "Gutiérrez", "Chávez", "Núñez", "Ibáñez"]
+STREETS = ["Juárez", "Hidalgo", "Morelos", "Reforma", "Allende", "Madero", "Zaragoza", "Insurgentes"]
+
+
+class SeedError(ValueError):
+    """Parámetros de generación inválidos o base sin los datos mínimos"""
+
+
+def _next_id(model):
+    return (db.session.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+
+def _zipf_cumulative(count, exponent, rng):
+    """Pesos acumulados de Zipf sobre una permutación aleatoria de 0..count-1"""
+    ranks = list(range(1, count + 1))
+    rng.shuffle(ranks)
+    return _cumulative(1 / rank ** exponent for rank in ranks)
+
+
+def _pick(rng, cumulative):
+    """Índice según los pesos acumulados (random.choices sin armar listas)"""
+    return bisect.bisect(cumulative, rng.random() * cumulative[-1])
+
+
+def _copy_rows(table, columns, rows):
+    raw = db.session.connection().connection.driver_connection
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    with raw.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def bulk_insert(model, columns, rows, progress=None):
+    """Inserta las tuplas de rows por bloques; devuelve cuántas filas escribió"""
+    table = model.__table__
+    copy = db.session.get_bind(mapper=model).dialect.name == "postgresql"
+    statement = table.insert()
+    total = 0
+    while True:
+        chunk = list(itertools.islice(rows, CHUNK_SIZE))
+        if not chunk:
+            break
+        if copy:
+            _copy_rows(table, columns, chunk)
+        else:
+            db.session.execute(statement, [dict(zip(columns, row)) for row in chunk])
+        total += len(chunk)
+        if progress:
+            progress(len(chunk))
+    db.session.commit()
+    return total
+
+
+def _reset_sequences(*models):
+    """Con ids explícitos, las secuencias de Postgres quedan atrás del máximo"""
+    if db.session.get_bind().dialect.name != "postgresql":
+        return
+    for model in models:
+        table = model.__tablename__
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+    db.session.commit()
+
+
+def seed_suppliers(count, rng, progress=None):
+    start = _next_id(Supplier)
+    now = datetime.utcnow()
+
+    def rows():
+        for i in range(count):
+            brand = rng.choice(BRANDS)
+            yield (
+                start + i, f"Distribuidora {brand} {start + i}", f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                f"ventas{start + i}@proveedor.mx", f"55{rng.randrange(10**8):08d}",
+                f"{rng.choice(STREETS)} #{rng.randrange(1, 999)}", now, now,
+            )
+
+    bulk_insert(Supplier, ["id", "name", "contact_name", "email", "phone", "address", "created_at", "updated_at"],
+                rows(), progress)
+    _reset_sequences(Supplier)
+    return list(range(start, start + count))
+
+
+def seed_products(count, supplier_ids, rng, progress=None):
+    """Devuelve {id: (precio, iva)} de los productos creados"""
+    if not supplier_ids:
+        raise SeedError("products need at least one supplier")
+    start = _next_id(Product)
+    now = datetime.utcnow()
+    categories = list(CATEGORIES.items())
+    prices = {}
+
+    def rows():
+        for i in range(count):
+            category, (bases, (low, high), iva) = rng.choice(categories)
+            pid = start + i
+            # Precios con sesgo hacia el extremo barato de la categoría
+            price = round(low + (high - low) * rng.random() ** 2, 2)
+            prices[pid] = (price, iva)
+            stock = rng.randrange(0, 300)
+            min_stock = rng.choice((5, 10, 20, 30))
+            yield (
+                pid, f"{rng.choice(bases)} {rng.choice(BRANDS)} {rng.choice(SIZES)}", f"SKU{pid:08d}",
+                None, price, iva, stock, min_stock, category, rng.choice(supplier_ids), now, now,
+                stock <= min_stock,
+            )
+
+    bulk_insert(Product, ["id", "name", "sku", "description", "price", "iva", "stock", "min_stock", "category",
+                          "supplier_id", "created_at", "updated_at", "is_low_stock"], rows(), progress)
+    _reset_sequences(Product)
+    return prices
+
+
+def seed_catalog(prices, supplier_ids, rng, progress=None):
+    """Cada producto lo ofrecen de 1 a 3 proveedores, con precio de compra bajo el de venta"""
+    start = _next_id(SupplierProduct)
+    now = datetime.utcnow()
+    ids = itertools.count(start)
+
+    def rows():
+        for pid, (price, _) in prices.items():
+            offers = rng.sample(supplier_ids, min(len(supplier_ids), rng.choice((1, 1, 2, 3))))
+            for sid in offers:
+                yield (next(ids), sid, pid, round(price * rng.uniform(0.55, 0.8), 2), rng.randrange(0, 1000), now)
+            # El avance se cuenta por producto
+            if progress:
+                progress(1)
+
+    total = bulk_insert(SupplierProduct, ["id", "supplier_id", "product_id", "purchase_price",
+                                          "quantity_available", "last_updated"], rows())
+    _reset_sequences(SupplierProduct)
+    return total
+
+
+def seed_customers(count, rng, progress=None):
+    start = _next_id(Customer)
+    now = datetime.utcnow()
+
+    def rows():
+        for i in range(count):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            yield (
+                start + i, f"{first} {last} {rng.choice(LAST_NAMES)}", f"cliente{start + i}@correo.mx",
+                f"55{rng.randrange(10**8):08d}", f"{rng.choice(STREETS)} #{rng.randrange(1, 999)}", now, now,
+            )
+
+    bulk_insert(Customer, ["id", "name", "email", "phone", "address", "created_at", "updated_at"], rows(), progress)
+    _reset_sequences(Customer)
+    return list(range(start, start + count))
+
+
+def _sale_times(count, days, rng):
+    """count fechas en los últimos days días, en orden, con estacionalidad por hora y día"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    # Días completos: termina ayer, sin ventas en el futuro
+    first_day = today - timedelta(days=days)
+    # Crecimiento de 30% a lo largo del periodo
+    day_weights = [
+        WEEKDAY_WEIGHTS[(first_day + timedelta(days=d)).weekday()] * (1 + 0.3 * d / max(days - 1, 1))
+        for d in range(days)
+    ]
+    cumulative = _cumulative(day_weights)
+    hours = _cumulative(HOUR_WEIGHTS)
+    produced = 0
+    for d, until in enumerate(cumulative):
+        # Redondeo sobre el acumulado: la suma da exactamente count
+        n = round(count * until / cumulative[-1]) - produced
+        produced += n
+        day = first_day + timedelta(days=d)
+        yield from sorted(
+            day + timedelta(hours=_pick(rng, hours), seconds=rng.randrange(3600)) for _ in range(n)
+        )
+
+
+def seed_sales(count, days, prices, customer_ids, rng, progress=None):
+    """Genera tickets de varias líneas; devuelve (ventas, líneas)"""
+    if not prices:
+        raise SeedError("sales need at least one product")
+    user_ids = db.session.execute(select(User.id)).scalars().all()
+    if not user_ids:
+        raise SeedError("sales need at least one user")
+
+    product_ids = list(prices)
+    products = _zipf_cumulative(len(product_ids), PRODUCT_ZIPF, rng)
+    customers = _zipf_cumulative(len(customer_ids), CUSTOMER_ZIPF, rng) if customer_ids else None
+    lines = _cumulative(LINE_WEIGHTS)
+    quantities = _cumulative(QUANTITY_WEIGHTS)
+    payments = list(PAYMENT_WEIGHTS)
+    payment_weights = _cumulative(PAYMENT_WEIGHTS.values())
+
+    sale_start, item_start = _next_id(Sale), _next_id(SaleItem)
+    item_ids = itertools.count(item_start)
+    items = []
+
+    def sales():
+        for sale_id, created_at in enumerate(_sale_times(count, days, rng), start=sale_start):
+            chosen = {product_ids[_pick(rng, products)] for _ in range(_pick(rng, lines) + 1)}
+            total = 0.0
+            for pid in chosen:
+                price, iva = prices[pid]
+                quantity = _pick(rng, quantities) + 1
+                line_total = round(price * quantity * (1 + iva / 100), 2)
+                total += line_total
+                items.append((next(item_ids), sale_id, pid, quantity, price, line_total))
+            customer_id = None
+            if customers and rng.random() < CUSTOMER_SHARE:
+                customer_id = customer_ids[_pick(rng, customers)]
+            yield (
+                sale_id, customer_id, rng.choice(user_ids), round(total, 2),
+                payments[_pick(rng, payment_weights)], "completed", created_at,
+            )
+
+    sale_columns = ["id", "customer_id", "user_id", "total", "payment_method", "status", "created_at"]
+    item_columns = ["id", "sale_id", "product_id", "quantity", "unit_price", "subtotal"]
+    total_sales = total_items = 0
+    # Ventas y líneas avanzan juntas por bloques para no guardar todo en memoria
+    sale_rows = sales()
+    while True:
+        written = bulk_insert(Sale, sale_columns, itertools.islice(sale_rows, CHUNK_SIZE))
+        if not written:
+            break
+        total_items += bulk_insert(SaleItem, item_columns, iter(items))
+        items.clear()
+        total_sales += written
+        if progress:
+            progress(written)
+    _reset_sequences(Sale, SaleItem)
+    return total_sales, total_items
@@ -12,15 +12,21 @@ let CURRENT_USER = (() => {
 })();
 let CART = [];
 let SUPPLIERS = [];
+// Logs en consola: localStorage.setItem('debug', 'true') o ?debug en la URL
+const DEBUG = localStorage.getItem('debug') === 'true' || new URLSearchParams(location.search).has('debug');
 
 // ========== UTILIDADES ==========
+function debugLog(...args) {
+    if (DEBUG) console.log(...args);
+}
+
 function showScreen(screenId) {
-    console.log('Cambiando a pantalla:', screenId);
+    debugLog('Cambiando a pantalla:', screenId);
     document.querySelectorAll('.screen').forEach(s => s.classList.remove('active'));
     const screen = document.getElementById(screenId);
     if (screen) {
         screen.classList.add('active');
-        console.log('Pantalla activada:', screenId);
+        debugLog('Pantalla activada:', screenId);
     } else {
         console.error('No se encontro la pantalla:', screenId);
     }
@@ -62,7 +68,63 @@ function closeModal() {
     document.getElementById('modal').classList.remove('active');
 }
 
-async function apiRequest(endpoint, method = 'GET', body = null) {
+// ========== CAPA DE DATOS ==========
+// Las lecturas GET pasan por una cache en memoria: peticiones idénticas en
+// curso se comparten, una respuesta de menos de CACHE_FRESH_MS se reutiliza y
+// una más vieja se revalida con If-None-Match (304 = sin cuerpo). Cada
+// escritura exitosa invalida los recursos relacionados.
+const CACHE_FRESH_MS = 10000;
+const RESPONSE_CACHE = new Map();
+const IN_FLIGHT = new Map();
+let CACHE_GENERATION = 0;
+
+// Recursos afectados por una escritura, según el primer segmento de la ruta
+const INVALIDATES = {
+    products: ['/products', '/suppliers', '/dashboard', '/reports'],
+    sales: ['/sales', '/products', '/customers', '/dashboard', '/reports'],
+    customers: ['/customers', '/sales', '/dashboard', '/reports'],
+    suppliers: ['/suppliers', '/products', '/dashboard'],
+    users: ['/users'],
+};
+
+// Las respuestas de sync ya son incrementales y dependen del cursor
+function isCacheable(endpoint) {
+    return !endpoint.startsWith('/sync/');
+}
+
+function invalidateCache(prefixes) {
+    CACHE_GENERATION++;
+    for (const map of [RESPONSE_CACHE, IN_FLIGHT]) {
+        for (const key of [...map.keys()]) {
+            if (prefixes.some(prefix => key.startsWith(prefix))) map.delete(key);
+        }
+    }
+    debugLog('Cache invalidada:', prefixes);
+}
+
+function invalidateAfterWrite(endpoint) {
+    const resource = endpoint.split(/[/?]/)[1];
+    // Toda escritura deja un registro en /logs
+    invalidateCache((INVALIDATES[resource] || [`/${resource}`, '/dashboard']).concat('/logs'));
+}
+
+function storeResponse(endpoint, data, etag, generation) {
+    // Si hubo una invalidación mientras la petición viajaba, no se guarda
+    if (etag && isCacheable(endpoint) && generation === CACHE_GENERATION) {
+        RESPONSE_CACHE.set(endpoint, { data, etag, time: Date.now() });
+    }
+}
+
+function trackInFlight(endpoint, request) {
+    IN_FLIGHT.set(endpoint, request);
+    const done = () => {
+        if (IN_FLIGHT.get(endpoint) === request) IN_FLIGHT.delete(endpoint);
+    };
+    request.then(done, done);
+    return request;
+}
+
+async function fetchJSON(endpoint, method = 'GET', body = null, etag = null) {
     const options = {
         method,
         headers: {
@@ -76,14 +138,23 @@ async function apiRequest(endpoint, method = 'GET', body = null) {
         options.headers['Authorization'] = `Bearer ${currentToken}`;
     }
     
+    if (etag) {
+        options.headers['If-None-Match'] = etag;
+    }
+    
     if (body) {
         options.body = JSON.stringify(body);
     }
     
     try {
-        console.log(`API Request: ${method} ${API_URL}${endpoint}`);
+        debugLog(`API Request: ${method} ${API_URL}${endpoint}`);
         const response = await fetch(API_URL + endpoint, options);
         
+        if (response.status === 304) {
+            debugLog('API Response 304:', endpoint);
+            return { notModified: true, etag };
+        }
+        
         const contentType = response.headers.get("content-type");
         if (!contentType || !contentType.includes("application/json")) {
             const text = await response.text();
@@ -93,7 +164,9 @@ async function apiRequest(endpoint, method = 'GET', body = null) {
         
         if (response.status === 401) {
             console.warn('Sesion expirada');
+            disconnectEvents();
             localStorage.clear();
+            RESPONSE_CACHE.clear();
             TOKEN = null;
             CURRENT_USER = {};
             showScreen('login-screen');
@@ -107,8 +180,8 @@ async function apiRequest(endpoint, method = 'GET', body = null) {
             throw new Error(data.msg || 'Error en la peticion');
         }
         
-        console.log('API Response OK:', endpoint);
-        return data;
+        debugLog('API Response OK:', endpoint);
+        return { data, etag: response.headers.get('ETag') };
     } catch (error) {
         console.error('API Error:', error);
         if (error.message !== 'Sesion expirada. Por favor inicia sesion nuevamente.') {
@@ -118,6 +191,285 @@ async function apiRequest(endpoint, method = 'GET', body = null) {
     }
 }
 
+// GET compartido con otras llamadas idénticas en curso; revalida con ETag
+function revalidate(endpoint) {
+    if (IN_FLIGHT.has(endpoint)) return IN_FLIGHT.get(endpoint);
+    const entry = RESPONSE_CACHE.get(endpoint);
+    const generation = CACHE_GENERATION;
+    const request = fetchJSON(endpoint, 'GET', null, entry && entry.etag).then(result => {
+        const data = result.notModified ? entry.data : result.data;
+        storeResponse(endpoint, data, result.etag, generation);
+        return data;
+    });
+    return trackInFlight(endpoint, request);
+}
+
+function isFresh(entry) {
+    return entry && Date.now() - entry.time < CACHE_FRESH_MS;
+}
+
+// Con onUpdate se responde al momento con la copia vieja
+// (stale-while-revalidate) y onUpdate recibe los datos nuevos si cambiaron
+function cachedGet(endpoint, onUpdate = null) {
+    const entry = RESPONSE_CACHE.get(endpoint);
+    if (isFresh(entry)) return Promise.resolve(entry.data);
+    const request = revalidate(endpoint);
+    if (entry && onUpdate) {
+        request.then(data => {
+            if (data !== entry.data) onUpdate(data);
+        }, () => {});
+        return Promise.resolve(entry.data);
+    }
+    return request;
+}
+
+async function apiRequest(endpoint, method = 'GET', body = null) {
+    if (method === 'GET') {
+        return cachedGet(endpoint);
+    }
+    const { data } = await fetchJSON(endpoint, method, body);
+    invalidateAfterWrite(endpoint);
+    return data;
+}
+
+// ========== BATCH ==========
+// Varias lecturas GET en una sola llamada a /api/batch (un solo chequeo del
+// token y un solo viaje de red). Las que ya están en cache o en curso no se
+// vuelven a pedir. Devuelve los cuerpos en el mismo orden.
+async function apiBatch(endpoints) {
+    const results = endpoints.map(endpoint => {
+        const entry = RESPONSE_CACHE.get(endpoint);
+        if (isFresh(entry)) return entry.data;
+        return IN_FLIGHT.get(endpoint) || null;
+    });
+    const missing = endpoints.map((_, i) => i).filter(i => results[i] === null);
+    
+    if (missing.length === 1) {
+        results[missing[0]] = revalidate(endpoints[missing[0]]);
+    } else if (missing.length > 1) {
+        const batch = runBatch(missing.map(i => endpoints[i]));
+        missing.forEach((i, k) => {
+            results[i] = trackInFlight(endpoints[i], batch.then(items => {
+                if (items[k] instanceof Error) throw items[k];
+                return items[k];
+            }));
+        });
+    }
+    return Promise.all(results);
+}
+
+async function runBatch(endpoints) {
+    const generation = CACHE_GENERATION;
+    const requests = endpoints.map(endpoint => {
+        const [path, query = ''] = endpoint.split('?');
+        return { method: 'GET', path, query };
+    });
+    const { data } = await fetchJSON('/batch', 'POST', { requests });
+    let alerted = false;
+    return data.responses.map((item, i) => {
+        if (item.status >= 400) {
+            const msg = (item.body && item.body.msg) || 'Error en la peticion';
+            if (!alerted) alert('Error: ' + msg);
+            alerted = true;
+            return new Error(`${endpoints[i]}: ${msg}`);
+        }
+        storeResponse(endpoints[i], item.body, item.headers && item.headers.ETag, generation);
+        return item.body;
+    });
+}
+
+// ========== CACHE LOCAL (SYNC) ==========
+// Copia local de products/customers/suppliers; solo se descargan los cambios
+// desde el último cursor (GET /api/sync/<entity>)
+const SYNC_PREFIX = 'sync:';
+
+function readSyncCache(entity) {
+    try {
+        return JSON.parse(localStorage.getItem(SYNC_PREFIX + entity)) || { cursor: null, rows: {} };
+    } catch (e) {
+        return { cursor: null, rows: {} };
+    }
+}
+
+function syncEndpoint(entity, cache) {
+    const query = cache.cursor ? `?since=${encodeURIComponent(cache.cursor)}` : '';
+    return `/sync/${entity}${query}`;
+}
+
+function applySyncPage(cache, data) {
+    if (data.reset) cache.rows = {};
+    // Primero los borrados: una fila modificada y luego borrada ya no viene en rows
+    data.deleted.forEach(id => delete cache.rows[id]);
+    data.rows.forEach(row => cache.rows[row.id] = row);
+    cache.cursor = data.cursor;
+}
+
+function saveSyncCache(entity, cache) {
+    try {
+        localStorage.setItem(SYNC_PREFIX + entity, JSON.stringify(cache));
+    } catch (e) {
+        // Sin espacio: la próxima vez se descarga completo
+        console.warn('No se pudo guardar la cache local de', entity, e);
+        localStorage.removeItem(SYNC_PREFIX + entity);
+    }
+}
+
+// Sincroniza varias entidades y lecturas extra en un solo batch por ronda.
+// Devuelve [filas de cada entidad..., cuerpos de extra...]
+async function getSyncedRowsWith(entities, extra = []) {
+    const caches = entities.map(readSyncCache);
+    let pending = entities.map((_, i) => i);
+    let extraResults = [];
+    
+    while (pending.length > 0 || extra.length > 0) {
+        const endpoints = pending.map(i => syncEndpoint(entities[i], caches[i])).concat(extra);
+        const results = await apiBatch(endpoints);
+        pending.forEach((i, k) => applySyncPage(caches[i], results[k]));
+        if (extra.length > 0) {
+            extraResults = results.slice(pending.length);
+            extra = [];
+        }
+        pending = pending.filter((i, k) => results[k].has_more);
+    }
+    
+    entities.forEach((entity, i) => saveSyncCache(entity, caches[i]));
+    const rows = caches.map(cache => Object.values(cache.rows).sort((a, b) => a.id - b.id));
+    return rows.concat(extraResults);
+}
+
+async function getSyncedRows(entity) {
+    const [rows] = await getSyncedRowsWith([entity]);
+    return rows;
+}
+
+// ========== EVENTOS EN VIVO (SSE) ==========
+// Un solo EventSource por pestaña; en lugar de volver a pedir todo, cada
+// evento refresca solo la sección visible (las listas salen de la cache local)
+let EVENT_SOURCE = null;
+let EVENT_REFRESH_TIMER = null;
+let EVENT_RETRY_TIMER = null;
+let EVENT_CONNECTING = false;
+// Cambia al cerrar sesión: descarta una conexión que estaba pidiendo su token
+let EVENT_GENERATION = 0;
+let EVENT_LAST_ID = null;
+
+function activeSection() {
+    const section = document.querySelector('.content-section.active');
+    return section ? section.id.replace('-section', '') : null;
+}
+
+// Respuestas en cache que deja viejas cada evento (hechas por otros usuarios)
+const EVENT_INVALIDATES = {
+    stock_changed: ['/products', '/suppliers', '/dashboard'],
+    sale_created: ['/sales', '/dashboard', '/reports', '/customers'],
+    sale_deleted: ['/sales', '/dashboard', '/reports', '/customers'],
+    catalog_changed: ['/products', '/suppliers', '/dashboard'],
+    customer_changed: ['/customers', '/dashboard'],
+    resync: [''],
+};
+
+function refreshFromEvents(event) {
+    if (event && EVENT_INVALIDATES[event.type]) invalidateCache(EVENT_INVALIDATES[event.type]);
+    clearTimeout(EVENT_REFRESH_TIMER);
+    // Agrupa ráfagas de eventos (una venta emite varios)
+    EVENT_REFRESH_TIMER = setTimeout(() => {
+        switch (activeSection()) {
+            case 'dashboard':
+                loadDashboard();
+                break;
+            case 'sales':
+                loadSalesPage();
+                break;
+            case 'products':
+                loadProducts();
+                break;
+            case 'sales-history':
+                loadSalesHistory();
+                break;
+        }
+    }, 500);
+}
+
+function applyStockEvent(event) {
+    const data = JSON.parse(event.data);
+    // Mantener al día el stock del carrito
+    data.products.forEach(p => {
+        const item = CART.find(i => i.productId === p.id);
+        if (item) item.stock = p.stock;
+    });
+    refreshFromEvents(event);
+}
+
+// El token de la URL es uno corto que solo abre /api/events (POST /events/token):
+// el de sesión no debe quedar en los logs de acceso. Como vence, cada reconexión
+// la hace este código con un token nuevo y last_event_id, no el navegador
+async function connectEvents() {
+    const token = localStorage.getItem('token');
+    if (!token || EVENT_SOURCE || EVENT_CONNECTING || !window.EventSource) return;
+    EVENT_CONNECTING = true;
+    const generation = EVENT_GENERATION;
+    let streamToken;
+    try {
+        const response = await fetch(`${API_URL}/events/token`, {
+            method: 'POST',
+            headers: { 'Authorization': `Bearer ${token}` },
+        });
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        streamToken = (await response.json()).token;
+    } catch (error) {
+        debugLog('No se pudo obtener el token de eventos:', error);
+    } finally {
+        EVENT_CONNECTING = false;
+    }
+    // Se cerró sesión mientras tanto (y quizá se volvió a entrar)
+    if (generation !== EVENT_GENERATION) {
+        connectEvents();
+        return;
+    }
+    if (!streamToken) {
+        scheduleEventsReconnect(15000);
+        return;
+    }
+
+    const params = new URLSearchParams({ token: streamToken });
+    if (EVENT_LAST_ID) params.set('last_event_id', EVENT_LAST_ID);
+    const source = new EventSource(`${API_URL}/events?${params}`);
+    let opened = false;
+    EVENT_SOURCE = source;
+    const track = handler => event => {
+        if (event.lastEventId) EVENT_LAST_ID = event.lastEventId;
+        handler(event);
+    };
+    source.addEventListener('stock_changed', track(applyStockEvent));
+    ['sale_created', 'sale_deleted', 'catalog_changed', 'customer_changed', 'resync'].forEach(type => {
+        source.addEventListener(type, track(refreshFromEvents));
+    });
+    source.onopen = () => { opened = true; };
+    source.onerror = () => {
+        // Fin normal del stream (EVENTS_STREAM_SECONDS) o error: el navegador
+        // reintentaría con el token vencido. Si ni siquiera abrió (503 por
+        // límite de conexiones) se espera más
+        source.close();
+        if (EVENT_SOURCE === source) EVENT_SOURCE = null;
+        scheduleEventsReconnect(opened ? 1000 : 15000);
+    };
+}
+
+function scheduleEventsReconnect(delay) {
+    clearTimeout(EVENT_RETRY_TIMER);
+    EVENT_RETRY_TIMER = setTimeout(connectEvents, delay);
+}
+
+function disconnectEvents() {
+    EVENT_GENERATION += 1;
+    EVENT_LAST_ID = null;
+    clearTimeout(EVENT_RETRY_TIMER);
+    if (EVENT_SOURCE) {
+        EVENT_SOURCE.close();
+        EVENT_SOURCE = null;
+    }
+}
+
 // ========== LOGIN ==========
 document.getElementById('login-form').addEventListener('submit', async (e) => {
     e.preventDefault();
@@ -125,7 +477,7 @@ document.getElementById('login-form').addEventListener('submit', async (e) => {
     const password = document.getElementById('password').value;
     
     try {
-        console.log('Intentando login...');
+        debugLog('Intentando login...');
         const data = await apiRequest('/auth/login', 'POST', { username, password });
         
         if (!data.access_token || !data.user) {
@@ -138,16 +490,17 @@ document.getElementById('login-form').addEventListener('submit', async (e) => {
         localStorage.setItem('token', TOKEN);
         localStorage.setItem('user', JSON.stringify(CURRENT_USER));
         
-        console.log('Login exitoso:', CURRENT_USER);
+        debugLog('Login exitoso:', CURRENT_USER);
         
         document.getElementById('user-info').textContent = `${CURRENT_USER.username} (${CURRENT_USER.role})`;
         document.body.className = `role-${CURRENT_USER.role}`;
         
-        console.log('Cambiando a pantalla principal...');
+        debugLog('Cambiando a pantalla principal...');
         showScreen('main-screen');
         
-        console.log('Cargando dashboard...');
+        debugLog('Cargando dashboard...');
         await loadDashboard();
+        connectEvents();
         
     } catch (error) {
         console.error('Login error:', error);
@@ -157,6 +510,9 @@ document.getElementById('login-form').addEventListener('submit', async (e) => {
 
 // ========== LOGOUT ==========
 document.getElementById('logout-btn').addEventListener('click', () => {
+    disconnectEvents();
+    // Otro usuario puede tener otro rol: no reutilizar respuestas
+    RESPONSE_CACHE.clear();
     TOKEN = null;
     CURRENT_USER = {};
     CART = [];
@@ -203,9 +559,11 @@ document.querySelectorAll('.menu-item').forEach(item => {
 // ========== DASHBOARD ==========
 async function loadDashboard() {
     try {
-        console.log('Cargando dashboard...');
-        const data = await apiRequest('/dashboard');
-        const products = await apiRequest('/products');
+        debugLog('Cargando dashboard...');
+        const [data, products] = await apiBatch([
+            '/dashboard',
+            '/products?low_stock=true&fields=id,name,stock,min_stock,is_low_stock'
+        ]);
         
         document.getElementById('total-sales').textContent = `$${data.total_sales.toFixed(2)}`;
         document.getElementById('total-products').textContent = data.total_products;
@@ -236,7 +594,7 @@ async function loadDashboard() {
             </div>
         `).join('');
         
-        console.log('Dashboard cargado exitosamente');
+        debugLog('Dashboard cargado exitosamente');
     } catch (error) {
         console.error('Error loading dashboard:', error);
         alert('Error al cargar el dashboard.');
@@ -246,13 +604,14 @@ async function loadDashboard() {
 // ========== SALES PAGE ==========
 async function loadSalesPage() {
     try {
-        const products = await apiRequest('/products');
+        // Copia local: solo se descargan los productos y clientes que cambiaron
+        const [products, customers] = await getSyncedRowsWith(['products', 'customers']);
         const productsGrid = document.getElementById('products-grid');
         productsGrid.innerHTML = products.map(p => {
             const lowStockClass = p.is_low_stock ? 'style="border-color: #dc3545;"' : '';
             const lowStockBadge = p.is_low_stock ? '<span style="color: #dc3545; font-size: 11px;">Stock Bajo</span>' : '';
-            const iva = p.iva_rate || 16;
-            const priceWithIVA = p.price * (1 + iva / 100);
+            const iva = p.iva || 16;
+            const priceWithIVA = p.price_with_iva;
             return `
                 <div class="product-card" ${lowStockClass} onclick="addToCart(${p.id}, '${p.name.replace(/'/g, "\\'")}', ${p.price}, ${p.stock}, ${iva})">
                     <h4>${p.name}</h4>
@@ -264,11 +623,15 @@ async function loadSalesPage() {
             `;
         }).join('');
         
-        const customers = await apiRequest('/customers');
         const customerSelect = document.getElementById('cart-customer');
         customerSelect.innerHTML = '<option value="">Sin cliente</option>' + 
             customers.map(c => `<option value="${c.id}">${c.name}</option>`).join('');
         
+        // El lector de códigos escribe el código y manda Enter
+        document.getElementById('search-product').onkeydown = (e) => {
+            if (e.key === 'Enter') scanProduct(e.target);
+        };
+        
         document.getElementById('search-product').addEventListener('input', (e) => {
             const search = e.target.value.toLowerCase();
             document.querySelectorAll('.product-card').forEach(card => {
@@ -283,6 +646,20 @@ async function loadSalesPage() {
     }
 }
 
+// SKU o código de barras exacto; sin cache para tener el stock actual
+async function scanProduct(input) {
+    const code = input.value.trim();
+    if (!code) return;
+    try {
+        const { data: p } = await fetchJSON(`/products/lookup?code=${encodeURIComponent(code)}`);
+        addToCart(p.id, p.name, p.price, p.stock, p.iva || 16);
+        input.value = '';
+        input.dispatchEvent(new Event('input'));
+    } catch (error) {
+        input.select();
+    }
+}
+
 function addToCart(productId, name, price, stock, iva = 16) {
     const existing = CART.find(item => item.productId === productId);
     
@@ -403,49 +780,53 @@ document.getElementById('complete-sale-btn').addEventListener('click', async ()
 // ========== SALES HISTORY ==========
 async function loadSalesHistory() {
     try {
-        const sales = await apiRequest('/sales');
-        const salesList = document.getElementById('sales-history-list');
-        
-        salesList.innerHTML = `
-            <div class="table-container">
-                <table>
-                    <thead>
-                        <tr>
-                            <th>ID</th>
-                            <th>Cliente</th>
-                            <th>Vendedor</th>
-                            <th>Total</th>
-                            <th>Pago</th>
-                            <th>Fecha</th>
-                            <th>Acciones</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        ${sales.map(s => `
-                            <tr>
-                                <td>#${s.id}</td>
-                                <td>${s.customer || 'N/A'}</td>
-                                <td>${s.user}</td>
-                                <td>$${s.total.toFixed(2)}</td>
-                                <td>${s.payment_method}</td>
-                                <td>${new Date(s.created_at).toLocaleString()}</td>
-                                <td class="actions">
-                                    <button class="btn btn-small btn-primary" onclick="viewSale(${s.id})">Ver</button>
-                                    ${CURRENT_USER.role === 'admin' ? 
-                                        `<button class="btn btn-small btn-danger" onclick="deleteSale(${s.id})">Eliminar</button>` 
-                                        : ''}
-                                </td>
-                            </tr>
-                        `).join('')}
-                    </tbody>
-                </table>
-            </div>
-        `;
+        // Se muestra la copia en cache y se vuelve a pintar si el servidor trae cambios
+        renderSalesHistory(await cachedGet('/sales', renderSalesHistory));
     } catch (error) {
         console.error('Error loading sales history:', error);
     }
 }
 
+function renderSalesHistory(sales) {
+    const salesList = document.getElementById('sales-history-list');
+    
+    salesList.innerHTML = `
+        <div class="table-container">
+            <table>
+                <thead>
+                    <tr>
+                        <th>ID</th>
+                        <th>Cliente</th>
+                        <th>Vendedor</th>
+                        <th>Total</th>
+                        <th>Pago</th>
+                        <th>Fecha</th>
+                        <th>Acciones</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    ${sales.map(s => `
+                        <tr>
+                            <td>#${s.id}</td>
+                            <td>${s.customer || 'N/A'}</td>
+                            <td>${s.user}</td>
+                            <td>$${s.total.toFixed(2)}</td>
+                            <td>${s.payment_method}</td>
+                            <td>${new Date(s.created_at).toLocaleString()}</td>
+                            <td class="actions">
+                                <button class="btn btn-small btn-primary" onclick="viewSale(${s.id})">Ver</button>
+                                ${CURRENT_USER.role === 'admin' ? 
+                                    `<button class="btn btn-small btn-danger" onclick="deleteSale(${s.id})">Eliminar</button>` 
+                                    : ''}
+                            </td>
+                        </tr>
+                    `).join('')}
+                </tbody>
+            </table>
+        </div>
+    `;
+}
+
 async function viewSale(id) {
     try {
         const sale = await apiRequest(`/sales/${id}`);
@@ -470,7 +851,7 @@ async function deleteSale(id) {
 // ========== PRODUCTS ==========
 async function loadProducts() {
     try {
-        const products = await apiRequest('/products');
+        const products = await getSyncedRows('products');
         const productsTable = document.getElementById('products-table');
         
         const searchHTML = `
@@ -613,7 +994,7 @@ document.getElementById('add-product-btn').addEventListener('click', async () =>
 
 async function editProduct(id) {
     try {
-        const products = await apiRequest('/products');
+        const products = await getSyncedRows('products');
         SUPPLIERS = await apiRequest('/suppliers');
         const product = products.find(p => p.id === id);
         const suppliersOptions = SUPPLIERS.map(s => 
@@ -848,8 +1229,9 @@ async function deleteSupplier(id) {
 
 async function viewSupplierProducts(supplierId, supplierName) {
     try {
-        const data = await apiRequest(`/suppliers/${supplierId}/products-catalog`);
-        const allProducts = await apiRequest('/products');
+        const [allProducts, data] = await getSyncedRowsWith(
+            ['products'], [`/suppliers/${supplierId}/products-catalog`]
+        );
 
         const assignedProductIds = data.products.map(p => p.product_id);
         const availableProducts = allProducts.filter(p => !assignedProductIds.includes(p.id));
@@ -981,8 +1363,9 @@ async function viewSupplierProducts(supplierId, supplierName) {
 
 async function addProductToSupplier(supplierId, supplierName) {
     try {
-        const allProducts = await apiRequest('/products');
-        const assignedProducts = await apiRequest(`/suppliers/${supplierId}/products-catalog`);
+        const [allProducts, assignedProducts] = await getSyncedRowsWith(
+            ['products'], [`/suppliers/${supplierId}/products-catalog`]
+        );
         const assignedProductIds = assignedProducts.products.map(p => p.product_id);
         const availableProducts = allProducts.filter(p => !assignedProductIds.includes(p.id));
         
@@ -1327,17 +1710,18 @@ window.addEventListener('click', (e) => {
 });
 
 // ========== INICIALIZACION ==========
-console.log('Inicializando aplicacion...');
-console.log('Token guardado:', TOKEN ? 'Si' : 'No');
-console.log('Usuario guardado:', CURRENT_USER.username || 'No');
+debugLog('Inicializando aplicacion...');
+debugLog('Token guardado:', TOKEN ? 'Si' : 'No');
+debugLog('Usuario guardado:', CURRENT_USER.username || 'No');
 
 if (TOKEN && CURRENT_USER.username) {
-    console.log('Usuario ya logueado, mostrando pantalla principal');
+    debugLog('Usuario ya logueado, mostrando pantalla principal');
     document.getElementById('user-info').textContent = `${CURRENT_USER.username} (${CURRENT_USER.role})`;
     document.body.className = `role-${CURRENT_USER.role}`;
     showScreen('main-screen');
     loadDashboard();
+    connectEvents();
 } else {
-    console.log('No hay sesion activa, mostrando login');
+    debugLog('No hay sesion activa, mostrando login');
     showScreen('login-screen');
 }
\ No newline at end of file
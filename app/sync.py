@@ -0,0 +1,112 @@
+"""Sincronización incremental: cambios desde un cursor y lápidas de borrados.
+
+El cursor es "timestamp|id" del último cambio entregado ("timestamp|id|more"
+mientras quedan páginas). Al terminar, el siguiente cursor se retrasa
+SYNC_LAG_SECONDS respecto a la hora actual: updated_at se fija al hacer flush y una transacción lenta
+puede confirmar filas con un timestamp anterior al de otra ya leída. Los
+cambios dentro de esa ventana se entregan otra vez; aplicar un cambio dos
+veces no tiene efecto en el cliente.
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event
+from . import db, queries
+from .models import Product, Customer, Supplier, SupplierProduct, SyncTombstone
+
+TRACKED_MODELS = {
+    "products": Product,
+    "customers": Customer,
+    "suppliers": Supplier,
+    "supplier_products": SupplierProduct,
+}
+
+
+class InvalidCursor(ValueError):
+    """El cursor de sincronización no tiene el formato 'timestamp|id[|more]'"""
+
+
+def _record_tombstone(entity):
+    def after_delete(mapper, connection, target):
+        connection.execute(SyncTombstone.__table__.insert().values(
+            entity=entity, entity_id=target.id, deleted_at=datetime.utcnow()
+        ))
+    return after_delete
+
+
+for _entity, _model in TRACKED_MODELS.items():
+    event.listen(_model, "after_delete", _record_tombstone(_entity))
+
+
+def record_deletes(entity, ids):
+    """Lápidas para borrados masivos (query.delete() no dispara after_delete)"""
+    if ids:
+        now = datetime.utcnow()
+        db.session.execute(SyncTombstone.__table__.insert(), [
+            {"entity": entity, "entity_id": entity_id, "deleted_at": now} for entity_id in ids
+        ])
+
+
+def parse_cursor(value):
+    """'timestamp|id[|more]' -> ((timestamp, id), hay_más_páginas)"""
+    parts = value.split("|")
+    if len(parts) not in (2, 3) or (len(parts) == 3 and parts[2] != "more"):
+        raise InvalidCursor(f"invalid cursor: {value}")
+    try:
+        return (datetime.fromisoformat(parts[0]), int(parts[1])), len(parts) == 3
+    except ValueError:
+        raise InvalidCursor(f"invalid cursor: {value}")
+
+
+def format_cursor(timestamp, key, more=False):
+    return f"{timestamp.isoformat()}|{key}" + ("|more" if more else "")
+
+
+def changes(entity, since=None, limit=1000, fields=None):
+    """Filas cambiadas y ids borrados después del cursor since"""
+    now = datetime.utcnow()
+    after, paging = parse_cursor(since) if since else (None, False)
+
+    # Sin cursor, o con uno más viejo que las lápidas guardadas: copia completa.
+    # A mitad de una copia el cursor es el de la última fila, que puede ser viejo.
+    retention = timedelta(days=current_app.config.get("SYNC_TOMBSTONE_DAYS", 30))
+    reset = after is None or (not paging and after[0] < now - retention)
+    if reset:
+        after = None
+
+    rows = queries.changed_rows(entity, after=after, limit=limit, fields=fields)
+    has_more = len(rows) == limit
+    if has_more:
+        upper = rows[-1]["updated_at"]
+        cursor = format_cursor(upper, rows[-1]["id"], more=True)
+    else:
+        upper = None
+        lagged = now - timedelta(seconds=current_app.config.get("SYNC_LAG_SECONDS", 30))
+        cursor = format_cursor(max(lagged, after[0]) if after else lagged, 0)
+
+    deleted = []
+    if not reset:
+        query = db.session.query(SyncTombstone.entity_id).filter(
+            SyncTombstone.entity == entity,
+            SyncTombstone.deleted_at > after[0],
+        )
+        if upper is not None:
+            query = query.filter(SyncTombstone.deleted_at <= upper)
+        deleted = sorted({row[0] for row in query})
+
+    return {
+        "entity": entity,
+        "reset": reset,
+        "rows": rows,
+        "deleted": deleted,
+        "cursor": cursor,
+        "has_more": has_more,
+    }
+
+
+def prune_tombstones(days=None):
+    """Elimina lápidas más viejas que SYNC_TOMBSTONE_DAYS"""
+    days = days or current_app.config.get("SYNC_TOMBSTONE_DAYS", 30)
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    deleted = SyncTombstone.query.filter(SyncTombstone.deleted_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
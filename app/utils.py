@@ -1,19 +1,38 @@
 from functools import wraps
-from flask import jsonify, g, current_app
-from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask import jsonify, g, current_app, request
+from flask_jwt_extended import get_jwt, get_jwt_identity, get_jwt_request_location, verify_jwt_in_request
 from .models import LogEntry
+from .batch import BATCH_IDENTITY_KEY
 from . import db
+from .admission import admit
 import json
 
-def role_required(allowed_roles):
+def role_required(allowed_roles, locations=None, scope=None):
+    """locations permite aceptar el token en otros lugares (p. ej. query_string para EventSource).
+
+    Un token con claim scope solo vale en las rutas con ese scope; en una ruta
+    con scope, ?token= exige un token de ese scope y no el de sesión.
+    """
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
+            # Sub-petición de /api/batch: el token ya se verificó en el batch
+            batch_identity = request.environ.get(BATCH_IDENTITY_KEY)
+            if batch_identity is not None:
+                if batch_identity.get("role") not in allowed_roles:
+                    return jsonify({"msg": "Access forbidden for role"}), 403
+                g.current_user = batch_identity
+                return admit(fn, *args, **kwargs)
+
             try:
-                verify_jwt_in_request()
+                verify_jwt_in_request(locations=locations)
             except Exception as e:
-                current_app.logger.error(f"JWT verification failed: {str(e)}")
+                current_app.logger.error("JWT verification failed: %s", e)
                 return jsonify({"msg": "Token missing or invalid", "error": str(e)}), 401
+
+            token_scope = get_jwt().get("scope")
+            if token_scope != scope and (token_scope is not None or get_jwt_request_location() == "query_string"):
+                return jsonify({"msg": "Token not valid for this route"}), 401
             
             # Obtener el identity (es un string JSON)
             identity_string = get_jwt_identity()
@@ -37,7 +56,8 @@ def role_required(allowed_roles):
             
             # Adjuntar identidad del usuario a g para logging
             g.current_user = identity
-            return fn(*args, **kwargs)
+            # Límite por usuario y statement timeout según la clase de costo de la ruta
+            return admit(fn, *args, **kwargs)
         return wrapper
     return decorator
 
@@ -57,8 +77,8 @@ def log_db_action(action, details=None):
         )
         db.session.add(log_entry)
         db.session.commit()
-        current_app.logger.info(f"[DB_ACTION] {action} by {username} - {details}")
+        current_app.logger.info("[DB_ACTION] %s by %s - %s", action, username, details)
     except Exception as e:
-        current_app.logger.error(f"Error logging action: {str(e)}")
+        current_app.logger.error("Error logging action: %s", e)
         # No fallar si el log falla
         pass
\ No newline at end of file
@@ -0,0 +1,325 @@
+"""Benchmark de carga de los endpoints principales con umbrales de regresión.
+
+Genera una base (SQLite temporal, o --database-url) con app/seed.py, levanta la
+app en un servidor real (gunicorn, o el servidor de Flask con --server flask)
+y mide latencia p50/p95/p99 y throughput de cada ruta con varios niveles de
+concurrencia. El resultado se guarda como JSON para comparar entre commits:
+
+    python benchmarks/bench_endpoints.py --concurrency 1,4,16 --duration 5
+    python benchmarks/bench_endpoints.py --compare benchmarks/results/abc1234.json --threshold 20
+
+Con --compare sale con código 1 si alguna ruta empeora más del umbral en la
+métrica elegida (--metric, p95 por defecto). --route-threshold fija un umbral
+distinto por ruta: --route-threshold "POST /api/sales=40". También es regresión
+una ruta con más errores que antes o sin peticiones exitosas.
+
+--database-url agrega datos y deja productos con stock 10^9: nunca se usa la
+DATABASE_URL del entorno.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmpdir = tempfile.mkdtemp(prefix="bench-endpoints-")
+TEMP_DATABASE_URL = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ.setdefault("LOG_FILE", os.path.join(_tmpdir, "bench.log"))
+os.environ.setdefault("LOG_REQUESTS", "false")
+# Un solo usuario a alta concurrencia agotaría su bucket: se mide el servidor, no el
+# limitador. ADMISSION_CONTROL=true lo deja activo
+os.environ.setdefault("ADMISSION_CONTROL", "false")
+os.environ.setdefault("ADMISSION_STORE", os.path.join(_tmpdir, "admission.sqlite"))
+
+USERNAME, PASSWORD = "admin", "admin123"
+METRICS = ("p50_ms", "p95_ms", "p99_ms")
+# Productos con stock suficiente para las ventas del benchmark
+SALE_PRODUCTS = 50
+
+
+def routes(product_ids):
+    """nombre -> función(rng) que devuelve (método, ruta, cuerpo)"""
+    def sale(rng):
+        items = [{"product_id": pid, "quantity": 1} for pid in rng.sample(product_ids, rng.randint(1, 3))]
+        return "POST", "/api/sales", {"items": items, "payment_method": "cash"}
+
+    fixed = {
+        "POST /api/auth/login": ("POST", "/api/auth/login", {"username": USERNAME, "password": PASSWORD}),
+        "GET /api/products": ("GET", "/api/products", None),
+        "GET /api/sales": ("GET", "/api/sales", None),
+        "GET /api/dashboard": ("GET", "/api/dashboard", None),
+        "GET /api/reports/sales-summary": ("GET", "/api/reports/sales-summary?period=month", None),
+        "GET /api/reports/top-products": ("GET", "/api/reports/top-products", None),
+        "GET /api/reports/top-customers": ("GET", "/api/reports/top-customers", None),
+    }
+    result = {name: (lambda rng, spec=spec: spec) for name, spec in fixed.items()}
+    result["POST /api/sales"] = sale
+    return result
+
+
+def prepare(args):
+    """Genera los datos si faltan y deja productos con stock para vender"""
+    from app import create_app, db, seed
+    from app.inventory import record_opening_balances, set_stock
+    from app.models import Product, Sale
+
+    app = create_app()
+    with app.app_context():
+        if Sale.query.count() < args.sales:
+            rng = random.Random(args.seed)
+            print(f"📦 Generando {args.products} productos y {args.sales} ventas...")
+            supplier_ids = seed.seed_suppliers(args.suppliers, rng)
+            prices = seed.seed_products(args.products, supplier_ids, rng)
+            record_opening_balances()
+            seed.seed_catalog(prices, supplier_ids, rng)
+            customer_ids = seed.seed_customers(args.customers, rng)
+            seed.seed_sales(args.sales, args.days, prices, customer_ids, rng)
+        product_ids = db.session.execute(
+            db.select(Product.id).order_by(Product.id).limit(SALE_PRODUCTS)
+        ).scalars().all()
+        for pid in product_ids:
+            set_stock(pid, 10**9, reference="benchmark")
+        db.session.commit()
+        db.engine.dispose()
+    return product_ids
+
+
+def start_server(server, port, log_path):
+    env = dict(os.environ, PORT=str(port))
+    if server == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                   "--bind", f"127.0.0.1:{port}", "manage:app"]
+    else:
+        command = [sys.executable, "-m", "flask", "--app", "manage", "run", "--host", "127.0.0.1",
+                   "--port", str(port), "--with-threads", "--no-reload", "--no-debugger"]
+    log = open(log_path, "ab")
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"el servidor terminó al arrancar (ver {log_path})")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"el servidor no respondió en 60s (ver {log_path})")
+
+
+def request(conn, token, method, path, body):
+    headers = {"Accept-Encoding": "gzip"}
+    payload = None
+    if body is not None:
+        payload = json.dumps(body)
+        headers["Content-Type"] = "application/json"
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    conn.request(method, path, body=payload, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    return response.status, data
+
+
+def login(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    status, data = request(conn, None, "POST", "/api/auth/login", {"username": USERNAME, "password": PASSWORD})
+    if status != 200:
+        raise RuntimeError(f"login falló ({status})")
+    return json.loads(data)["access_token"]
+
+
+def run_level(port, token, build, concurrency, duration, warmup, seed):
+    """Corre concurrency hilos durante duration segundos; devuelve las métricas"""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(concurrency + 1)
+    stop = [0.0]
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        for _ in range(warmup):
+            request(conn, token, *build(rng))
+        own, failed = [], 0
+        start_barrier.wait()
+        while time.perf_counter() < stop[0]:
+            method, path, body = build(rng)
+            started = time.perf_counter()
+            try:
+                status, _ = request(conn, token, method, path, body)
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                failed += 1
+                continue
+            if status >= 400:
+                failed += 1
+            else:
+                own.append(time.perf_counter() - started)
+        conn.close()
+        with lock:
+            latencies.extend(own)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    stop[0] = time.perf_counter() + duration + 3600
+    start_barrier.wait()
+    began = time.perf_counter()
+    stop[0] = began + duration
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    result = {"requests": len(latencies), "errors": sum(errors), "rps": round(len(latencies) / elapsed, 1)}
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        result.update(p50_ms=round(cuts[49] * 1000, 2), p95_ms=round(cuts[94] * 1000, 2),
+                      p99_ms=round(cuts[98] * 1000, 2))
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def error_rate(stats):
+    total = stats.get("requests", 0) + stats.get("errors", 0)
+    return stats.get("errors", 0) / total if total else 0.0
+
+
+def compare(current, baseline, metric, threshold, route_thresholds):
+    """Imprime la comparación; devuelve las regresiones [(ruta, concurrencia, motivo)]"""
+    regressions = []
+    print(f"\nComparación con {baseline.get('commit')} ({metric}, umbral {threshold}%)")
+    for name, levels in current["results"].items():
+        for level, stats in levels.items():
+            previous = baseline.get("results", {}).get(name, {}).get(level)
+            if previous is None:
+                continue
+            before, now = previous.get(metric), stats.get(metric)
+            # Una ruta que empezó a fallar no tiene latencias: no puede pasar por omisión
+            if now is None:
+                reason = "sin peticiones exitosas"
+            elif error_rate(stats) > error_rate(previous):
+                reason = f"errores {error_rate(previous):.1%} -> {error_rate(stats):.1%}"
+            elif before and (now - before) / before * 100 > route_thresholds.get(name, threshold):
+                reason = f"{before:.2f} -> {now:.2f} ms ({(now - before) / before * 100:+.1f}%)"
+            else:
+                if before:
+                    print(f"✅ {name:<34} c={level:<4} {before:>9.2f} -> {now:>9.2f} ms "
+                          f"({(now - before) / before * 100:+.1f}%)")
+                continue
+            print(f"❌ {name:<34} c={level:<4} {reason}")
+            regressions.append((name, level, reason))
+    return regressions
+
+
+def parse_route_thresholds(values):
+    result = {}
+    for value in values:
+        name, _, pct = value.rpartition("=")
+        if not name:
+            raise SystemExit(f"--route-threshold inválido: {value} (usa 'GET /api/products=30')")
+        result[name.strip()] = float(pct)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--server", choices=("gunicorn", "flask"), default="gunicorn")
+    parser.add_argument("--database-url", help="Base a usar (se le agregan datos); por defecto SQLite temporal")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", default="1,4,16", help="Niveles separados por coma")
+    parser.add_argument("--duration", type=float, default=5.0, help="Segundos por ruta y nivel")
+    parser.add_argument("--warmup", type=int, default=3, help="Peticiones por hilo antes de medir")
+    parser.add_argument("--routes", default="", help="Subconjunto separado por coma (ej. 'GET /api/products')")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--suppliers", type=int, default=20)
+    parser.add_argument("--sales", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Por defecto benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", help="JSON de una corrida anterior")
+    parser.add_argument("--metric", choices=METRICS, default="p95_ms")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Máximo empeoramiento permitido en %%")
+    parser.add_argument("--route-threshold", action="append", default=[])
+    args = parser.parse_args()
+    # Antes de importar la app: la configuración lee DATABASE_URL al importarse
+    os.environ["DATABASE_URL"] = args.database_url or TEMP_DATABASE_URL
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    route_thresholds = parse_route_thresholds(args.route_threshold)
+    product_ids = prepare(args)
+    available = routes(product_ids)
+    selected = [name.strip() for name in args.routes.split(",") if name.strip()] or list(available)
+    unknown = [name for name in selected if name not in available]
+    if unknown:
+        raise SystemExit(f"rutas desconocidas: {', '.join(unknown)} (disponibles: {', '.join(available)})")
+
+    server = start_server(args.server, args.port, os.path.join(_tmpdir, "server.log"))
+    try:
+        token = login(args.port)
+        results = {}
+        print(f"\n{'ruta':<36}{'c':>4}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errores':>9}")
+        for name in selected:
+            results[name] = {}
+            for level in levels:
+                stats = run_level(args.port, token, available[name], level, args.duration, args.warmup, args.seed)
+                results[name][str(level)] = stats
+                print(f"{name:<36}{level:>4}{stats['rps']:>10.1f}{stats.get('p50_ms', 0):>10.2f}"
+                      f"{stats.get('p95_ms', 0):>10.2f}{stats.get('p99_ms', 0):>10.2f}{stats['errors']:>9}")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.utcnow().isoformat(),
+        "config": {
+            "server": args.server,
+            "database": os.environ["DATABASE_URL"].split("://")[0],
+            "duration": args.duration,
+            "concurrency": levels,
+            "dataset": {key: getattr(args, key) for key in ("products", "customers", "suppliers", "sales", "days", "seed")},
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados en {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.metric, args.threshold, route_thresholds)
+        if regressions:
+            print(f"❌ {len(regressions)} rutas empeoraron más del umbral")
+            raise SystemExit(1)
+        print("✅ Sin regresiones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark de los listados: instancias del ORM contra proyección de columnas.
+
+Llena una base SQLite temporal (o DATABASE_URL si se define) con --rows
+productos y ventas y mide CPU y pico de memoria por cada 10k filas:
+
+    python benchmarks/bench_list_rows.py --rows 10000 --repeat 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp(prefix="bench-rows-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault("LOG_FILE", os.path.join(_tmpdir, "bench.log"))
+os.environ.setdefault("LOG_REQUESTS", "false")
+
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+from app import create_app, db, queries
+from app.models import Product, Sale, Supplier, User
+
+
+def seed(rows):
+    """Agrega filas hasta tener al menos rows productos y ventas"""
+    supplier_ids = [s.id for s in Supplier.query.all()]
+    user_id = User.query.filter_by(username="admin").first().id
+    missing = rows - Product.query.count()
+    if missing > 0:
+        db.session.execute(insert(Product), [{
+            "name": f"Producto bench {i}",
+            "description": "Botella 750ml",
+            "price": 10 + i % 500,
+            "iva": 16,
+            "stock": i % 120,
+            "min_stock": 20,
+            "category": f"Categoría {i % 12}",
+            "supplier_id": supplier_ids[i % len(supplier_ids)],
+        } for i in range(missing)])
+    missing = rows - Sale.query.count()
+    if missing > 0:
+        start = datetime.utcnow() - timedelta(days=365)
+        db.session.execute(insert(Sale), [{
+            "customer_id": None,
+            "user_id": user_id,
+            "total": 100 + i % 900,
+            "payment_method": "cash",
+            "status": "completed",
+            "created_at": start + timedelta(minutes=i),
+        } for i in range(missing)])
+    db.session.commit()
+
+
+# Lecturas como estaban antes de app/queries.py
+def orm_products():
+    result = []
+    for p in Product.query.options(joinedload(Product.supplier)).all():
+        iva = p.iva or 16
+        result.append({
+            "id": p.id, "name": p.name, "description": p.description, "price": p.price,
+            "price_with_iva": p.price * (1 + iva / 100), "iva": iva, "stock": p.stock,
+            "min_stock": p.min_stock, "category": p.category, "supplier_id": p.supplier_id,
+            "supplier_name": p.supplier.name if p.supplier else None,
+            "is_low_stock": p.stock <= p.min_stock,
+        })
+    return result
+
+
+def orm_sales():
+    sales = Sale.query.options(joinedload(Sale.customer), joinedload(Sale.user))\
+        .order_by(Sale.created_at.desc()).all()
+    return [{
+        "id": s.id, "customer": s.customer.name if s.customer else "N/A", "user": s.user.username,
+        "subtotal": None, "iva": None, "total": s.total, "payment_method": s.payment_method,
+        "status": s.status, "created_at": s.created_at,
+    } for s in sales]
+
+
+def measure(fn, repeat):
+    cpu, peaks, count = [], [], 0
+    for _ in range(repeat):
+        db.session.expunge_all()
+        tracemalloc.start()
+        start = time.process_time()
+        count = len(fn())
+        cpu.append(time.process_time() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    per_10k = 10000 / max(count, 1)
+    return count, statistics.median(cpu) * 1000 * per_10k, statistics.median(peaks) / 1e6 * per_10k
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        seed(args.rows)
+        cases = [
+            ("products", "orm", orm_products),
+            ("products", "select", queries.products),
+            ("sales", "orm", orm_sales),
+            ("sales", "select", queries.sales),
+        ]
+        print(f"\n{'listado':<10}{'lectura':<8}{'filas':>8}{'CPU ms/10k':>12}{'MB/10k':>10}")
+        for name, mode, fn in cases:
+            rows, cpu_ms, peak_mb = measure(fn, args.repeat)
+            print(f"{name:<10}{mode:<8}{rows:>8}{cpu_ms:>12.1f}{peak_mb:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
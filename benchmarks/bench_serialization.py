@@ -0,0 +1,94 @@
+"""Benchmark de serialización y compresión con 50k productos.
+
+Compara el proveedor JSON con orjson contra el json de la stdlib y el
+costo/tamaño de gzip y brotli sobre el mismo cuerpo:
+
+    python benchmarks/bench_serialization.py --rows 50000 --repeat 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from app.json_provider import FastJSONProvider, orjson
+from app.compression import brotli, compress_body
+
+CATEGORIES = ["Cervezas", "Vinos", "Tequilas", "Mezcales", "Rones", "Vodkas", "Whiskys", "Refrescos", "Botanas"]
+
+
+def build_products(rows, seed=42):
+    """Mismo formato que GET /api/products"""
+    rnd = random.Random(seed)
+    base = datetime(2024, 1, 1)
+    products = []
+    for i in range(1, rows + 1):
+        price = round(rnd.uniform(10, 900), 2)
+        products.append({
+            "id": i,
+            "name": f"Producto {i} {rnd.choice(CATEGORIES)}",
+            "description": "Descripción de prueba con acentos: añejo, botella 750ml",
+            "price": price,
+            "iva": 16,
+            "price_with_iva": round(price * 1.16, 2),
+            "stock": rnd.randint(0, 500),
+            "min_stock": rnd.randint(5, 50),
+            "category": rnd.choice(CATEGORIES),
+            "supplier_id": rnd.randint(1, 50),
+            "supplier_name": f"Proveedor {rnd.randint(1, 50)}",
+            "created_at": base + timedelta(minutes=i),
+        })
+    return products
+
+
+def timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    products = build_products(args.rows)
+    app = Flask(__name__)
+    print(f"{args.rows} productos, mediana de {args.repeat} corridas\n")
+
+    encoders = ["stdlib"] + (["orjson"] if orjson is not None else [])
+    body = None
+    print(f"{'encoder':<10}{'ms':>10}{'MB':>10}")
+    for name in encoders:
+        provider = FastJSONProvider(app, encoder=name)
+        data, elapsed = timed(lambda: provider.dumps_bytes(products), args.repeat)
+        print(f"{provider.encoder:<10}{elapsed * 1000:>10.1f}{len(data) / 1e6:>10.2f}")
+        body = data
+    if orjson is None:
+        print("(orjson no está instalado)")
+
+    print(f"\n{'compresión':<12}{'ms':>10}{'KB':>10}{'ratio':>8}")
+    levels = [("gzip-1", "gzip", 1), ("gzip-6", "gzip", 6)]
+    if brotli is not None:
+        levels += [("br-4", "br", 4), ("br-11", "br", 11)]
+    for label, encoding, level in levels:
+        compressed, elapsed = timed(
+            lambda: compress_body(body, encoding, level=level, brotli_quality=level), args.repeat
+        )
+        print(f"{label:<12}{elapsed * 1000:>10.1f}{len(compressed) / 1024:>10.1f}{len(body) / len(compressed):>8.1f}")
+    if brotli is None:
+        print("(brotli no está instalado)")
+
+
+if __name__ == "__main__":
+    main()
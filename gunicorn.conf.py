@@ -0,0 +1,52 @@
+# Configuración de gunicorn para producción: gunicorn -c gunicorn.conf.py manage:app
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("GUNICORN_WORKERS", os.getenv("WEB_CONCURRENCY", "2")))
+# Hilos para peticiones más uno por cada stream SSE permitido (EVENTS_MAX_CLIENTS,
+# igual que en app/config.py): un stream ocupa su hilo mientras dura
+threads = int(os.getenv("GUNICORN_THREADS", "4")) + int(os.getenv("EVENTS_MAX_CLIENTS", "8"))
+worker_class = "gthread"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+keepalive = 5
+
+# Reciclar workers de vez en cuando para acotar fugas de memoria
+max_requests = 2000
+max_requests_jitter = 200
+
+# La app (y las migraciones) se cargan una sola vez en el proceso maestro
+# y los workers la heredan por copy-on-write
+preload_app = True
+
+# Cada worker vuelca sus métricas aquí y /api/metrics las suma (app/metrics.py).
+# Se fija antes de cargar la app para que Config lo lea
+os.environ.setdefault(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), f"crud-yandhi-metrics-{os.getenv('PORT', '8000')}")
+)
+
+
+def on_starting(server):
+    # Los totales empiezan de cero en cada arranque, como en un solo proceso
+    from app import metrics
+    metrics.clear_directory(os.environ["METRICS_DIR"])
+
+
+def post_fork(server, worker):
+    # Las conexiones del pool abiertas en el maestro no se pueden compartir
+    # entre procesos: cada worker arranca con su propio pool
+    from manage import app
+    from app import db
+    from app.database import dispose_engines
+    dispose_engines(app, db)
+
+
+def worker_exit(server, worker):
+    # Último volcado para no perder lo registrado desde el anterior
+    from app import metrics
+    metrics.flush()
+
+
+def child_exit(server, worker):
+    from app import metrics
+    metrics.mark_process_dead(worker.pid)
@@ -1,11 +1,11 @@
 from app import create_app, db
-from flask_migrate import Migrate
 from app.models import Role, User
+from app.query_plans import check_query_plans
+from app.log_archive import archive_logs, ensure_log_partitions, parse_duration
 import click
 import os
 
 app = create_app()
-migrate = Migrate(app, db)
 
 @app.cli.command("create-defaults")
 def create_defaults():
@@ -26,6 +26,219 @@ def create_defaults():
             db.session.commit()
             print("✅ Admin user created (username=admin, password=admin123)")
 
+@app.cli.command("check-query-plans")
+def check_query_plans_command():
+    """Corre EXPLAIN en las consultas principales y falla si alguna no usa índice"""
+    with app.app_context():
+        failures = 0
+        for name, full_scan, plan in check_query_plans():
+            status = "❌ escaneo completo" if full_scan else "✅ usa índice"
+            print(f"{status}: {name}")
+            for line in plan:
+                print(f"      {line}")
+            if full_scan:
+                failures += 1
+        if failures:
+            print(f"❌ {failures} consultas sin índice")
+            raise SystemExit(1)
+
+@app.cli.command("check-query-budgets")
+@click.option("--seed", "seed_data", is_flag=True, help="Corre sobre una base SQLite temporal con datos sintéticos")
+def check_query_budgets_command(seed_data):
+    """Cuenta las sentencias SQL de cada endpoint y falla si alguno excede su presupuesto"""
+    import json
+    import random
+    from flask_jwt_extended import create_access_token
+    from app import seed
+    from app.inventory import record_opening_balances
+    from app.profiling import check_query_budgets
+    temp_db = os.environ.get("QUERY_BUDGETS_TEMP_DB")
+    if seed_data and temp_db != app.config["SQLALCHEMY_DATABASE_URI"]:
+        # Nunca se siembra la base de DATABASE_URL: la app ya está creada con ella,
+        # así que el comando se repite en otro proceso con una SQLite temporal
+        import subprocess
+        import sys
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            url = f"sqlite:///{os.path.join(tmpdir, 'budgets.db')}"
+            env = dict(os.environ, DATABASE_URL=url, QUERY_BUDGETS_TEMP_DB=url,
+                       LOG_FILE=os.path.join(tmpdir, "app.log"))
+            env.pop("REPLICA_DATABASE_URL", None)
+            result = subprocess.run(
+                [sys.executable, "-m", "flask", "--app", "manage", "check-query-budgets", "--seed"],
+                env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+            )
+        raise SystemExit(result.returncode)
+
+    app.config["ADMISSION_CONTROL"] = False
+    with app.app_context():
+        if seed_data:
+            # Varias filas por entidad: un N+1 se nota en el conteo
+            rng = random.Random(42)
+            supplier_ids = seed.seed_suppliers(5, rng)
+            prices = seed.seed_products(50, supplier_ids, rng)
+            record_opening_balances()
+            seed.seed_catalog(prices, supplier_ids, rng)
+            customer_ids = seed.seed_customers(50, rng)
+            seed.seed_sales(300, 30, prices, customer_ids, rng)
+        admin = User.query.join(Role).filter(Role.name == "admin").first()
+        if admin is None:
+            raise click.ClickException("no hay usuario admin (flask create-defaults)")
+        token = create_access_token(identity=json.dumps({"id": admin.id, "username": admin.username, "role": "admin"}))
+
+    failures = 0
+    for path, budget, count, status in check_query_budgets(app, {"Authorization": f"Bearer {token}"}):
+        if status != 200:
+            print(f"❌ {path}: respondió {status}")
+            failures += 1
+        elif count > budget:
+            print(f"❌ {path}: {count} sentencias (presupuesto {budget})")
+            failures += 1
+        else:
+            print(f"✅ {path}: {count}/{budget}")
+    if failures:
+        print(f"❌ {failures} endpoints fuera de presupuesto")
+        raise SystemExit(1)
+
+@app.cli.command("archive-logs")
+@click.option("--older-than", default="90d", show_default=True, help="Antigüedad mínima: 90d, 12w, 48h")
+@click.option("--chunk-size", default=5000, show_default=True, help="Filas por lectura y por lote de borrado")
+@click.option("--dry-run", is_flag=True, help="Solo cuenta las filas que se archivarían")
+def archive_logs_command(older_than, chunk_size, dry_run):
+    """Exporta los logs viejos a NDJSON comprimido y los elimina de la tabla"""
+    from datetime import datetime
+    from app.models import LogEntry
+    try:
+        age = parse_duration(older_than)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--older-than")
+
+    with app.app_context():
+        # Corre desde cron: también deja lista la partición de los próximos meses
+        for name in ensure_log_partitions():
+            print(f"✅ Partición {name} creada")
+        cutoff = datetime.utcnow() - age
+        pending = LogEntry.query.filter(LogEntry.timestamp < cutoff).count()
+        print(f"📋 {pending} registros anteriores a {cutoff:%Y-%m-%d %H:%M}")
+        if dry_run or not pending:
+            return
+        with click.progressbar(length=pending, label="Archivando") as bar:
+            total, files = archive_logs(
+                age,
+                chunk_size=chunk_size,
+                rows_per_file=app.config["LOG_ARCHIVE_ROWS_PER_FILE"],
+                progress=bar.update,
+            )
+        for path in files:
+            print(f"   {path}")
+        print(f"✅ {total} registros archivados en {len(files)} archivos")
+
+@app.cli.command("ensure-log-partitions")
+@click.option("--months-ahead", default=2, show_default=True, help="Meses futuros con partición lista")
+def ensure_log_partitions_command(months_ahead):
+    """Crea las particiones mensuales de logs que falten (Postgres; correr desde cron)"""
+    with app.app_context():
+        created = ensure_log_partitions(months_ahead)
+        for name in created:
+            print(f"✅ Partición {name} creada")
+        if not created:
+            print("ℹ️  No faltan particiones")
+
+@app.cli.command("prune-tombstones")
+@click.option("--days", type=int, default=None, help="Por defecto SYNC_TOMBSTONE_DAYS")
+def prune_tombstones_command(days):
+    """Elimina las lápidas de sincronización viejas"""
+    from app.sync import prune_tombstones
+    with app.app_context():
+        deleted = prune_tombstones(days)
+        print(f"✅ {deleted} lápidas eliminadas")
+
+@app.cli.command("inventory-snapshot")
+def inventory_snapshot_command():
+    """Guarda el saldo de los productos con movimientos nuevos (correr periódicamente)"""
+    from app.inventory import take_snapshot
+    with app.app_context():
+        count = take_snapshot()
+        print(f"✅ Snapshot de {count} productos")
+
+@app.cli.command("inventory-reconcile")
+@click.option("--fix", is_flag=True, help="Corrige products.stock con la suma del libro")
+def inventory_reconcile_command(fix):
+    """Verifica que products.stock coincida con el libro de movimientos"""
+    from app.inventory import reconcile
+    with app.app_context():
+        mismatches = reconcile(fix=fix)
+        if not mismatches:
+            print("✅ El stock de todos los productos coincide con el libro")
+            return
+        for product_id, stock, ledger in mismatches:
+            print(f"   producto {product_id}: stock={stock} libro={ledger}")
+        if fix:
+            print(f"✅ {len(mismatches)} productos corregidos según el libro")
+        else:
+            print(f"❌ {len(mismatches)} productos no coinciden (usa --fix para corregir)")
+            raise SystemExit(1)
+
+@app.cli.command("seed")
+@click.option("--products", default=1000, show_default=True)
+@click.option("--customers", default=1000, show_default=True)
+@click.option("--suppliers", default=20, show_default=True)
+@click.option("--sales", default=50000, show_default=True)
+@click.option("--days", default=365, show_default=True, help="Las ventas se reparten en los últimos N días")
+@click.option("--seed", "seed_value", default=42, show_default=True, help="Misma semilla, mismos datos")
+def seed_command(products, customers, suppliers, sales, days, seed_value):
+    """Genera datos sintéticos a escala (popularidad Zipf, estacionalidad, tickets de varias líneas)"""
+    import random
+    import time
+    from app import seed
+    from app.inventory import record_opening_balances
+    if min(products, customers, suppliers, sales) < 0 or days < 1:
+        raise click.BadParameter("las cantidades no pueden ser negativas y --days debe ser al menos 1")
+
+    rng = random.Random(seed_value)
+    started = time.monotonic()
+    with app.app_context():
+        with click.progressbar(length=suppliers, label="Proveedores") as bar:
+            supplier_ids = seed.seed_suppliers(suppliers, rng, progress=bar.update)
+        with click.progressbar(length=products, label="Productos  ") as bar:
+            prices = seed.seed_products(products, supplier_ids, rng, progress=bar.update)
+        record_opening_balances()
+        with click.progressbar(length=len(prices), label="Catálogo   ") as bar:
+            offers = seed.seed_catalog(prices, supplier_ids, rng, progress=bar.update)
+        with click.progressbar(length=customers, label="Clientes   ") as bar:
+            customer_ids = seed.seed_customers(customers, rng, progress=bar.update)
+        with click.progressbar(length=sales, label="Ventas     ") as bar:
+            total_sales, total_items = seed.seed_sales(sales, days, prices, customer_ids, rng, progress=bar.update)
+    print(f"✅ {suppliers} proveedores, {products} productos ({offers} ofertas), {customers} clientes, "
+          f"{total_sales} ventas ({total_items} líneas) en {time.monotonic() - started:.0f}s")
+
+@app.cli.command("worker")
+@click.option("--concurrency", default=1, show_default=True, help="Trabajos en paralelo (hilos)")
+@click.option("--once", is_flag=True, help="Vacía la cola y termina")
+def worker_command(concurrency, once):
+    """Ejecuta reportes y exportaciones de /api/jobs fuera de los procesos web (con JOBS_WORKERS=0)"""
+    import signal
+    import threading
+    from app import jobs
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    threads = [
+        threading.Thread(target=jobs.work, args=(app, stop), kwargs={"once": once}, name=f"job-worker-{i}")
+        for i in range(max(concurrency, 1))
+    ]
+    print(f"⚙️  Worker con {len(threads)} hilo(s), esperando trabajos...")
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(1)
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    print("✅ Worker detenido")
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""Columnas de products que antes agregaba migrate_database()
+
+Bases creadas con versiones anteriores pueden no tener min_stock, iva o
+supplier_id, o conservar las columnas viejas iva_rate / include_iva. Cada
+paso revisa el esquema real, así que en una base nueva no hace nada.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:05:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def _product_columns():
+    inspector = sa.inspect(op.get_bind())
+    return [col['name'] for col in inspector.get_columns('products')]
+
+
+def upgrade():
+    columns = _product_columns()
+
+    if 'min_stock' not in columns:
+        op.add_column('products', sa.Column('min_stock', sa.Integer(), server_default='10'))
+
+    # iva_rate (viejo) se renombra a iva para consistencia
+    if 'iva' not in columns and 'iva_rate' in columns:
+        with op.batch_alter_table('products') as batch_op:
+            batch_op.alter_column('iva_rate', new_column_name='iva')
+    elif 'iva' not in columns:
+        op.add_column('products', sa.Column('iva', sa.Integer(), server_default='16'))
+
+    # include_iva ya no se usa
+    if 'include_iva' in columns:
+        with op.batch_alter_table('products') as batch_op:
+            batch_op.drop_column('include_iva')
+
+    if 'supplier_id' not in columns:
+        with op.batch_alter_table('products') as batch_op:
+            batch_op.add_column(sa.Column('supplier_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_products_supplier', 'suppliers', ['supplier_id'], ['id'])
+
+    # Productos sin proveedor reciben el primer proveedor disponible
+    bind = op.get_bind()
+    first_supplier = bind.execute(sa.text("SELECT MIN(id) FROM suppliers")).scalar()
+    if first_supplier:
+        bind.execute(
+            sa.text("UPDATE products SET supplier_id = :sid WHERE supplier_id IS NULL"),
+            {"sid": first_supplier},
+        )
+
+
+def downgrade():
+    # Las columnas son parte del esquema actual; no se eliminan
+    pass
@@ -0,0 +1,59 @@
+"""Índices secundarios en columnas de consulta frecuente
+
+Agrega los índices que usan listados, reportes y el dashboard, y la
+restricción única supplier_products(supplier_id, product_id), que también
+sirve de índice para el catálogo de cada proveedor.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 09:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_sales_created_at', 'sales', ['created_at']),
+    ('ix_sales_customer_id', 'sales', ['customer_id']),
+    ('ix_sales_user_id', 'sales', ['user_id']),
+    ('ix_sale_items_sale_id', 'sale_items', ['sale_id']),
+    ('ix_sale_items_product_id', 'sale_items', ['product_id']),
+    ('ix_products_category', 'products', ['category']),
+    ('ix_products_supplier_id', 'products', ['supplier_id']),
+    ('ix_logs_timestamp', 'logs', ['timestamp']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+    # Antes no había restricción: conservar solo la primera fila de cada par duplicado
+    op.execute(
+        "DELETE FROM supplier_products WHERE id NOT IN ("
+        " SELECT keep_id FROM ("
+        "  SELECT MIN(id) AS keep_id FROM supplier_products"
+        "  GROUP BY supplier_id, product_id"
+        " ) AS keep"
+        ")"
+    )
+    with op.batch_alter_table('supplier_products') as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_supplier_products_supplier_product', ['supplier_id', 'product_id']
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('supplier_products') as batch_op:
+        batch_op.drop_constraint('uq_supplier_products_supplier_product', type_='unique')
+
+    for name, table, _columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
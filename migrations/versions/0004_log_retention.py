@@ -0,0 +1,129 @@
+"""Retención de logs: tabla log_archives y partición mensual en Postgres
+
+En Postgres la tabla logs pasa a estar particionada por rango de
+timestamp (una partición por mes más una DEFAULT), así el archivado puede
+eliminar meses completos con DROP en lugar de borrar fila por fila. En
+otros motores se conserva la tabla y el índice ix_logs_timestamp, que es
+el que usan los borrados por lotes de `flask archive-logs`.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 09:15:00
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 2
+
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def _next_month(value):
+    return datetime(value.year + (value.month == 12), value.month % 12 + 1, 1)
+
+
+def _partition_logs_postgresql():
+    bind = op.get_bind()
+
+    # Liberar nombres de la tabla actual
+    op.execute("ALTER TABLE logs RENAME TO logs_legacy")
+    op.execute("ALTER TABLE logs_legacy RENAME CONSTRAINT logs_pkey TO logs_legacy_pkey")
+    op.execute("ALTER INDEX ix_logs_timestamp RENAME TO ix_logs_legacy_timestamp")
+    op.execute("ALTER SEQUENCE logs_id_seq OWNED BY NONE")
+
+    # La llave de partición debe formar parte de la llave primaria
+    op.execute(
+        "CREATE TABLE logs ("
+        " id INTEGER NOT NULL DEFAULT nextval('logs_id_seq'),"
+        " user_id INTEGER REFERENCES users (id),"
+        " username VARCHAR(80),"
+        " action VARCHAR(255),"
+        " details TEXT,"
+        " timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),"
+        " PRIMARY KEY (id, timestamp)"
+        ") PARTITION BY RANGE (timestamp)"
+    )
+    op.execute("CREATE TABLE logs_default PARTITION OF logs DEFAULT")
+    op.execute("CREATE INDEX ix_logs_timestamp ON logs (timestamp)")
+
+    oldest = bind.execute(sa.text("SELECT MIN(timestamp) FROM logs_legacy")).scalar()
+    month = _month_start(oldest or datetime.utcnow())
+    last = _month_start(datetime.utcnow())
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        upper = _next_month(month)
+        op.execute(
+            f"CREATE TABLE logs_p{month:%Y_%m} PARTITION OF logs "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        )
+        month = upper
+
+    op.execute(
+        "INSERT INTO logs (id, user_id, username, action, details, timestamp) "
+        "SELECT id, user_id, username, action, details, "
+        "COALESCE(timestamp, now() AT TIME ZONE 'utc') FROM logs_legacy"
+    )
+    op.execute("DROP TABLE logs_legacy")
+    op.execute("ALTER SEQUENCE logs_id_seq OWNED BY logs.id")
+
+
+def _unpartition_logs_postgresql():
+    op.execute("ALTER TABLE logs RENAME TO logs_partitioned")
+    op.execute("ALTER INDEX ix_logs_timestamp RENAME TO ix_logs_partitioned_timestamp")
+    op.execute("ALTER SEQUENCE logs_id_seq OWNED BY NONE")
+    op.execute(
+        "CREATE TABLE logs ("
+        " id INTEGER NOT NULL DEFAULT nextval('logs_id_seq') PRIMARY KEY,"
+        " user_id INTEGER REFERENCES users (id),"
+        " username VARCHAR(80),"
+        " action VARCHAR(255),"
+        " details TEXT,"
+        " timestamp TIMESTAMP WITHOUT TIME ZONE"
+        ")"
+    )
+    op.execute("CREATE INDEX ix_logs_timestamp ON logs (timestamp)")
+    op.execute(
+        "INSERT INTO logs (id, user_id, username, action, details, timestamp) "
+        "SELECT id, user_id, username, action, details, timestamp FROM logs_partitioned"
+    )
+    op.execute("DROP TABLE logs_partitioned CASCADE")
+    op.execute("ALTER SEQUENCE logs_id_seq OWNED BY logs.id")
+
+
+def upgrade():
+    op.create_table(
+        'log_archives',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('path', sa.String(length=500), nullable=False),
+        sa.Column('start_ts', sa.DateTime(), nullable=False),
+        sa.Column('end_ts', sa.DateTime(), nullable=False),
+        sa.Column('row_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_log_archives_start_ts', 'log_archives', ['start_ts'])
+    op.create_index('ix_log_archives_end_ts', 'log_archives', ['end_ts'])
+
+    if op.get_bind().dialect.name == 'postgresql':
+        _partition_logs_postgresql()
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        _unpartition_logs_postgresql()
+
+    op.drop_index('ix_log_archives_end_ts', table_name='log_archives')
+    op.drop_index('ix_log_archives_start_ts', table_name='log_archives')
+    op.drop_table('log_archives')
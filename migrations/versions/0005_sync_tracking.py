@@ -0,0 +1,54 @@
+"""Seguimiento de cambios para la sincronización incremental
+
+Agrega updated_at a products, customers y suppliers (supplier_products ya
+tiene last_updated), sus índices, y la tabla sync_tombstones donde se
+registran las filas eliminadas.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 12:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+TRACKED_TABLES = ['products', 'customers', 'suppliers']
+
+
+def upgrade():
+    for table in TRACKED_TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)")
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'])
+
+    op.execute("UPDATE supplier_products SET last_updated = CURRENT_TIMESTAMP WHERE last_updated IS NULL")
+    op.create_index('ix_supplier_products_last_updated', 'supplier_products', ['last_updated'])
+
+    op.create_table(
+        'sync_tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(length=50), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_sync_tombstones_entity_deleted_at', 'sync_tombstones', ['entity', 'deleted_at'])
+
+
+def downgrade():
+    op.drop_index('ix_sync_tombstones_entity_deleted_at', table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
+    op.drop_index('ix_supplier_products_last_updated', table_name='supplier_products')
+    for table in reversed(TRACKED_TABLES):
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,36 @@
+"""Tabla events para el canal de eventos en vivo
+
+Las rutas de escritura insertan aquí, en la misma transacción, los eventos
+que cada proceso lee y reenvía a sus clientes de GET /api/events.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 13:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_events_created_at', 'events', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_events_created_at', table_name='events')
+    op.drop_table('events')
@@ -0,0 +1,66 @@
+"""Libro de movimientos de inventario y saldos periódicos
+
+Crea inventory_movements (venta, devolución, ajuste, recepción) e
+inventory_snapshots, y registra el stock actual de cada producto como
+movimiento de apertura para que el libro cuadre con products.stock.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'inventory_movements',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('reference', sa.String(length=100), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_inventory_movements_product_id_id', 'inventory_movements', ['product_id', 'id'])
+    op.create_index('ix_inventory_movements_created_at', 'inventory_movements', ['created_at'])
+
+    op.create_table(
+        'inventory_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('stock', sa.Integer(), nullable=False),
+        sa.Column('last_movement_id', sa.Integer(), nullable=False),
+        sa.Column('taken_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_inventory_snapshots_product_id_taken_at', 'inventory_snapshots', ['product_id', 'taken_at']
+    )
+
+    # Saldos de apertura: el historial anterior no existe en el libro
+    op.execute(
+        "INSERT INTO inventory_movements (product_id, kind, quantity, reference, created_at) "
+        "SELECT id, 'opening', COALESCE(stock, 0), 'opening balance', CURRENT_TIMESTAMP FROM products"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_inventory_snapshots_product_id_taken_at', table_name='inventory_snapshots')
+    op.drop_table('inventory_snapshots')
+    op.drop_index('ix_inventory_movements_created_at', table_name='inventory_movements')
+    op.drop_index('ix_inventory_movements_product_id_id', table_name='inventory_movements')
+    op.drop_table('inventory_movements')
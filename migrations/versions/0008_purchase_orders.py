@@ -0,0 +1,73 @@
+"""Órdenes de compra y lotes de movimientos de inventario
+
+Crea purchase_orders y purchase_order_lines, y agrega batch_id a
+inventory_movements para actualizar el stock de todo un lote con un UPDATE.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('inventory_movements') as batch_op:
+        batch_op.add_column(sa.Column('batch_id', sa.String(length=36), nullable=True))
+    op.create_index('ix_inventory_movements_batch_id', 'inventory_movements', ['batch_id'])
+
+    op.create_table(
+        'purchase_orders',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('supplier_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.Column('total_cost', sa.Float(), nullable=False),
+        sa.Column('landed_cost', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('received_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['supplier_id'], ['suppliers.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_purchase_orders_supplier_id', 'purchase_orders', ['supplier_id'])
+    op.create_index('ix_purchase_orders_status', 'purchase_orders', ['status'])
+    op.create_index('ix_purchase_orders_created_at', 'purchase_orders', ['created_at'])
+
+    op.create_table(
+        'purchase_order_lines',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity_ordered', sa.Integer(), nullable=False),
+        sa.Column('quantity_received', sa.Integer(), nullable=False),
+        sa.Column('unit_cost', sa.Float(), nullable=False),
+        sa.Column('landed_unit_cost', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['order_id'], ['purchase_orders.id']),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_purchase_order_lines_order_id', 'purchase_order_lines', ['order_id'])
+    op.create_index('ix_purchase_order_lines_product_id', 'purchase_order_lines', ['product_id'])
+
+
+def downgrade():
+    op.drop_index('ix_purchase_order_lines_product_id', table_name='purchase_order_lines')
+    op.drop_index('ix_purchase_order_lines_order_id', table_name='purchase_order_lines')
+    op.drop_table('purchase_order_lines')
+    op.drop_index('ix_purchase_orders_created_at', table_name='purchase_orders')
+    op.drop_index('ix_purchase_orders_status', table_name='purchase_orders')
+    op.drop_index('ix_purchase_orders_supplier_id', table_name='purchase_orders')
+    op.drop_table('purchase_orders')
+    op.drop_index('ix_inventory_movements_batch_id', table_name='inventory_movements')
+    with op.batch_alter_table('inventory_movements') as batch_op:
+        batch_op.drop_column('batch_id')
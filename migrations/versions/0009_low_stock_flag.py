@@ -0,0 +1,50 @@
+"""Bandera is_low_stock mantenida y outbox de transiciones
+
+products.stock <= products.min_stock compara dos columnas y ningún índice la
+resuelve; la bandera se guarda e indexa. low_stock_transitions registra cada
+entrada y salida de stock bajo para consumidores que leen por id.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.add_column(sa.Column('is_low_stock', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.execute(
+        "UPDATE products SET is_low_stock = (COALESCE(stock, 0) <= COALESCE(min_stock, 10))"
+    )
+    op.create_index('ix_products_is_low_stock_id', 'products', ['is_low_stock', 'id'])
+
+    op.create_table(
+        'low_stock_transitions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('low', sa.Boolean(), nullable=False),
+        sa.Column('stock', sa.Integer(), nullable=False),
+        sa.Column('min_stock', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_low_stock_transitions_created_at', 'low_stock_transitions', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_low_stock_transitions_created_at', table_name='low_stock_transitions')
+    op.drop_table('low_stock_transitions')
+    op.drop_index('ix_products_is_low_stock_id', table_name='products')
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('is_low_stock')
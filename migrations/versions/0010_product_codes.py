@@ -0,0 +1,46 @@
+"""SKU y códigos de barras de productos
+
+products.sku y product_barcodes.code tienen índices únicos para que la
+búsqueda exacta del punto de venta (GET /api/products/lookup) no recorra la
+tabla.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 17:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.add_column(sa.Column('sku', sa.String(length=64), nullable=True))
+    op.create_index('ix_products_sku', 'products', ['sku'], unique=True)
+
+    op.create_table(
+        'product_barcodes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('code', sa.String(length=64), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_product_barcodes_code', 'product_barcodes', ['code'], unique=True)
+    op.create_index('ix_product_barcodes_product_id', 'product_barcodes', ['product_id'])
+
+
+def downgrade():
+    op.drop_index('ix_product_barcodes_product_id', table_name='product_barcodes')
+    op.drop_index('ix_product_barcodes_code', table_name='product_barcodes')
+    op.drop_table('product_barcodes')
+    op.drop_index('ix_products_sku', table_name='products')
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('sku')
@@ -0,0 +1,47 @@
+"""Precio con IVA como columna generada e índices de ordenamiento
+
+products.price_with_iva es una columna calculada y guardada por la base
+(GENERATED ALWAYS ... STORED en Postgres, MySQL y SQLite), indexada para
+filtrar por rango y ordenar. También se indexan name y stock para ?sort=.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+# Igual que models.PRICE_WITH_IVA_SQL
+PRICE_WITH_IVA_SQL = "price + price * COALESCE(iva, 16) / 100.0"
+
+
+def upgrade():
+    column = sa.Column('price_with_iva', sa.Float(), sa.Computed(PRICE_WITH_IVA_SQL, persisted=True))
+    if op.get_bind().dialect.name == 'sqlite':
+        # SQLite no agrega columnas STORED con ALTER TABLE: se recrea la tabla
+        with op.batch_alter_table('products', recreate='always') as batch_op:
+            batch_op.add_column(column)
+    else:
+        op.add_column('products', column)
+    op.create_index('ix_products_price_with_iva', 'products', ['price_with_iva'])
+    op.create_index('ix_products_name', 'products', ['name'])
+    op.create_index('ix_products_stock', 'products', ['stock'])
+
+
+def downgrade():
+    op.drop_index('ix_products_stock', table_name='products')
+    op.drop_index('ix_products_name', table_name='products')
+    op.drop_index('ix_products_price_with_iva', table_name='products')
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('products', recreate='always') as batch_op:
+            batch_op.drop_column('price_with_iva')
+    else:
+        op.drop_column('products', 'price_with_iva')
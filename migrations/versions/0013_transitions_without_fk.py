@@ -0,0 +1,43 @@
+"""low_stock_transitions sin llave foránea a products
+
+El outbox es de solo inserción como el libro de inventario: sus filas se
+conservan aunque el producto se elimine (igual que sync_tombstones), así que
+product_id ya no referencia products.
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-20 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+# SQLite no guarda el nombre de la FK; batch necesita uno para poder quitarla
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+SQLITE_FK_NAME = 'fk_low_stock_transitions_product_id_products'
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        with op.batch_alter_table('low_stock_transitions', naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(SQLITE_FK_NAME, type_='foreignkey')
+        return
+    for fk in sa.inspect(bind).get_foreign_keys('low_stock_transitions'):
+        if fk['referred_table'] == 'products':
+            op.drop_constraint(fk['name'], 'low_stock_transitions', type_='foreignkey')
+
+
+def downgrade():
+    op.execute(
+        "DELETE FROM low_stock_transitions WHERE product_id NOT IN (SELECT id FROM products)"
+    )
+    with op.batch_alter_table('low_stock_transitions') as batch_op:
+        batch_op.create_foreign_key(SQLITE_FK_NAME, 'products', ['product_id'], ['id'])